@@ -21,6 +21,10 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'uploads')
 app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'mov', 'webm', 'avi', 'mkv', 'mpeg', 'mpg'}
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max upload size
+# Behind nginx, set to an internal location aliased to the upload folder to let nginx send media files
+app.config['MEDIA_ACCEL_REDIRECT_PREFIX'] = os.environ.get('MEDIA_ACCEL_REDIRECT_PREFIX')
+# Keep the ancestor closure table for pedigree/descendancy queries (run `flask rebuild-closure` after turning it on)
+app.config['ANCESTOR_CLOSURE'] = os.environ.get('ANCESTOR_CLOSURE') == '1'
 
 # Enable CORS properly
 CORS(app, resources={r"/*": {"origins": "*"}})
@@ -31,25 +35,41 @@ db.init_app(app)
 
 try:
     print("Registering blueprints...")
-    from routes import members_bp, relationships_bp, family_tree_bp, tree_bp
+    from routes import (members_bp, relationships_bp, family_tree_bp, tree_bp, imports_bp, exports_bp, jobs_bp,
+                        media_bp, kinship_bp, diagnostics_bp)
     app.register_blueprint(members_bp)
     app.register_blueprint(relationships_bp)
     app.register_blueprint(family_tree_bp)
     app.register_blueprint(tree_bp)
+    app.register_blueprint(imports_bp)
+    app.register_blueprint(exports_bp)
+    app.register_blueprint(jobs_bp)
+    app.register_blueprint(media_bp)
+    app.register_blueprint(kinship_bp)
+    app.register_blueprint(diagnostics_bp)
     print("Blueprints registered successfully")
 except Exception as e:
     print(f"ERROR registering blueprints: {str(e)}")
     # No fallback routes - if registration fails, application should fail to start
 
-# Create tables
-# In app.py, update the database creation part
+# Command line tools (flask --app app import-gedcom ...)
+from cli import register_commands
+register_commands(app)
+
+# Bring the schema up to date (keeps existing data)
 with app.app_context():
-    print("Dropping all tables...")
-    db.drop_all()
-    print("Creating all tables...")
-    db.create_all()
+    from migrations import run_migrations
+    print("Running database migrations...")
+    for version, description in run_migrations():
+        print(f"Applied migration {version}: {description}")
     print("Database setup complete!")
     
+    # Background jobs: jobs whose worker process has died cannot finish any more
+    from services.job_service import JobService
+    interrupted = JobService.fail_interrupted_jobs()
+    if interrupted:
+        print(f"Marked {interrupted} interrupted jobs as failed")
+    
     # Optional: Add a test person to verify it works
     from models.person import Person
     if Person.query.count() == 0:
@@ -401,6 +421,12 @@ with app.app_context():
         db.session.commit()
         print("Added test relationships - completed family tree setup!")
 
+# Job workers start with the first request, so only the serving process runs them
+@app.before_request
+def start_job_workers():
+    from services.job_service import JobService
+    JobService.start_workers()
+
 # Create upload directory
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 logger.info(f"Upload directory set to: {app.config['UPLOAD_FOLDER']}")
@@ -458,29 +484,5 @@ def serve_frontend(path):
     except:
         return send_from_directory('static', 'index.html')
 
-# Serve uploaded files
-@app.route('/uploads/<path:filename>')
-def serve_upload(filename):
-    """Serve uploaded files"""
-    try:
-        # Security check to prevent directory traversal attacks
-        requested_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        if not os.path.abspath(requested_path).startswith(os.path.abspath(app.config['UPLOAD_FOLDER'])):
-            app.logger.error(f"Attempted directory traversal attack: {filename}")
-            abort(403)  # Forbidden
-            
-        if not os.path.exists(requested_path):
-            app.logger.error(f"File not found: {requested_path}")
-            abort(404)  # Not found
-            
-        # Log successful file request
-        app.logger.info(f"Serving file: {filename}")
-        directory = os.path.dirname(requested_path)
-        file_name = os.path.basename(requested_path)
-        return send_from_directory(directory, file_name)
-    except Exception as e:
-        app.logger.error(f"Error serving file {filename}: {str(e)}")
-        abort(500)  # Internal Server Error
-
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0')
\ No newline at end of file
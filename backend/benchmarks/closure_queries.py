@@ -0,0 +1,154 @@
+# benchmarks/closure_queries.py
+"""
+Pedigree, descendancy and descendant count queries: the ancestor_closure table
+against a recursive CTE over the relationship table and a walk of the
+in-memory kinship graph.
+
+Uses the synthetic pedigree of benchmarks/kinship_query.py, times the full
+closure rebuild and its size, then times for random persons: all ancestors of
+someone in the youngest generations, descendants up to four generations down
+from a founder, and descendant counts for a page of 50 founders.
+Then times the incremental closure update for adding and removing a parent edge.
+
+Usage: python benchmarks/closure_queries.py [person_count] [founding_couples]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from models import db
+from models.relationship import Relationship
+from services.closure_service import ClosureService
+from benchmarks.kinship_query import build_app, populate_pedigree, percentile
+import migrations  # noqa: F401  (registers every model)
+
+QUERIES = 200
+PAGE_SIZE = 50
+DESCENDANT_DEPTH = 4
+
+# Shortest distance up to every ancestor; UNION (not UNION ALL) keeps a loop in the data from running forever
+_ANCESTORS_CTE = text(
+    "WITH RECURSIVE up(person_id, distance) AS ("
+    "  SELECT :person_id, 0"
+    "  UNION"
+    "  SELECT r.person1_id, up.distance + 1 FROM relationship r JOIN up ON r.person2_id = up.person_id"
+    "  WHERE r.relationship_type = 'parent-child' AND up.distance < :max_depth"
+    ") SELECT person_id, MIN(distance) FROM up WHERE person_id != :person_id GROUP BY person_id"
+)
+
+_DESCENDANTS_CTE = text(
+    "WITH RECURSIVE down(person_id, distance) AS ("
+    "  SELECT :person_id, 0"
+    "  UNION"
+    "  SELECT r.person2_id, down.distance + 1 FROM relationship r JOIN down ON r.person1_id = down.person_id"
+    "  WHERE r.relationship_type = 'parent-child' AND down.distance < :max_depth"
+    ") SELECT person_id, MIN(distance) FROM down WHERE person_id != :person_id GROUP BY person_id"
+)
+
+# Any depth bound above the number of generations
+NO_DEPTH_LIMIT = 1000000
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def cte_lineage(query, person_id, max_depth=NO_DEPTH_LIMIT):
+    return dict(db.session.execute(query, {'person_id': person_id, 'max_depth': max_depth}).all())
+
+
+def cte_descendant_counts(person_ids):
+    return {person_id: len(cte_lineage(_DESCENDANTS_CTE, person_id)) for person_id in person_ids}
+
+
+def lineage_ids(nodes):
+    return {node['id']: node['distance'] for node in nodes}
+
+
+def main():
+    person_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    founding_couples = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    random.seed(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            generations = populate_pedigree(person_count, founding_couples)
+
+            app.config['ANCESTOR_CLOSURE'] = True
+            summary, rebuild_ms = timed(ClosureService.rebuild)
+
+            young = [person_id for generation in generations[-2:] for person_id in generation]
+            founders = generations[0]
+            people = random.sample(young, QUERIES)
+            ancestors_of = random.sample(founders, QUERIES)
+            pages = [random.sample(founders, PAGE_SIZE) for _ in range(QUERIES // 10)]
+
+            timings = {}
+            results = {}
+            for engine, closure_on in (('closure', True), ('graph', False)):
+                app.config['ANCESTOR_CLOSURE'] = closure_on
+                for label, function, args in (
+                    ('ancestors', ClosureService.ancestors, [(person_id,) for person_id in people]),
+                    ('descendants', ClosureService.descendants,
+                     [(person_id, DESCENDANT_DEPTH) for person_id in ancestors_of]),
+                    ('counts', ClosureService.descendant_counts, [(page,) for page in pages]),
+                ):
+                    for arguments in args:
+                        result, elapsed = timed(function, *arguments)
+                        timings.setdefault((label, engine), []).append(elapsed)
+                        if label != 'counts':
+                            result = lineage_ids(result)
+                        results.setdefault((label, engine), []).append(result)
+
+            for label, query, args in (
+                ('ancestors', _ANCESTORS_CTE, [(person_id,) for person_id in people]),
+                ('descendants', _DESCENDANTS_CTE, [(person_id, DESCENDANT_DEPTH) for person_id in ancestors_of]),
+            ):
+                for arguments in args:
+                    result, elapsed = timed(cte_lineage, query, *arguments)
+                    timings.setdefault((label, 'recursive CTE'), []).append(elapsed)
+                    results.setdefault((label, 'recursive CTE'), []).append(result)
+            for page in pages:
+                result, elapsed = timed(cte_descendant_counts, page)
+                timings.setdefault(('counts', 'recursive CTE'), []).append(elapsed)
+                results.setdefault(('counts', 'recursive CTE'), []).append(result)
+
+            for label in ('ancestors', 'descendants', 'counts'):
+                assert results[(label, 'closure')] == results[(label, 'graph')] == results[(label, 'recursive CTE')]
+
+            # Incremental maintenance: a new parent edge into an older generation, then its removal
+            app.config['ANCESTOR_CLOSURE'] = True
+            parent_id, child_id = random.choice(generations[2]), random.choice(generations[1])
+            relationship = Relationship(person1_id=parent_id, person2_id=child_id, relationship_type='parent-child')
+            db.session.add(relationship)
+            _, add_ms = timed(ClosureService.edge_added, parent_id, child_id)
+            db.session.commit()
+            db.session.delete(relationship)
+            _, remove_ms = timed(ClosureService.edge_removed, child_id)
+            db.session.commit()
+
+    ancestor_counts = [len(result) for result in results[('ancestors', 'closure')]]
+    print(f"{person_count} persons, {len(generations)} generations, "
+          f"{statistics.mean(ancestor_counts):.0f} ancestors per queried person on average")
+    print(f"Closure rebuilt in {rebuild_ms:.0f} ms: {summary['rows']} rows for {summary['persons']} persons; "
+          f"parent edge added in {add_ms:.2f} ms, removed in {remove_ms:.2f} ms")
+    print(f"{QUERIES} all-ancestor and {DESCENDANT_DEPTH}-generation descendant queries, "
+          f"{len(pages)} pages of {PAGE_SIZE} descendant counts (ms per query)")
+    print(f"{'':<30}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}")
+    for (label, engine), values in timings.items():
+        print(f"{label + ', ' + engine:<30}{statistics.mean(values):>10.3f}{percentile(values, 0.5):>10.3f}"
+              f"{percentile(values, 0.95):>10.3f}{max(values):>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
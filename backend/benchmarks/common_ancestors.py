@@ -0,0 +1,113 @@
+# benchmarks/common_ancestors.py
+"""
+Common-ancestor queries: AncestorIndex against walking both ancestor sets.
+
+Uses the synthetic pedigree of benchmarks/kinship_query.py (by default with
+enough founding couples to keep it about as deep as real family trees; fewer
+couples give a deep, heavily intermarried one) and times random pairs from the
+youngest generations: nearest common ancestors by walking both ancestor sets
+and through the index, all common ancestors from the index's ancestor
+bitsets, first uncached and then cached, and nearest common ancestors again
+once the bitsets are cached. Then times the incremental index
+update for adding and removing a parent edge.
+
+Usage: python benchmarks/common_ancestors.py [person_count] [founding_couples]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db
+from services.kinship_graph import get_graph, EdgeRecord
+from benchmarks.kinship_query import build_app, populate_pedigree, percentile
+import migrations
+
+PAIRS = 500
+
+
+def walk_ancestors(graph, person_id):
+    """Every ancestor of a person (and the person), by walking the parent lists"""
+    found = {person_id}
+    stack = [person_id]
+    while stack:
+        for parent_id, _ in graph.adjacency[stack.pop()]['parents']:
+            if parent_id not in found:
+                found.add(parent_id)
+                stack.append(parent_id)
+    return found
+
+
+def nearest_by_walking(graph, person_a_id, person_b_id):
+    common = walk_ancestors(graph, person_a_id) & walk_ancestors(graph, person_b_id)
+    return [
+        ancestor_id for ancestor_id in common
+        if not any(child_id in common for child_id, _ in graph.adjacency[ancestor_id]['children'])
+    ]
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    person_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    founding_couples = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    random.seed(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            generations = populate_pedigree(person_count, founding_couples)
+            graph = get_graph()
+
+    _, build_ms = timed(graph.ancestor_index)
+    index = graph.ancestor_index()
+
+    candidates = [person_id for generation in generations[-2:] for person_id in generation]
+    pairs = [tuple(random.sample(candidates, 2)) for _ in range(PAIRS)]
+
+    timings = {
+        'nearest, walk': [], 'nearest, index': [],
+        'all, uncached': [], 'all, cached': [], 'nearest, cached': []
+    }
+    ancestor_counts = []
+    for person_a_id, person_b_id in pairs:
+        walked, elapsed = timed(nearest_by_walking, graph, person_a_id, person_b_id)
+        timings['nearest, walk'].append(elapsed)
+        ancestor_counts.append(len(walk_ancestors(graph, person_a_id)) - 1)
+        nearest, elapsed = timed(index.nearest_common_ancestors, person_a_id, person_b_id)
+        timings['nearest, index'].append(elapsed)
+        assert sorted(walked) == sorted(ancestor_id for ancestor_id, _, _ in nearest)
+        for label in ('all, uncached', 'all, cached'):
+            _, elapsed = timed(index.common_ancestors, person_a_id, person_b_id)
+            timings[label].append(elapsed)
+        cached, elapsed = timed(index.nearest_common_ancestors, person_a_id, person_b_id)
+        timings['nearest, cached'].append(elapsed)
+        assert cached == nearest
+
+    # Incremental maintenance: a new parent edge into an older generation, then its removal
+    parent_id, child_id = random.choice(generations[2]), random.choice(generations[1])
+    edge = EdgeRecord(-1, parent_id, child_id, 'parent-child')
+    _, add_ms = timed(graph.add_edge, edge)
+    _, remove_ms = timed(graph.remove_edge, edge.id)
+
+    print(f"{len(graph.persons)} persons, {len(generations)} generations, "
+          f"{statistics.mean(ancestor_counts):.0f} ancestors per queried person on average")
+    print(f"Index built in {build_ms:.0f} ms; parent edge added in {add_ms:.2f} ms, removed in {remove_ms:.2f} ms")
+    print(f"{PAIRS} random pairs, common ancestors (ms per query)")
+    print(f"{'':<16}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}")
+    for label, values in timings.items():
+        print(f"{label:<16}{statistics.mean(values):>10.3f}{percentile(values, 0.5):>10.3f}"
+              f"{percentile(values, 0.95):>10.3f}{max(values):>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
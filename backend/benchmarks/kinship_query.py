@@ -0,0 +1,125 @@
+# benchmarks/kinship_query.py
+"""
+Latency of KinshipService.relationship_between on a large pedigree.
+
+Builds a throwaway SQLite database holding a synthetic multi-generation family
+(couples married within their generation, 0-4 children each) of about
+person_count persons, loads the kinship graph and times random pairs: first
+uncached, then the same pairs again from the memo.
+
+Usage: python benchmarks/kinship_query.py [person_count]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import text
+from models import db
+from services.kinship_graph import get_graph
+from services.kinship_service import KinshipService
+import migrations  # noqa: F401  (registers every model)
+
+PAIRS = 500
+FOUNDING_COUPLES = 500
+
+
+def build_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def populate_pedigree(person_count, founding_couples=FOUNDING_COUPLES):
+    """
+    Insert a family of about person_count persons, generation by generation
+
+    Returns:
+        List of generations, each a list of person IDs
+    """
+    persons = []
+    relationships = []
+    generations = [list(range(1, founding_couples * 2 + 1))]
+    persons.extend({'gender': random.choice(['male', 'female'])} for _ in generations[0])
+
+    while len(persons) < person_count:
+        parents = generations[-1][:]
+        random.shuffle(parents)
+        children = []
+        for index in range(0, len(parents) - 1, 2):
+            father, mother = parents[index], parents[index + 1]
+            relationships.append((min(father, mother), 'spouse', max(father, mother)))
+            for _ in range(random.choice([0, 1, 2, 2, 3, 3, 4])):
+                if len(persons) >= person_count:
+                    break
+                persons.append({'gender': random.choice(['male', 'female'])})
+                child = len(persons)
+                children.append(child)
+                relationships.append((father, 'parent-child', child))
+                relationships.append((mother, 'parent-child', child))
+        if not children:
+            break
+        generations.append(children)
+
+    with db.engine.begin() as connection:
+        connection.execute(
+            text("INSERT INTO person (first_name, last_name, gender) VALUES ('P', 'Q', :gender)"), persons
+        )
+        connection.execute(
+            text("INSERT INTO relationship (person1_id, relationship_type, person2_id) VALUES (:p1, :type, :p2)"),
+            [{'p1': p1, 'type': rel_type, 'p2': p2} for p1, rel_type, p2 in relationships]
+        )
+    return generations
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    person_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    random.seed(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            generations = populate_pedigree(person_count)
+
+            start = time.perf_counter()
+            graph = get_graph()
+            load_ms = (time.perf_counter() - start) * 1000
+
+            # Pairs from the last generations, where relationships are deepest
+            candidates = [person_id for generation in generations[-3:] for person_id in generation]
+            pairs = [tuple(random.sample(candidates, 2)) for _ in range(PAIRS)]
+
+            timings = {'uncached': [], 'memoized': []}
+            names = {}
+            for label in timings:
+                for person_a, person_b in pairs:
+                    start = time.perf_counter()
+                    result = KinshipService.relationship_between(person_a, person_b)
+                    timings[label].append((time.perf_counter() - start) * 1000)
+                    names[result['relationship'] if result['related'] else 'unrelated'] = True
+
+    print(f"{len(graph.persons)} persons, {len(graph.edges)} relationships, "
+          f"{len(generations)} generations; graph loaded in {load_ms:.0f} ms")
+    print(f"{PAIRS} random pairs (ms per query)")
+    print(f"{'':<10}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}")
+    for label, values in timings.items():
+        print(f"{label:<10}{statistics.mean(values):>10.3f}{percentile(values, 0.5):>10.3f}"
+              f"{percentile(values, 0.95):>10.3f}{max(values):>10.3f}")
+    print(f"Sample relationships: {', '.join(list(names)[:8])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/pedigree_analysis.py
+"""
+Run time of the pedigree analysis job (PedigreeService.analyze) as the tree grows.
+
+Uses the synthetic pedigree of benchmarks/kinship_query.py, in which couples
+marry within their generation and so produce pedigree collapse, at several
+sizes up to about a million parent-child relationships. A few loops are
+added by making young persons parents of their ancestors. Times the whole
+analysis and the part up to the end of the loop search (loading the parent
+edges and Tarjan's algorithm); for a fixed number of generations both
+should grow linearly with the tree.
+
+Usage: python benchmarks/pedigree_analysis.py [largest_person_count] [generations]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from models import db
+from services.pedigree_service import PedigreeService, DEFAULT_IMPLEX_GENERATIONS
+from benchmarks.kinship_query import build_app, populate_pedigree
+import migrations  # noqa: F401  (registers every model)
+
+LOOPS = 10
+
+
+def main():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    generations = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_IMPLEX_GENERATIONS
+    random.seed(42)
+
+    print(f"Implex over {generations} generations")
+    print(f"{'persons':>10}{'parent edges':>14}{'loops':>8}{'collapsed':>11}{'loop search s':>15}{'total s':>10}")
+    for person_count in (largest // 4, largest // 2, largest):
+        with tempfile.TemporaryDirectory() as tmp:
+            app = build_app(os.path.join(tmp, 'bench.db'))
+            with app.app_context():
+                db.create_all()
+                tree = populate_pedigree(person_count, max(500, person_count // 100))
+                db.session.execute(
+                    text("INSERT OR IGNORE INTO relationship (person1_id, relationship_type, person2_id) "
+                         "VALUES (:parent, 'parent-child', :child)"),
+                    [{'parent': random.choice(tree[-1]), 'child': random.choice(tree[1])} for _ in range(LOOPS)]
+                )
+                db.session.commit()
+
+                marks = {}
+                start = time.perf_counter()
+                summary = PedigreeService.analyze(
+                    generations, lambda value: marks.setdefault(value['stage'], time.perf_counter() - start)
+                )
+                total = time.perf_counter() - start
+
+        print(f"{summary['persons']:>10}{summary['parent_edges']:>14}{summary['cycles']:>8}"
+              f"{summary['collapsed_persons']:>11}{marks['cycles']:>15.2f}{total:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/relationship_import.py
+"""
+Throughput of RelationshipService.bulk_create_relationships.
+
+Builds a throwaway SQLite database with person_count persons, imports edge_count
+random relationships (about 5% of them repeats or reversed repeats of earlier
+rows) and reports edges per second. Each size runs on a fresh database.
+
+Usage: python benchmarks/relationship_import.py [edge_count ...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import text
+from models import db
+from services.relationship_service import RelationshipService
+import migrations
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+TYPES = ['parent-child', 'child-parent', 'spouse', 'sibling']
+
+
+def build_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def populate_persons(person_count):
+    with db.engine.begin() as connection:
+        connection.execute(
+            text("INSERT INTO person (first_name, last_name) VALUES ('P', :n)"),
+            [{'n': str(i)} for i in range(person_count)]
+        )
+
+
+def generate_records(edge_count, person_count):
+    """Yield edge_count relationship dicts, some of which duplicate earlier ones"""
+    recent = []
+    for _ in range(edge_count):
+        if recent and random.random() < 0.05:
+            person1_id, person2_id, rel_type = random.choice(recent)
+            if rel_type == 'parent-child':
+                yield {'person1_id': person2_id, 'person2_id': person1_id, 'relationship_type': 'child-parent'}
+            else:
+                yield {'person1_id': person2_id, 'person2_id': person1_id, 'relationship_type': rel_type}
+            continue
+        person1_id = random.randint(1, person_count)
+        person2_id = random.randint(1, person_count - 1)
+        if person2_id >= person1_id:
+            person2_id += 1
+        rel_type = random.choice(TYPES)
+        if len(recent) < 1000:
+            recent.append((person1_id, person2_id, rel_type))
+        yield {'person1_id': person1_id, 'person2_id': person2_id, 'relationship_type': rel_type}
+
+
+def run(edge_count):
+    person_count = max(edge_count // 2, 2)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            migrations.run_migrations()
+            populate_persons(person_count)
+
+            start = time.perf_counter()
+            result = RelationshipService.bulk_create_relationships(generate_records(edge_count, person_count))
+            elapsed = time.perf_counter() - start
+            db.session.remove()
+            db.engine.dispose()
+
+    created = len(result['created'])
+    print(f"{edge_count:>10}{created:>10}{result['duplicates']:>12}{len(result['errors']):>8}"
+          f"{elapsed:>10.2f}{edge_count / elapsed:>14.0f}")
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    random.seed(7)
+    print(f"{'edges':>10}{'created':>10}{'duplicates':>12}{'errors':>8}{'seconds':>10}{'edges/sec':>14}")
+    for edge_count in sizes:
+        run(edge_count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# benchmarks/relationship_lookup.py
+"""
+Relationship lookup latency before and after the index migration.
+
+Builds a throwaway SQLite database with 100k relationship rows, times the
+queries RelationshipService issues (person OR-filter and reciprocal lookup)
+without indexes, applies the index migration and times them again.
+
+Usage: python benchmarks/relationship_lookup.py [edge_count]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import text
+from models import db
+from models.relationship import Relationship
+import migrations
+
+LOOKUPS = 500
+
+
+def build_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def populate(edge_count):
+    """Insert edge_count relationships between edge_count // 2 persons"""
+    person_count = max(edge_count // 2, 2)
+    with db.engine.begin() as connection:
+        connection.execute(
+            text("INSERT INTO person (first_name, last_name) VALUES ('P', :n)"),
+            [{'n': str(i)} for i in range(person_count)]
+        )
+        seen = set()
+        rows = []
+        types = ['parent-child', 'child-parent', 'spouse', 'sibling']
+        while len(rows) < edge_count:
+            edge = (random.randint(1, person_count), random.choice(types), random.randint(1, person_count))
+            if edge[0] != edge[2] and edge not in seen:
+                seen.add(edge)
+                rows.append({'p1': edge[0], 'type': edge[1], 'p2': edge[2]})
+        connection.execute(
+            text("INSERT INTO relationship (person1_id, relationship_type, person2_id) VALUES (:p1, :type, :p2)"),
+            rows
+        )
+    return person_count
+
+
+def drop_indexes():
+    with db.engine.begin() as connection:
+        for name in ('uq_relationship_edge', 'ix_relationship_person2',
+                     'ix_custom_field_person_id', 'ix_media_person_id'):
+            connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def time_lookups(person_ids):
+    """Return mean milliseconds for the OR-filter and the reciprocal lookup"""
+    start = time.perf_counter()
+    for person_id in person_ids:
+        Relationship.query.filter(
+            (Relationship.person1_id == person_id) | (Relationship.person2_id == person_id)
+        ).all()
+    person_ms = (time.perf_counter() - start) * 1000 / len(person_ids)
+
+    start = time.perf_counter()
+    for person_id in person_ids:
+        Relationship.query.filter_by(
+            person1_id=person_id + 1,
+            person2_id=person_id,
+            relationship_type='child-parent'
+        ).first()
+    reciprocal_ms = (time.perf_counter() - start) * 1000 / len(person_ids)
+    return person_ms, reciprocal_ms
+
+
+def main():
+    edge_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    random.seed(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            drop_indexes()
+            person_count = populate(edge_count)
+            sample = random.sample(range(1, person_count), LOOKUPS)
+
+            before = time_lookups(sample)
+            with db.engine.begin() as connection:
+                migrations._index_relationship_and_child_tables(connection)
+            after = time_lookups(sample)
+
+    print(f"{edge_count} edges, {LOOKUPS} lookups each (mean ms per lookup)")
+    print(f"{'query':<22}{'before':>10}{'after':>10}")
+    print(f"{'person relationships':<22}{before[0]:>10.3f}{after[0]:>10.3f}")
+    print(f"{'reciprocal lookup':<22}{before[1]:>10.3f}{after[1]:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/tree_payload.py
+"""
+Payload size and encode/parse time of the plain and columnar tree formats.
+
+Builds a synthetic tree (no database needed) through TreeService's node and
+link builders, then compares both representations raw and gzipped.
+
+Usage: python benchmarks/tree_payload.py [person_count]
+"""
+import gzip
+import json
+import os
+import random
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.kinship_graph import PersonRecord, EdgeRecord
+from services.tree_service import TreeService
+from utils.tree_format import encode_columnar, decode_columnar
+
+ROUNDS = 5
+
+
+def build_tree(person_count):
+    first_names = ['Anna', 'John', 'Maria', 'Peter', 'Eva', 'Paul', 'Sara', 'Tom']
+    last_names = [f'Family{i}' for i in range(max(person_count // 50, 1))]
+    persons = []
+    for person_id in range(1, person_count + 1):
+        birth = date(random.randint(1700, 2000), random.randint(1, 12), random.randint(1, 28))
+        persons.append(PersonRecord(
+            person_id, random.choice(first_names), random.choice(last_names),
+            random.choice(['male', 'female']), birth, None if random.random() < 0.3 else birth.replace(year=birth.year + 70)
+        ))
+
+    edges = []
+    for child_id in range(3, person_count + 1):
+        for parent_id in random.sample(range(1, child_id), 2):
+            edges.append(EdgeRecord(len(edges) + 1, parent_id, child_id, 'parent-child'))
+        if random.random() < 0.4:
+            edges.append(EdgeRecord(len(edges) + 1, child_id - 1, child_id, 'spouse'))
+    return TreeService._compile_tree_data(persons, edges)
+
+
+def timed(function):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = function()
+    return result, (time.perf_counter() - start) * 1000 / ROUNDS
+
+
+def main():
+    person_count = int(sys.argv[1]) if len(sys.argv) > 1 else 40000
+    random.seed(7)
+    tree = build_tree(person_count)
+
+    plain, plain_encode = timed(lambda: json.dumps(tree, separators=(',', ':')).encode())
+    _, plain_parse = timed(lambda: json.loads(plain))
+
+    columnar, columnar_encode = timed(lambda: json.dumps(encode_columnar(tree), separators=(',', ':')).encode())
+    decoded, columnar_parse = timed(lambda: decode_columnar(json.loads(columnar)))
+    assert decoded == tree
+
+    print(f"{person_count} persons, {len(tree['links'])} links (mean of {ROUNDS} rounds)")
+    print(f"{'format':<10}{'bytes':>12}{'gzip bytes':>12}{'encode ms':>12}{'parse ms':>12}")
+    for name, payload, encode_ms, parse_ms in (
+        ('plain', plain, plain_encode, plain_parse),
+        ('columnar', columnar, columnar_encode, columnar_parse),
+    ):
+        print(f"{name:<10}{len(payload):>12}{len(gzip.compress(payload)):>12}{encode_ms:>12.1f}{parse_ms:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
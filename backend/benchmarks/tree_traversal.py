@@ -0,0 +1,78 @@
+# benchmarks/tree_traversal.py
+"""
+Subtree traversal engines of TreeService.collect_subtree: the recursive query
+in SQLite against the in-memory kinship graph.
+
+Uses the synthetic pedigree of benchmarks/kinship_query.py and times random
+roots at several depths: the sql engine, the graph engine on a loaded graph,
+and the graph engine when every request has to load the graph first (what a
+fresh worker process pays). Each engine's result is checked against the
+others.
+
+Usage: python benchmarks/tree_traversal.py [person_count]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db
+from services.kinship_graph import get_graph, invalidate_graph
+from services.tree_service import TreeService
+from benchmarks.kinship_query import build_app, populate_pedigree, percentile
+import migrations  # noqa: F401  (registers every model)
+
+ROOTS = 20
+COLD_ROOTS = 3
+DEPTHS = (3, 6, 9)
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    person_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    random.seed(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            populate_pedigree(person_count)
+            roots = random.sample(range(1, person_count + 1), ROOTS)
+
+            timings = {}
+            sizes = {}
+            for depth in DEPTHS:
+                for root_id in roots[:COLD_ROOTS]:
+                    invalidate_graph()
+                    cold, elapsed = timed(TreeService.collect_subtree, root_id, depth, engine='graph')
+                    timings.setdefault((depth, 'graph, cold'), []).append(elapsed)
+
+                get_graph()
+                for root_id in roots:
+                    by_graph, elapsed = timed(TreeService.collect_subtree, root_id, depth, engine='graph')
+                    timings.setdefault((depth, 'graph, loaded'), []).append(elapsed)
+                    by_sql, elapsed = timed(TreeService.collect_subtree, root_id, depth, engine='sql')
+                    timings.setdefault((depth, 'sql'), []).append(elapsed)
+                    assert by_sql == by_graph
+                    sizes.setdefault(depth, []).append(len(by_sql[0]))
+                assert cold == TreeService.collect_subtree(roots[COLD_ROOTS - 1], depth, engine='sql')
+
+    print(f"{person_count} persons, {ROOTS} random roots ({COLD_ROOTS} for cold graph loads), ms per subtree")
+    print(f"{'':<26}{'persons':>10}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}")
+    for (depth, engine), values in timings.items():
+        print(f"{f'depth {depth}, {engine}':<26}{statistics.mean(sizes[depth]):>10.0f}"
+              f"{statistics.mean(values):>10.3f}{percentile(values, 0.5):>10.3f}"
+              f"{percentile(values, 0.95):>10.3f}{max(values):>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
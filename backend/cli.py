@@ -0,0 +1,90 @@
+# backend/cli.py
+"""Flask CLI commands (run with `flask --app app <command>`)"""
+import click
+from flask.cli import with_appcontext
+
+
+@click.command('import-gedcom')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', type=click.IntRange(min=1), default=None,
+              help='Members per transaction (defaults to IMPORT_BATCH_SIZE)')
+@with_appcontext
+def import_gedcom_command(path, batch_size):
+    """Import a GEDCOM 5.5.1 file"""
+    from services.gedcom_service import GedcomService
+
+    def progress(summary):
+        click.echo(f"{summary['persons']} persons, {summary['relationships']} relationships imported")
+
+    summary = GedcomService.import_gedcom_file(path, batch_size, progress)
+    for tag, count in sorted(summary['skipped'].items()):
+        click.echo(f"Skipped {count} {tag} records")
+    for error in summary['errors']:
+        click.echo(f"{error['record']}: {'; '.join(error['errors'])}", err=True)
+    click.echo(
+        f"Imported {summary['persons']} persons, {summary['custom_fields']} custom fields and "
+        f"{summary['relationships']} relationships ({summary['duplicates']} duplicates skipped)"
+    )
+
+
+@click.command('export')
+@click.argument('output', type=click.File('w', encoding='utf-8'))
+@click.option('--format', 'export_format', type=click.Choice(['gedcom', 'ndjson']), default='gedcom')
+@click.option('--root-id', type=int, default=None, help='Only export the subtree around this person')
+@click.option('--depth', type=click.IntRange(min=0), default=None, help='Subtree depth (unlimited by default)')
+@with_appcontext
+def export_command(output, export_format, root_id, depth):
+    """Stream the database (or a subtree) to OUTPUT as GEDCOM or NDJSON; "-" writes to stdout"""
+    from services.export_service import ExportService
+
+    subtree = None
+    if root_id is not None:
+        subtree = ExportService.collect_subtree(root_id, max_depth=depth)
+        if subtree is None:
+            raise click.ClickException(f"Member {root_id} not found")
+
+    iter_lines = ExportService.iter_gedcom if export_format == 'gedcom' else ExportService.iter_ndjson
+    for line in iter_lines(subtree):
+        output.write(line)
+
+
+@click.command('migrate-uploads')
+@click.option('--batch-size', type=click.IntRange(min=1), default=100, help='Media records per transaction')
+@with_appcontext
+def migrate_uploads_command(batch_size):
+    """Move media stored as uploads/<member_id>/<filename> into the content-addressed blob store"""
+    from services.blob_store import BlobStore
+
+    def progress(summary):
+        click.echo(f"{summary['migrated']} media files migrated")
+
+    summary = BlobStore.migrate_legacy_uploads(batch_size, progress)
+    for media_id in summary['missing']:
+        click.echo(f"Media {media_id}: file not found, left in place", err=True)
+    click.echo(
+        f"Migrated {summary['migrated']} media files, {summary['deduplicated']} were duplicates "
+        f"({summary['bytes_saved']} bytes saved)"
+    )
+
+
+@click.command('rebuild-closure')
+@with_appcontext
+def rebuild_closure_command():
+    """Refill the ancestor closure table from the stored parent-child relationships"""
+    from services.closure_service import ClosureService
+
+    def progress(summary):
+        click.echo(f"{summary['rows']} closure rows written for {summary['persons']} persons")
+
+    summary = ClosureService.rebuild(progress)
+    click.echo(f"Rebuilt the ancestor closure: {summary['rows']} rows for {summary['persons']} persons")
+    if not ClosureService.enabled():
+        click.echo("ANCESTOR_CLOSURE is off, so the table will not be kept up to date", err=True)
+
+
+def register_commands(app):
+    """Attach the CLI commands to the app"""
+    app.cli.add_command(import_gedcom_command)
+    app.cli.add_command(export_command)
+    app.cli.add_command(migrate_uploads_command)
+    app.cli.add_command(rebuild_closure_command)
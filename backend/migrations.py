@@ -0,0 +1,210 @@
+# backend/migrations.py
+"""
+Versioned schema migrations.
+
+The schema version is kept in SQLite's PRAGMA user_version. A brand new database
+is created straight from the models and stamped with the latest version; an
+existing database runs every migration newer than its stored version, in order.
+Migrations must be safe to re-run on a schema that already has their changes.
+"""
+import os
+from sqlalchemy import text, inspect
+from models import db
+# Import every model so db.create_all() knows about all tables
+from models.person import Person
+from models.relationship import Relationship, SYMMETRIC_RELATIONSHIP_TYPES
+from models.custom_field import CustomField
+from models.media import Media
+from models.data_revision import DataRevision
+from models.job import Job
+from models.media_upload import MediaUpload
+from models.ancestor_closure import AncestorClosure
+from models.pedigree_diagnostic import PedigreeDiagnostic
+from services.blob_store import BlobStore
+
+
+def _create_tables(connection):
+    """Baseline schema: create any table that does not exist yet"""
+    db.metadata.create_all(bind=connection)
+
+
+def _index_relationship_and_child_tables(connection):
+    """Add covering relationship indexes, a unique edge constraint and person_id indexes"""
+    # Collapse duplicate edges first so the unique index can be built
+    connection.execute(text(
+        "DELETE FROM relationship WHERE id NOT IN ("
+        "SELECT MIN(id) FROM relationship GROUP BY person1_id, relationship_type, person2_id)"
+    ))
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_relationship_edge "
+        "ON relationship (person1_id, relationship_type, person2_id)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_relationship_person2 "
+        "ON relationship (person2_id, relationship_type, person1_id)"
+    ))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_custom_field_person_id ON custom_field (person_id)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_media_person_id ON media (person_id)"))
+
+
+def _collapse_reciprocal_relationships(connection):
+    """Store each link as one canonical row (see Relationship.canonical_edge)"""
+    # child-parent rows that already have their parent-child twin are redundant
+    connection.execute(text(
+        "DELETE FROM relationship WHERE relationship_type = 'child-parent' AND EXISTS ("
+        "SELECT 1 FROM relationship AS twin WHERE twin.relationship_type = 'parent-child' "
+        "AND twin.person1_id = relationship.person2_id AND twin.person2_id = relationship.person1_id)"
+    ))
+    # The rest become parent-child rows pointing from parent to child
+    connection.execute(text(
+        "UPDATE relationship SET person1_id = person2_id, person2_id = person1_id, "
+        "relationship_type = 'parent-child' WHERE relationship_type = 'child-parent'"
+    ))
+
+    symmetric_types = ', '.join(f"'{rel_type}'" for rel_type in sorted(SYMMETRIC_RELATIONSHIP_TYPES))
+    # Drop the reversed copy of symmetric pairs, then put the lower person ID first
+    connection.execute(text(
+        f"DELETE FROM relationship WHERE relationship_type IN ({symmetric_types}) "
+        "AND person1_id > person2_id AND EXISTS ("
+        "SELECT 1 FROM relationship AS twin WHERE twin.relationship_type = relationship.relationship_type "
+        "AND twin.person1_id = relationship.person2_id AND twin.person2_id = relationship.person1_id)"
+    ))
+    connection.execute(text(
+        "UPDATE relationship SET person1_id = person2_id, person2_id = person1_id "
+        f"WHERE relationship_type IN ({symmetric_types}) AND person1_id > person2_id"
+    ))
+
+
+def _index_person_listing_filters(connection):
+    """Indexes backing the member listing surname and birth year filters"""
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_person_last_name_nocase ON person (last_name COLLATE NOCASE, id)"
+    ))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_person_birth_date ON person (birth_date)"))
+
+
+def _create_data_revision(connection):
+    """Single-row revision counter used for ETags and cache invalidation"""
+    DataRevision.__table__.create(bind=connection, checkfirst=True)
+    connection.execute(text("INSERT OR IGNORE INTO data_revision (id, revision) VALUES (1, 1)"))
+
+
+def _create_job_table(connection):
+    """Persistent background job queue"""
+    Job.__table__.create(bind=connection, checkfirst=True)
+
+
+def _track_media_uploads(connection):
+    """Media size and content hash columns, and the resumable upload table"""
+    media_columns = {column['name'] for column in inspect(connection).get_columns('media')}
+    if 'file_size' not in media_columns:
+        connection.execute(text("ALTER TABLE media ADD COLUMN file_size BIGINT"))
+    if 'content_hash' not in media_columns:
+        connection.execute(text("ALTER TABLE media ADD COLUMN content_hash VARCHAR(64)"))
+    MediaUpload.__table__.create(bind=connection, checkfirst=True)
+
+
+def _store_media_by_content(connection):
+    """Original media file names and the file_path index used to count blob references"""
+    media_columns = {column['name'] for column in inspect(connection).get_columns('media')}
+    if 'filename' not in media_columns:
+        connection.execute(text("ALTER TABLE media ADD COLUMN filename VARCHAR(255)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_media_file_path ON media (file_path)"))
+
+
+def _track_media_dimensions(connection):
+    """Media width and height for gallery layouts"""
+    media_columns = {column['name'] for column in inspect(connection).get_columns('media')}
+    for column in ('width', 'height'):
+        if column not in media_columns:
+            connection.execute(text(f"ALTER TABLE media ADD COLUMN {column} INTEGER"))
+
+
+def _create_ancestor_closure(connection):
+    """Ancestor/descendant closure table (filled by `flask rebuild-closure`)"""
+    AncestorClosure.__table__.create(bind=connection, checkfirst=True)
+
+
+def _create_pedigree_diagnostics(connection):
+    """Per-person findings of the pedigree analysis job"""
+    PedigreeDiagnostic.__table__.create(bind=connection, checkfirst=True)
+
+
+def _track_job_workers(connection):
+    """Owner process and heartbeat of running jobs"""
+    job_columns = {column['name'] for column in inspect(connection).get_columns('job')}
+    if 'worker' not in job_columns:
+        connection.execute(text("ALTER TABLE job ADD COLUMN worker VARCHAR(100)"))
+    if 'heartbeat_at' not in job_columns:
+        connection.execute(text("ALTER TABLE job ADD COLUMN heartbeat_at DATETIME"))
+
+
+def _track_upload_offsets(connection):
+    """Received byte count of resumable uploads, the offset chunks are claimed against"""
+    upload_columns = {column['name'] for column in inspect(connection).get_columns('media_upload')}
+    if 'received' in upload_columns:
+        return
+    connection.execute(text("ALTER TABLE media_upload ADD COLUMN received BIGINT NOT NULL DEFAULT 0"))
+    # Uploads in progress resume from what their partial file already holds
+    for (upload_id,) in connection.execute(text("SELECT id FROM media_upload")).all():
+        path = os.path.join(BlobStore.partial_folder(), upload_id)
+        if os.path.exists(path):
+            connection.execute(text("UPDATE media_upload SET received = :received WHERE id = :id"),
+                               {'received': os.path.getsize(path), 'id': upload_id})
+
+
+# (version, description, function) in the order they must be applied
+MIGRATIONS = [
+    (1, 'Create tables', _create_tables),
+    (2, 'Index relationship and child tables', _index_relationship_and_child_tables),
+    (3, 'Collapse reciprocal relationship rows', _collapse_reciprocal_relationships),
+    (4, 'Index person listing filters', _index_person_listing_filters),
+    (5, 'Create data revision counter', _create_data_revision),
+    (6, 'Create job table', _create_job_table),
+    (7, 'Track media sizes, hashes and resumable uploads', _track_media_uploads),
+    (8, 'Store media by content hash', _store_media_by_content),
+    (9, 'Track media dimensions', _track_media_dimensions),
+    (10, 'Create ancestor closure table', _create_ancestor_closure),
+    (11, 'Create pedigree diagnostics table', _create_pedigree_diagnostics),
+    (12, 'Track job workers and heartbeats', _track_job_workers),
+    (13, 'Track resumable upload offsets', _track_upload_offsets),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(connection):
+    """Return the schema version stored in the database"""
+    return connection.execute(text("PRAGMA user_version")).scalar()
+
+
+def _set_schema_version(connection, version):
+    # PRAGMA does not accept bound parameters
+    connection.execute(text(f"PRAGMA user_version = {int(version)}"))
+
+
+def run_migrations():
+    """
+    Bring the database schema up to date.
+
+    Returns:
+        List of (version, description) tuples that were applied
+    """
+    applied = []
+    with db.engine.begin() as connection:
+        version = get_schema_version(connection)
+
+        if version == 0 and not inspect(connection).get_table_names():
+            # Fresh database: the models already describe the latest schema
+            _create_tables(connection)
+            _set_schema_version(connection, LATEST_VERSION)
+            return [(LATEST_VERSION, 'Create latest schema')]
+
+        for migration_version, description, migrate in MIGRATIONS:
+            if migration_version <= version:
+                continue
+            migrate(connection)
+            _set_schema_version(connection, migration_version)
+            applied.append((migration_version, description))
+
+    return applied
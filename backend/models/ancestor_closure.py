@@ -0,0 +1,19 @@
+from . import db
+
+class AncestorClosure(db.Model):
+    """
+    One row per (ancestor, descendant) pair along parent-child relationships,
+    with the fewest generations between them. Persons are not paired with
+    themselves. Kept by ClosureService when ANCESTOR_CLOSURE is enabled.
+    """
+    __tablename__ = 'ancestor_closure'
+    __table_args__ = (
+        # Descendancy charts and descendant counts, nearest generations first
+        db.Index('ix_ancestor_closure_ancestor', 'ancestor_id', 'distance', 'descendant_id'),
+        # Pedigree charts
+        db.Index('ix_ancestor_closure_descendant', 'descendant_id', 'distance', 'ancestor_id'),
+    )
+
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('person.id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('person.id', ondelete='CASCADE'), primary_key=True)
+    distance = db.Column(db.Integer, nullable=False)
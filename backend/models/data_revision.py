@@ -0,0 +1,27 @@
+from sqlalchemy import update
+from . import db
+
+class DataRevision(db.Model):
+    """Single-row counter bumped by every write to family data"""
+    id = db.Column(db.Integer, primary_key=True)
+    revision = db.Column(db.Integer, nullable=False, default=0)
+    
+    @staticmethod
+    def current():
+        """Return the latest committed revision (0 for an untouched database)"""
+        return db.session.query(DataRevision.revision).filter(DataRevision.id == 1).scalar() or 0
+    
+    @staticmethod
+    def bump():
+        """
+        Increment the revision inside the current transaction.
+        
+        Call right before committing a write; returns the new revision.
+        """
+        result = db.session.execute(
+            update(DataRevision).where(DataRevision.id == 1).values(revision=DataRevision.revision + 1)
+        )
+        if result.rowcount == 0:
+            db.session.add(DataRevision(id=1, revision=1))
+            db.session.flush()
+        return DataRevision.current()
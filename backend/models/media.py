@@ -1,20 +1,43 @@
 from datetime import datetime
 from . import db
+from utils.media_derivatives import derivative_paths, derivative_source_kind
 
 class Media(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    person_id = db.Column(db.Integer, db.ForeignKey('person.id', ondelete='CASCADE'), nullable=False)
+    person_id = db.Column(db.Integer, db.ForeignKey('person.id', ondelete='CASCADE'), nullable=False, index=True)
     media_type = db.Column(db.String(10), nullable=False)
-    file_path = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(255), nullable=False, index=True)  # Blob path, shared by identical files
+    filename = db.Column(db.String(255), nullable=True)  # Name of the uploaded file
     title = db.Column(db.String(100), nullable=True)
     description = db.Column(db.Text, nullable=True)
+    file_size = db.Column(db.BigInteger, nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True)  # SHA-256 of the file, hex
+    width = db.Column(db.Integer, nullable=True)  # Pixels, of the image or the video frame
+    height = db.Column(db.Integer, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def to_dict(self):
         return {
             'id': self.id,
+            'person_id': self.person_id,
             'media_type': self.media_type,
             'file_path': self.file_path,
+            'filename': self.filename,
             'title': self.title,
-            'description': self.description
+            'description': self.description,
+            'file_size': self.file_size,
+            'content_hash': self.content_hash,
+            'width': self.width,
+            'height': self.height,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'derivatives': self.derivative_urls()
+        }
+    
+    def derivative_urls(self):
+        """{size: {format: URL}} of the preview images of this media, or {} if it has none"""
+        if not self.content_hash or not derivative_source_kind(self.file_path):
+            return {}
+        return {
+            size: {name: f"/uploads/{path}" for name, path in formats.items()}
+            for size, formats in derivative_paths(self.content_hash).items()
         }
\ No newline at end of file
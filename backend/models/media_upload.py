@@ -0,0 +1,26 @@
+from datetime import datetime
+from . import db
+
+class MediaUpload(db.Model):
+    """A resumable media upload in progress; the bytes received so far live in a partial file"""
+    id = db.Column(db.String(32), primary_key=True)
+    person_id = db.Column(db.Integer, db.ForeignKey('person.id', ondelete='CASCADE'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    media_type = db.Column(db.String(10), nullable=True)
+    title = db.Column(db.String(100), nullable=True)
+    description = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self, offset=None):
+        return {
+            'id': self.id,
+            'person_id': self.person_id,
+            'filename': self.filename,
+            'total_size': self.total_size,
+            'offset': offset,
+            'media_type': self.media_type,
+            'title': self.title,
+            'description': self.description
+        }
@@ -0,0 +1,35 @@
+from . import db
+
+class PedigreeDiagnostic(db.Model):
+    """
+    Findings of the last pedigree analysis for one person: the loop of
+    parent-child relationships they are part of, if any, and the pedigree
+    collapse (implex) among their nearest generations of ancestors. Only
+    persons with a finding get a row. Rewritten by PedigreeService.analyze.
+    """
+    __tablename__ = 'pedigree_diagnostic'
+    __table_args__ = (
+        # Most collapsed pedigrees first
+        db.Index('ix_pedigree_diagnostic_implex', 'implex'),
+        # Members of each loop
+        db.Index('ix_pedigree_diagnostic_cycle', 'cycle_id'),
+    )
+
+    person_id = db.Column(db.Integer, db.ForeignKey('person.id', ondelete='CASCADE'), primary_key=True)
+    # Persons in the same loop share a cycle_id; None outside loops
+    cycle_id = db.Column(db.Integer, nullable=True)
+    # Distinct ancestors within the analyzed generations
+    ancestors = db.Column(db.Integer, nullable=False, default=0)
+    # Ancestor positions in the pedigree chart within those generations (an ancestor reached along two lines fills two)
+    ancestor_slots = db.Column(db.Integer, nullable=False, default=0)
+    # 1 - ancestors / ancestor_slots: the share of positions filled by someone already in the chart
+    implex = db.Column(db.Float, nullable=False, default=0.0)
+
+    def to_dict(self):
+        return {
+            'person_id': self.person_id,
+            'cycle_id': self.cycle_id,
+            'ancestors': self.ancestors,
+            'ancestor_slots': self.ancestor_slots,
+            'implex': self.implex
+        }
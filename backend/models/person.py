@@ -16,16 +16,24 @@ class Person(db.Model):
     custom_fields = db.relationship('CustomField', backref='person', lazy=True, cascade="all, delete-orphan")
     media = db.relationship('Media', backref='person', lazy=True, cascade="all, delete-orphan")
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'first_name': self.first_name,
-            'last_name': self.last_name,
-            'full_name': f"{self.first_name} {self.last_name}",
-            'gender': self.gender,
-            'birth_date': self.birth_date.isoformat() if self.birth_date else None,
-            'death_date': self.death_date.isoformat() if self.death_date else None,
-            'biography': self.biography,
-            'custom_fields': [field.to_dict() for field in self.custom_fields],
-            'media': [item.to_dict() for item in self.media]
-        }
\ No newline at end of file
+    def to_dict(self, fields=None):
+        """Serialize the person; fields limits the output to a subset of keys"""
+        serializers = {
+            'id': lambda: self.id,
+            'first_name': lambda: self.first_name,
+            'last_name': lambda: self.last_name,
+            'full_name': lambda: f"{self.first_name} {self.last_name}",
+            'gender': lambda: self.gender,
+            'birth_date': lambda: self.birth_date.isoformat() if self.birth_date else None,
+            'death_date': lambda: self.death_date.isoformat() if self.death_date else None,
+            'biography': lambda: self.biography,
+            'custom_fields': lambda: [field.to_dict() for field in self.custom_fields],
+            'media': lambda: [item.to_dict() for item in self.media]
+        }
+        # Only requested keys are evaluated, so unrequested columns and collections are never loaded
+        return {key: serialize() for key, serialize in serializers.items() if fields is None or key in fields}
+
+
+# Index for surname prefix filters (case-insensitive, keyset-ordered by id)
+db.Index('ix_person_last_name_nocase', Person.last_name.collate('NOCASE'), Person.id)
+db.Index('ix_person_birth_date', Person.birth_date)
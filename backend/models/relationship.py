@@ -1,7 +1,17 @@
 from datetime import datetime
 from . import db
 
+# Types stored once per pair, with person1_id < person2_id
+SYMMETRIC_RELATIONSHIP_TYPES = {'spouse', 'sibling'}
+
 class Relationship(db.Model):
+    __table_args__ = (
+        # One row per (person1, type, person2); also covers lookups by person1
+        db.Index('uq_relationship_edge', 'person1_id', 'relationship_type', 'person2_id', unique=True),
+        # Covers lookups by person2 and reciprocal checks
+        db.Index('ix_relationship_person2', 'person2_id', 'relationship_type', 'person1_id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     person1_id = db.Column(db.Integer, db.ForeignKey('person.id', ondelete='CASCADE'), nullable=False)
     person2_id = db.Column(db.Integer, db.ForeignKey('person.id', ondelete='CASCADE'), nullable=False)
@@ -13,11 +23,30 @@ class Relationship(db.Model):
     person1 = db.relationship('Person', foreign_keys=[person1_id])
     person2 = db.relationship('Person', foreign_keys=[person2_id])
     
-    def to_dict(self):
-        return {
+    def to_dict(self, fields=None):
+        """Serialize the relationship; fields limits the output to a subset of keys"""
+        data = {
             'id': self.id,
             'person1_id': self.person1_id,
             'person2_id': self.person2_id,
             'relationship_type': self.relationship_type,
             'description': self.description
-        }
\ No newline at end of file
+        }
+        if fields is not None:
+            data = {key: value for key, value in data.items() if key in fields}
+        return data
+    
+    @staticmethod
+    def canonical_edge(person1_id, person2_id, relationship_type):
+        """
+        Return the (person1_id, person2_id, relationship_type) a relationship is stored as.
+        
+        Parent links are always stored as parent-child rows pointing from parent to child,
+        and symmetric relationships are stored once with the lower person ID first.
+        The inverse view (child-parent, reversed spouse/sibling) is derived on read.
+        """
+        if relationship_type == 'child-parent':
+            return person2_id, person1_id, 'parent-child'
+        if relationship_type in SYMMETRIC_RELATIONSHIP_TYPES and person1_id > person2_id:
+            return person2_id, person1_id, relationship_type
+        return person1_id, person2_id, relationship_type
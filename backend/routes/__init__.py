@@ -1,4 +1,10 @@
 from .members import members_bp
 from .relationships import relationships_bp
 from .family_tree import family_tree_bp
-from .tree import tree_bp
\ No newline at end of file
+from .tree import tree_bp
+from .imports import imports_bp
+from .exports import exports_bp
+from .jobs import jobs_bp
+from .media import media_bp
+from .kinship import kinship_bp
+from .diagnostics import diagnostics_bp
@@ -0,0 +1,42 @@
+# routes/diagnostics.py
+import logging
+from flask import Blueprint, request, jsonify
+from services.pedigree_service import PedigreeService, DEFAULT_REPORT_SIZE
+from utils.validators import MAX_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+diagnostics_bp = Blueprint('diagnostics', __name__, url_prefix='/api/diagnostics')
+
+NO_ANALYSIS_ERROR = 'No pedigree analysis has finished yet; queue one with POST /api/jobs {"kind": "pedigree-analysis"}'
+
+@diagnostics_bp.route('/pedigree', methods=['GET'])
+def get_pedigree_report():
+    """
+    Findings of the latest pedigree analysis job
+
+    Lists the loops in the parent-child relationships (people who are their
+    own ancestors) with their members and the persons with the most pedigree
+    collapse (implex); ?limit= caps both lists (default 20). stale is true
+    once the tree has changed since the analysis ran.
+    """
+    limit = request.args.get('limit', DEFAULT_REPORT_SIZE, type=int)
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return jsonify({'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'}), 400
+
+    report = PedigreeService.report(limit)
+    if report is None:
+        return jsonify({'error': NO_ANALYSIS_ERROR}), 404
+    logger.debug(f"Pedigree report with {len(report['cycles'])} loops")
+    return jsonify(report)
+
+@diagnostics_bp.route('/pedigree/<int:member_id>', methods=['GET'])
+def get_member_pedigree_report(member_id):
+    """Implex of one member and the loop they are part of, from the latest pedigree analysis"""
+    if PedigreeService.latest_analysis() is None:
+        return jsonify({'error': NO_ANALYSIS_ERROR}), 404
+
+    report = PedigreeService.person_report(member_id)
+    if report is None:
+        return jsonify({'error': 'Member not found'}), 404
+    return jsonify(report)
@@ -0,0 +1,51 @@
+# routes/exports.py
+import logging
+from flask import Blueprint, request, jsonify
+from services.export_service import ExportService
+from utils.streaming import streaming_response, line_chunks, NDJSON_MIMETYPE
+from routes.tree import parse_traversal_options
+
+logger = logging.getLogger(__name__)
+
+exports_bp = Blueprint('exports', __name__, url_prefix='/api/export')
+
+GEDCOM_MIMETYPE = 'application/x-gedcom'
+
+# format -> (mimetype, download file extension, line generator)
+EXPORT_FORMATS = {
+    'gedcom': (GEDCOM_MIMETYPE, 'ged', ExportService.iter_gedcom),
+    'ndjson': (NDJSON_MIMETYPE, 'ndjson', ExportService.iter_ndjson)
+}
+
+@exports_bp.route('', methods=['GET'])
+def export_tree():
+    """
+    Stream the database as a file download.
+    
+    Query parameters:
+        format: gedcom (default) or ndjson
+        root_id: Only export the subtree around this person; depth, max_nodes and
+                 directions work as for /api/tree
+    """
+    export_format = request.args.get('format', 'gedcom')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    mimetype, extension, iter_lines = EXPORT_FORMATS[export_format]
+    
+    subtree = None
+    filename = f'genetree.{extension}'
+    root_id = request.args.get('root_id', type=int)
+    if root_id is not None:
+        try:
+            options = parse_traversal_options(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        subtree = ExportService.collect_subtree(root_id, **options)
+        if subtree is None:
+            return jsonify({'error': 'Member not found'}), 404
+        filename = f'genetree-{root_id}.{extension}'
+    
+    logger.debug(f"Streaming {export_format} export (root_id={root_id})")
+    response = streaming_response(line_chunks(iter_lines(subtree)), mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
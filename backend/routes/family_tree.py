@@ -1,13 +1,22 @@
 from flask import Blueprint, jsonify
 from models.person import Person
 from models.relationship import Relationship
+from services.tree_service import TreeService
+from services.kinship_graph import locked_graph
+from utils.streaming import wants_stream, stream_tree
+from utils.http_cache import conditional_on_revision
 
 family_tree_bp = Blueprint('family_tree', __name__, url_prefix='/api/family_tree')
 
 
 
 @family_tree_bp.route('', methods=['GET'])
+@conditional_on_revision
 def get_family_tree():
+    if wants_stream():
+        # Stream nodes and links straight from the database cursors
+        return stream_tree(TreeService.iter_full_tree_nodes(), TreeService.iter_full_tree_links())
+    
     try:
         # Fetch all persons
         persons = Person.query.all()
@@ -28,12 +37,15 @@ def get_family_tree():
         return jsonify({"error": str(e)}), 500
 
 @family_tree_bp.route('/root/<int:person_id>', methods=['GET'])
+@conditional_on_revision
 def get_family_tree_from_root(person_id):
     # Verify the person exists
-    root_person = Person.query.get_or_404(person_id)
+    with locked_graph() as graph:
+        if person_id not in graph.persons:
+            return jsonify({'error': 'Person not found'}), 404
     
-    # Build tree data recursively
-    tree_data = build_tree_from_root(root_person)
+    # Build tree data from the in-memory graph
+    tree_data = TreeService.get_tree_from_root(person_id)
     
     return jsonify(tree_data)
 
@@ -54,60 +66,4 @@ def create_link(relationship):
         'source': relationship.person1_id,
         'target': relationship.person2_id,
         'type': relationship.relationship_type
-    }
-
-def build_tree_from_root(root_person, max_depth=3, current_depth=0, visited=None):
-    """
-    Recursively build a family tree starting from a root person.
-    
-    Args:
-        root_person: The Person object to start from
-        max_depth: Maximum depth to traverse (prevent infinite recursion)
-        current_depth: Current depth in the recursion
-        visited: Set of visited person IDs to prevent cycles
-    
-    Returns:
-        Dict with nodes and links representing the family tree
-    """
-    if visited is None:
-        visited = set()
-    
-    # Don't recurse beyond max_depth
-    if current_depth > max_depth:
-        return {'nodes': [], 'links': []}
-    
-    # Add this person's node
-    nodes = [create_node(root_person)]
-    links = []
-    
-    # If already visited, don't explore further to prevent cycles
-    if root_person.id in visited:
-        return {'nodes': nodes, 'links': []}
-    
-    # Mark as visited
-    visited.add(root_person.id)
-    
-    # Get all relationships for this person
-    relationships = Relationship.query.filter(
-        (Relationship.person1_id == root_person.id) | (Relationship.person2_id == root_person.id)
-    ).all()
-    
-    for rel in relationships:
-        # Determine the other person in this relationship
-        other_person_id = rel.person2_id if rel.person1_id == root_person.id else rel.person1_id
-        other_person = Person.query.get(other_person_id)
-        
-        if other_person:
-            # Always add link between root and other person
-            links.append(create_link(rel))
-            
-            # Only recurse if not already visited
-            if other_person.id not in visited:
-                # Recursively get the subtree for the other person
-                subtree = build_tree_from_root(other_person, max_depth, current_depth + 1, visited)
-                
-                # Add subtree nodes and links
-                nodes.extend(subtree['nodes'])
-                links.extend(subtree['links'])
-    
-    return {'nodes': nodes, 'links': links}
\ No newline at end of file
+    }
\ No newline at end of file
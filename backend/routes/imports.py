@@ -0,0 +1,58 @@
+# routes/imports.py
+import logging
+import os
+import shutil
+import tempfile
+from flask import Blueprint, request, jsonify, current_app
+from services.job_service import JobService
+from routes.jobs import job_accepted
+
+logger = logging.getLogger(__name__)
+
+imports_bp = Blueprint('imports', __name__, url_prefix='/api/import')
+
+# Uploads are copied to disk in chunks of this size, never read whole
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# GEDCOM files can be much larger than media uploads (GEDCOM_MAX_CONTENT_LENGTH config)
+DEFAULT_GEDCOM_MAX_CONTENT_LENGTH = 1024 * 1024 * 1024
+
+@imports_bp.route('/gedcom', methods=['POST'])
+def import_gedcom():
+    """
+    Start a background GEDCOM import.
+    
+    Accepts a multipart upload (field "file") or the raw file as the request body.
+    The upload is spooled to a temporary file and imported by a background job;
+    responds 202 with the job, whose status URL (/api/jobs/<id>) is in the Location header.
+    Optional ?batch_size= sets the members per transaction.
+    """
+    batch_size = request.args.get('batch_size', type=int)
+    if batch_size is not None and batch_size < 1:
+        return jsonify({'error': 'batch_size must be at least 1'}), 400
+    
+    request.max_content_length = current_app.config.get(
+        'GEDCOM_MAX_CONTENT_LENGTH', DEFAULT_GEDCOM_MAX_CONTENT_LENGTH
+    )
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None or upload.filename == '':
+            return jsonify({'error': 'No file provided'}), 400
+        source = upload.stream
+    else:
+        source = request.stream
+    
+    spool = tempfile.NamedTemporaryFile(prefix='gedcom-', suffix='.ged', delete=False)
+    try:
+        with spool:
+            shutil.copyfileobj(source, spool, UPLOAD_CHUNK_SIZE)
+        if os.path.getsize(spool.name) == 0:
+            os.remove(spool.name)
+            return jsonify({'error': 'Empty GEDCOM file'}), 400
+    except Exception:
+        os.remove(spool.name)
+        raise
+    
+    logger.debug(f"Queued GEDCOM import from {spool.name}")
+    job = JobService.submit('gedcom-import', {'path': spool.name, 'batch_size': batch_size})
+    return job_accepted(job)
@@ -0,0 +1,79 @@
+# routes/jobs.py
+import os
+from flask import Blueprint, request, jsonify, send_from_directory
+from services.job_service import JobService
+from models.job import FINISHED_JOB_STATUSES
+from utils.validators import validate_export_job_params, validate_pedigree_analysis_params, MAX_PAGE_SIZE
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+
+# Job kinds that can be queued directly; imports go through /api/import since they need an upload
+SUBMITTABLE_JOB_KINDS = {
+    'export': validate_export_job_params,
+    'media-derivatives': lambda params: (True, []),
+    'pedigree-analysis': validate_pedigree_analysis_params
+}
+
+@jobs_bp.route('', methods=['GET'])
+def list_jobs():
+    """Recent jobs, newest first; filter with ?status= and ?kind=, cap with ?limit="""
+    limit = request.args.get('limit', 50, type=int)
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return jsonify({'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'}), 400
+    jobs = JobService.list_jobs(request.args.get('status'), request.args.get('kind'), limit)
+    return jsonify([job.to_dict() for job in jobs])
+
+@jobs_bp.route('', methods=['POST'])
+def submit_job():
+    """Queue a job: {"kind": "export" | "media-derivatives" | "pedigree-analysis", "params": {...}}"""
+    data = request.get_json(silent=True) or {}
+    kind = data.get('kind')
+    if kind not in SUBMITTABLE_JOB_KINDS:
+        return jsonify({'error': f"kind must be one of: {', '.join(sorted(SUBMITTABLE_JOB_KINDS))}"}), 400
+    
+    params = data.get('params', {})
+    is_valid, errors = SUBMITTABLE_JOB_KINDS[kind](params)
+    if not is_valid:
+        return jsonify({'error': 'Validation failed', 'details': errors}), 400
+    
+    job = JobService.submit(kind, params)
+    return job_accepted(job)
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = JobService.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@jobs_bp.route('/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued job, or ask a running one to stop at its next progress report"""
+    job = JobService.cancel_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status in FINISHED_JOB_STATUSES and job.status != 'cancelled':
+        return jsonify({'error': f'Job already {job.status}', 'job': job.to_dict()}), 409
+    return jsonify(job.to_dict())
+
+@jobs_bp.route('/<job_id>/download', methods=['GET'])
+def download_job_file(job_id):
+    """Download the file written by a finished export job"""
+    job = JobService.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.kind != 'export' or job.status != 'finished':
+        return jsonify({'error': 'Job has no file to download'}), 409
+    
+    file_name = job.result['file']
+    if not os.path.exists(os.path.join(JobService.export_folder(), file_name)):
+        return jsonify({'error': 'Export file no longer exists'}), 410
+    return send_from_directory(JobService.export_folder(), file_name, as_attachment=True,
+                               download_name=f"genetree.{file_name.rsplit('.', 1)[1]}")
+
+def job_accepted(job):
+    """202 response for a queued job with its status URL in the Location header"""
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers['Location'] = f'/api/jobs/{job.id}'
+    return response
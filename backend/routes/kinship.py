@@ -0,0 +1,51 @@
+# routes/kinship.py
+import logging
+from flask import Blueprint, request, jsonify
+from services.kinship_service import KinshipService, DEFAULT_MAX_PATH_LENGTH
+from utils.validators import validate_kinship_params
+from utils.http_cache import conditional_on_revision
+
+logger = logging.getLogger(__name__)
+
+kinship_bp = Blueprint('kinship', __name__, url_prefix='/api/kinship')
+
+@kinship_bp.route('', methods=['GET'])
+@conditional_on_revision
+def get_kinship():
+    """
+    How person b is related to person a: ?a=<id>&b=<id>
+    
+    Optional max_length limits the path search (in relationships, default 40).
+    Returns the relationship name, whether it is by blood, the degree of
+    consanguinity and the path of people and relationship steps between them.
+    """
+    is_valid, errors, params = validate_kinship_params(request.args)
+    if not is_valid:
+        return jsonify({'error': 'Validation failed', 'details': errors}), 400
+    
+    logger.debug(f"Kinship of {params['b']} to {params['a']}")
+    result = KinshipService.relationship_between(
+        params['a'], params['b'], params['max_length'] or DEFAULT_MAX_PATH_LENGTH
+    )
+    if result is None:
+        return jsonify({'error': 'Member not found'}), 404
+    return jsonify(result)
+
+@kinship_bp.route('/common-ancestors', methods=['GET'])
+@conditional_on_revision
+def get_common_ancestors():
+    """
+    Common ancestors of persons a and b: ?a=<id>&b=<id>
+    
+    Returns the IDs of every common ancestor (a person counts as their own
+    ancestor) and the nearest ones, with the generations up from each person.
+    """
+    is_valid, errors, params = validate_kinship_params(request.args)
+    if not is_valid:
+        return jsonify({'error': 'Validation failed', 'details': errors}), 400
+    
+    logger.debug(f"Common ancestors of {params['a']} and {params['b']}")
+    result = KinshipService.common_ancestors(params['a'], params['b'])
+    if result is None:
+        return jsonify({'error': 'Member not found'}), 404
+    return jsonify(result)
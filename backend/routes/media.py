@@ -0,0 +1,48 @@
+# routes/media.py
+import logging
+import os
+import stat as stat_module
+from flask import Blueprint, current_app, abort
+from werkzeug.security import safe_join
+from services.derivative_service import DerivativeService
+from utils.media_derivatives import parse_derivative_path
+from utils.media_serving import send_media_file, is_servable_path
+
+logger = logging.getLogger(__name__)
+
+media_bp = Blueprint('media', __name__)
+
+@media_bp.route('/uploads/<path:filename>', methods=['GET', 'HEAD'])
+def serve_upload(filename):
+    """Serve uploaded media and their derivatives (see utils.media_serving)"""
+    requested_path = safe_join(current_app.config['UPLOAD_FOLDER'], filename)
+    if requested_path is None:
+        logger.warning(f"Attempted directory traversal attack: {filename}")
+        abort(403)  # Forbidden
+    if not is_servable_path(filename):
+        abort(404)
+
+    try:
+        stat = os.stat(requested_path)
+    except FileNotFoundError:
+        # Thumbnails that were never generated (or were cleaned up) are generated on first request
+        stat = _generate_derivative(filename, requested_path)
+        if stat is None:
+            logger.debug(f"File not found: {filename}")
+            abort(404)
+
+    if not stat_module.S_ISREG(stat.st_mode):
+        abort(404)
+    return send_media_file(requested_path, filename, stat)
+
+def _generate_derivative(filename, requested_path):
+    """os.stat of a derivative after generating it, or None if it cannot be generated"""
+    content_hash = parse_derivative_path(filename)
+    if not content_hash:
+        return None
+    try:
+        if DerivativeService.ensure(content_hash):
+            return os.stat(requested_path)
+    except Exception as e:
+        logger.error(f"Error generating {filename}: {str(e)}")
+    return None
@@ -1,22 +1,50 @@
 # routes/members.py (modified to use services and utils)
 from flask import Blueprint, request, jsonify, current_app
-from services.member_service import MemberService
+from services.member_service import MemberService, MEMBER_FIELD_COLUMNS
 from models.person import Person
-from utils.validators import validate_member_data, validate_media_upload
+from utils.validators import (validate_member_data, validate_media_upload, validate_listing_params,
+                              validate_member_filters, validate_media_filters, validate_lineage_params)
+from utils.pagination import add_next_page_link
+from utils.streaming import wants_stream, stream_list, read_ndjson, NDJSON_MIMETYPE
 from services.tree_service import TreeService
+from services.closure_service import ClosureService
+from utils.http_cache import conditional_on_revision
+from utils.uploads import UploadTooLarge
+from services.upload_service import UploadService, UploadOffsetMismatch
 
 members_bp = Blueprint('members', __name__, url_prefix='/api/members')
 
 @members_bp.route('', methods=['GET'])
+@conditional_on_revision
 def get_all_members():
+    """
+    List members.
+    
+    Query parameters:
+        after_id, limit: Keyset pagination; a Link rel="next" header points at the next page
+        fields: Comma-separated subset of member fields to return
+        surname, birth_year_min, birth_year_max, gender: Filters
+        stream=1 or format=ndjson (or Accept: application/x-ndjson): Stream the listing
+    """
+    is_valid, errors, params = validate_listing_params(request.args, MEMBER_FIELD_COLUMNS)
+    filters_valid, filter_errors, filters = validate_member_filters(request.args)
+    if not is_valid or not filters_valid:
+        return jsonify({'error': 'Validation failed', 'details': errors + filter_errors}), 400
+    
+    if wants_stream():
+        members = MemberService.iter_members(**params, **filters)
+        return stream_list(member.to_dict(params['fields']) for member in members)
+    
     try:
-        members = Person.query.all()
-        return jsonify([member.to_dict() for member in members])
+        members = MemberService.list_members(**params, **filters)
+        response = jsonify([member.to_dict(params['fields']) for member in members])
+        return add_next_page_link(response, members, params['limit'])
     except Exception as e:
         print(f"ERROR in get_all_members: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 @members_bp.route('/<int:member_id>', methods=['GET'])
+@conditional_on_revision
 def get_member(member_id):
     member = MemberService.get_member_by_id(member_id)
     if not member:
@@ -38,6 +66,33 @@ def create_member():
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
+@members_bp.route('/bulk', methods=['POST'])
+def bulk_create_members():
+    """
+    Create many members in batched transactions.
+    
+    Accepts a JSON array of members, or NDJSON (Content-Type: application/x-ndjson)
+    with one member per line. Optional ?batch_size= sets the rows per transaction.
+    Invalid rows are reported by index and do not stop the import.
+    """
+    batch_size = request.args.get('batch_size', type=int)
+    if batch_size is not None and batch_size < 1:
+        return jsonify({'error': 'batch_size must be at least 1'}), 400
+    
+    if request.mimetype == NDJSON_MIMETYPE:
+        records = read_ndjson(request.stream)
+    else:
+        records = request.get_json(silent=True)
+        if not isinstance(records, list):
+            return jsonify({'error': 'Expected a JSON array of members'}), 400
+    
+    result = MemberService.bulk_create_members(records, batch_size)
+    return jsonify({
+        'created': len(result['created']),
+        'ids': result['created'],
+        'errors': result['errors']
+    }), 201 if result['created'] else 400
+
 @members_bp.route('/<int:member_id>', methods=['PUT'])
 def update_member(member_id):
     data = request.json
@@ -61,6 +116,88 @@ def delete_member(member_id):
     except ValueError as e:
         return jsonify({'error': str(e)}), 404
 
+@members_bp.route('/<int:member_id>/media', methods=['GET'])
+@conditional_on_revision
+def list_member_media(member_id):
+    """
+    List a member's media with their metadata and preview URLs.
+    
+    Query parameters:
+        after_id, limit: Keyset pagination; a Link rel="next" header points at the next page
+        type: Only return photo or video media
+    """
+    is_valid, errors, params = validate_listing_params(request.args, ())
+    filters_valid, filter_errors, filters = validate_media_filters(request.args)
+    if not is_valid or not filters_valid:
+        return jsonify({'error': 'Validation failed', 'details': errors + filter_errors}), 400
+    
+    media = MemberService.list_media([member_id], params['after_id'], params['limit'], filters['media_type'])
+    # Only an empty page needs the extra lookup to tell "no media" from "no member"
+    if not media and not MemberService.member_exists(member_id):
+        return jsonify({'error': 'Member not found'}), 404
+    response = jsonify([item.to_dict() for item in media])
+    return add_next_page_link(response, media, params['limit'])
+
+@members_bp.route('/media', methods=['GET'])
+@conditional_on_revision
+def list_members_media():
+    """
+    Media of several members in one request: ?member_ids=1,2,3 (optionally &type=photo|video)
+    
+    Returns an object mapping each requested member ID to its media list;
+    unknown IDs map to an empty list.
+    """
+    is_valid, errors, filters = validate_media_filters(request.args)
+    if is_valid and filters['member_ids'] is None:
+        is_valid, errors = False, ["member_ids is required"]
+    if not is_valid:
+        return jsonify({'error': 'Validation failed', 'details': errors}), 400
+    
+    grouped = {str(member_id): [] for member_id in filters['member_ids']}
+    for item in MemberService.list_media(filters['member_ids'], media_type=filters['media_type']):
+        grouped[str(item.person_id)].append(item.to_dict())
+    return jsonify(grouped)
+
+@members_bp.route('/<int:member_id>/ancestors', methods=['GET'])
+@conditional_on_revision
+def list_member_ancestors(member_id):
+    """Pedigree of a member: ancestors with their distance in generations (?depth= limits it)"""
+    return lineage_response(member_id, ClosureService.ancestors)
+
+@members_bp.route('/<int:member_id>/descendants', methods=['GET'])
+@conditional_on_revision
+def list_member_descendants(member_id):
+    """Descendancy of a member: descendants with their distance in generations (?depth= limits it)"""
+    return lineage_response(member_id, ClosureService.descendants)
+
+@members_bp.route('/descendant-counts', methods=['GET'])
+@conditional_on_revision
+def get_descendant_counts():
+    """
+    Descendant counts of several members: ?member_ids=1,2,3
+    
+    Returns an object mapping each requested member ID to its number of
+    descendants; unknown IDs map to 0.
+    """
+    is_valid, errors, params = validate_lineage_params(request.args)
+    if is_valid and params['member_ids'] is None:
+        is_valid, errors = False, ["member_ids is required"]
+    if not is_valid:
+        return jsonify({'error': 'Validation failed', 'details': errors}), 400
+    
+    counts = ClosureService.descendant_counts(params['member_ids'])
+    return jsonify({str(member_id): count for member_id, count in counts.items()})
+
+def lineage_response(member_id, lineage):
+    is_valid, errors, params = validate_lineage_params(request.args)
+    if not is_valid:
+        return jsonify({'error': 'Validation failed', 'details': errors}), 400
+    
+    members = lineage(member_id, params['max_depth'])
+    if members is None:
+        return jsonify({'error': 'Member not found'}), 404
+    return jsonify(members)
+
 @members_bp.route('/<int:member_id>/media', methods=['POST'])
 def upload_media(member_id):
     # Validate file upload
@@ -75,12 +212,99 @@ def upload_media(member_id):
     try:
         title = request.form.get('title', '')
         description = request.form.get('description', '')
+        media_type = request.form.get('media_type', '')
         
-        new_media = MemberService.save_media(member_id, file, title, description)
+        new_media = MemberService.save_media(member_id, file, title, description, media_type)
         return jsonify(new_media.to_dict()), 201
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
     except ValueError as e:
         return jsonify({'error': str(e)}), 404
 
+@members_bp.route('/<int:member_id>/media/uploads', methods=['POST'])
+def create_media_upload(member_id):
+    """
+    Start a resumable upload.
+    
+    Body: {"filename", "total_size", "media_type", "title", "description"}. Responds 201
+    with the upload; send the bytes with PUT to its Location, in one or more chunks.
+    """
+    if not Person.query.get(member_id):
+        return jsonify({'error': 'Member not found'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        upload = UploadService.create_upload(member_id, data, current_app.config['ALLOWED_EXTENSIONS'])
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    response = jsonify(upload.to_dict(offset=0))
+    response.status_code = 201
+    response.headers['Location'] = f'/api/members/{member_id}/media/uploads/{upload.id}'
+    response.headers['Upload-Offset'] = '0'
+    return response
+
+@members_bp.route('/<int:member_id>/media/uploads/<upload_id>', methods=['GET', 'HEAD'])
+def get_media_upload(member_id, upload_id):
+    """Current offset of a resumable upload (also in the Upload-Offset header)"""
+    upload = UploadService.get_upload(member_id, upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    offset = UploadService.current_offset(upload)
+    response = jsonify(upload.to_dict(offset=offset))
+    response.headers['Upload-Offset'] = str(offset)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@members_bp.route('/<int:member_id>/media/uploads/<upload_id>', methods=['PUT'])
+def put_media_upload_chunk(member_id, upload_id):
+    """
+    Append a chunk to a resumable upload.
+    
+    The raw chunk is the request body and its position goes in the Upload-Offset
+    header (or ?offset=). Responds 200 with the new offset, 201 with the media
+    record once the last byte has arrived, or 409 with the current offset if the
+    chunk does not start there.
+    """
+    upload = UploadService.get_upload(member_id, upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    offset = request.headers.get('Upload-Offset', request.args.get('offset'))
+    try:
+        offset = int(offset)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Upload-Offset header must be an integer'}), 400
+    
+    try:
+        new_offset, media = UploadService.append_chunk(upload, offset, request.stream)
+    except UploadOffsetMismatch as e:
+        response = jsonify({'error': str(e), 'offset': e.offset})
+        response.status_code = 409
+        response.headers['Upload-Offset'] = str(e.offset)
+        return response
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    
+    if media is not None:
+        response = jsonify(media.to_dict())
+        response.status_code = 201
+    else:
+        response = jsonify(upload.to_dict(offset=new_offset))
+    response.headers['Upload-Offset'] = str(new_offset)
+    return response
+
+@members_bp.route('/<int:member_id>/media/uploads/<upload_id>', methods=['DELETE'])
+def delete_media_upload(member_id, upload_id):
+    upload = UploadService.get_upload(member_id, upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    UploadService.abort_upload(upload)
+    return '', 204
+
 @members_bp.route('/<int:member_id>/media/<int:media_id>', methods=['DELETE'])
 def delete_media(member_id, media_id):
     try:
@@ -1,17 +1,48 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, abort
 from models import db
-from models.person import Person
 from models.relationship import Relationship
-from services.relationship_service import RelationshipService
+from services.relationship_service import RelationshipService, DuplicateRelationship
+from sqlalchemy.exc import IntegrityError
+from utils.validators import validate_listing_params, validate_relationship_filters
+from utils.pagination import add_next_page_link
+from utils.streaming import wants_stream, stream_list, read_ndjson, NDJSON_MIMETYPE
+from utils.http_cache import conditional_on_revision
+
+RELATIONSHIP_FIELDS = ['id', 'person1_id', 'person2_id', 'relationship_type', 'description']
 
 relationships_bp = Blueprint('relationships', __name__, url_prefix='/api/relationships')
 
 @relationships_bp.route('', methods=['GET'])
+@conditional_on_revision
 def get_all_relationships():
-    relationships = Relationship.query.all()
-    return jsonify([rel.to_dict() for rel in relationships])
+    """
+    List relationships.
+    
+    Query parameters:
+        after_id, limit: Keyset pagination; a Link rel="next" header points at the next page
+        fields: Comma-separated subset of relationship fields to return
+        person_id, relationship_type: Filters
+        stream=1 or format=ndjson (or Accept: application/x-ndjson): Stream the listing
+    """
+    is_valid, errors, params = validate_listing_params(request.args, RELATIONSHIP_FIELDS)
+    filters_valid, filter_errors, filters = validate_relationship_filters(request.args)
+    if not is_valid or not filters_valid:
+        return jsonify({'error': 'Validation failed', 'details': errors + filter_errors}), 400
+    
+    if wants_stream():
+        relationships = RelationshipService.iter_relationships(
+            after_id=params['after_id'], limit=params['limit'], **filters
+        )
+        return stream_list(rel.to_dict(params['fields']) for rel in relationships)
+    
+    relationships = RelationshipService.list_relationships(
+        after_id=params['after_id'], limit=params['limit'], **filters
+    )
+    response = jsonify([rel.to_dict(params['fields']) for rel in relationships])
+    return add_next_page_link(response, relationships, params['limit'])
 
 @relationships_bp.route('/<int:relationship_id>', methods=['GET'])
+@conditional_on_revision
 def get_relationship(relationship_id):
     relationship = Relationship.query.get_or_404(relationship_id)
     return jsonify(relationship.to_dict())
@@ -24,154 +55,93 @@ def create_relationship():
     if not data or 'person1_id' not in data or 'person2_id' not in data or 'relationship_type' not in data:
         return jsonify({'error': 'Person IDs and relationship type are required'}), 400
     
-    # Verify both persons exist
-    person1 = Person.query.get(data['person1_id'])
-    person2 = Person.query.get(data['person2_id'])
-    
-    if not person1 or not person2:
-        return jsonify({'error': 'One or both persons do not exist'}), 404
+    try:
+        new_relationship = RelationshipService.create_relationship(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
     
-    # Create the relationship
-    new_relationship = Relationship(
-        person1_id=data['person1_id'],
-        person2_id=data['person2_id'],
-        relationship_type=data['relationship_type'],
-        description=data.get('description')
-    )
+    return jsonify(new_relationship.to_dict()), 201
+
+@relationships_bp.route('/bulk', methods=['POST'])
+def bulk_create_relationships():
+    """
+    Create many relationships in batched transactions.
     
-    db.session.add(new_relationship)
+    Accepts a JSON array of relationships, or NDJSON (Content-Type: application/x-ndjson)
+    with one relationship per line. Optional ?batch_size= sets the rows per transaction.
+    Invalid rows are reported by index; duplicates of existing links are skipped.
+    """
+    batch_size = request.args.get('batch_size', type=int)
+    if batch_size is not None and batch_size < 1:
+        return jsonify({'error': 'batch_size must be at least 1'}), 400
     
-    # For parent-child relationships, create the reciprocal relationship automatically
-    if data['relationship_type'] == 'parent-child':
-        # Add the reciprocal relationship (from child to parent)
-        reciprocal = Relationship(
-            person1_id=data['person2_id'],  # Child
-            person2_id=data['person1_id'],  # Parent
-            relationship_type='child-parent',
-            description=data.get('description')
-        )
-        db.session.add(reciprocal)
+    if request.mimetype == NDJSON_MIMETYPE:
+        records = read_ndjson(request.stream)
+    else:
+        records = request.get_json(silent=True)
+        if not isinstance(records, list):
+            return jsonify({'error': 'Expected a JSON array of relationships'}), 400
     
-    # For spouse relationships, create the reciprocal relationship automatically
-    elif data['relationship_type'] == 'spouse':
-        # Add the reciprocal relationship (spouse works both ways)
-        reciprocal = Relationship(
-            person1_id=data['person2_id'],
-            person2_id=data['person1_id'],
-            relationship_type='spouse',
-            description=data.get('description')
-        )
-        db.session.add(reciprocal)
+    result = RelationshipService.bulk_create_relationships(records, batch_size)
     
-    # For sibling relationships, create the reciprocal relationship automatically
-    elif data['relationship_type'] == 'sibling':
-        # Add the reciprocal relationship (sibling works both ways)
-        reciprocal = Relationship(
-            person1_id=data['person2_id'],
-            person2_id=data['person1_id'],
-            relationship_type='sibling',
-            description=data.get('description')
-        )
-        db.session.add(reciprocal)
+    status = 200
+    if result['created']:
+        status = 201
+    elif result['errors'] and not result['duplicates']:
+        status = 400
     
-    db.session.commit()
-    return jsonify(new_relationship.to_dict()), 201
+    return jsonify({
+        'created': len(result['created']),
+        'ids': result['created'],
+        'duplicates': result['duplicates'],
+        'errors': result['errors']
+    }), status
 
 @relationships_bp.route('/<int:relationship_id>', methods=['PUT'])
 def update_relationship(relationship_id):
-    relationship = Relationship.query.get_or_404(relationship_id)
     data = request.json
     
-    # Update fields
-    if 'relationship_type' in data:
-        relationship.relationship_type = data['relationship_type']
-    if 'description' in data:
-        relationship.description = data['description']
+    try:
+        relationship = RelationshipService.update_relationship(relationship_id, data)
+    except DuplicateRelationship as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), 'relationship': e.existing.to_dict()}), 409
+    except ValueError:
+        abort(404)
+    except IntegrityError:
+        # A concurrent write stored the same relationship first
+        db.session.rollback()
+        return jsonify({'error': 'An identical relationship already exists'}), 409
     
-    db.session.commit()
     return jsonify(relationship.to_dict())
 
 @relationships_bp.route('/<int:relationship_id>', methods=['DELETE'])
 def delete_relationship(relationship_id):
-    """Delete a specific relationship by its ID and its reciprocal."""
+    """Delete a specific relationship by its ID."""
     print(f"DEBUG: DELETE /api/relationships/{relationship_id} called")
     
-    relationship = Relationship.query.get(relationship_id)
-    
-    if not relationship:
+    if not RelationshipService.get_relationship_by_id(relationship_id):
         print(f"ERROR: Relationship with ID {relationship_id} not found for deletion.")
         return jsonify({'error': 'Relationship not found'}), 404
         
     try:
-        # Find the reciprocal relationship
-        # Note: For parent/child, the types are swapped
-        reciprocal_type = relationship.relationship_type
-        if relationship.relationship_type == 'parent-child':
-            reciprocal_type = 'child-parent'
-        elif relationship.relationship_type == 'child-parent':
-            reciprocal_type = 'parent-child'
-            
-        reciprocal = Relationship.query.filter_by(
-            person1_id=relationship.person2_id,
-            person2_id=relationship.person1_id,
-            relationship_type=reciprocal_type
-        ).first()
-
-        # Delete the main relationship
-        db.session.delete(relationship)
-        print(f"DEBUG: Marked relationship ID {relationship_id} for deletion.")
-
-        # Delete the reciprocal if found
-        if reciprocal:
-            db.session.delete(reciprocal)
-            print(f"DEBUG: Marked reciprocal relationship ID {reciprocal.id} for deletion.")
-        else:
-            print(f"DEBUG: No reciprocal relationship found for {relationship_id}.")
-
-        db.session.commit()
-        print(f"DEBUG: Successfully committed deletion for relationship {relationship_id} (and reciprocal if existed).")
+        RelationshipService.delete_relationship(relationship_id)
+        print(f"DEBUG: Successfully committed deletion for relationship {relationship_id}.")
         
         # Return 204 No Content on successful deletion
         return '', 204
     except Exception as e:
         db.session.rollback()
-        print(f"ERROR: Failed to delete relationship ID {relationship_id} and/or reciprocal: {str(e)}")
+        print(f"ERROR: Failed to delete relationship ID {relationship_id}: {str(e)}")
         return jsonify({'error': f'Failed to delete relationship: {str(e)}'}), 500
 
 @relationships_bp.route('/person/<int:person_id>', methods=['GET'])
+@conditional_on_revision
 def get_person_relationships(person_id):
     try:
-        # Use the service to get relationships for consistency
+        # Each link is stored once, so no deduplication is needed;
+        # clients derive the inverse view from person1_id/person2_id
         relationships = RelationshipService.get_person_relationships(person_id)
-        
-        # Create a set to track unique relationship signatures to prevent duplicates
-        unique_relationships = {}
-        
-        for rel in relationships:
-            # Create a unique key for each relationship
-            other_id = rel.person2_id if rel.person1_id == person_id else rel.person1_id
-            rel_type = rel.relationship_type
-            
-            # Normalize relationship types for consistency
-            if rel_type == 'parent-child' and rel.person1_id == person_id:
-                normalized_type = 'parent-child'
-            elif rel_type == 'parent-child' and rel.person2_id == person_id:
-                normalized_type = 'child-parent'
-            elif rel_type == 'child-parent' and rel.person1_id == person_id:
-                normalized_type = 'child-parent'
-            elif rel_type == 'child-parent' and rel.person2_id == person_id:
-                normalized_type = 'parent-child'
-            else:
-                normalized_type = rel_type
-            
-            # Create a unique key based on other person ID and normalized relationship type
-            key = f"{other_id}:{normalized_type}"
-            
-            # Only keep one relationship record for each unique combination
-            if key not in unique_relationships:
-                unique_relationships[key] = rel
-        
-        # Return only unique relationships
-        return jsonify([rel.to_dict() for rel in unique_relationships.values()])
+        return jsonify([rel.to_dict() for rel in relationships])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
@@ -1,13 +1,32 @@
 from flask import Blueprint, jsonify, request
-from models.person import Person
-from models.relationship import Relationship
-from services.tree_service import TreeService
+from services.tree_service import TreeService, DEFAULT_TREE_DEPTH, TRAVERSAL_ENGINES
+from services.tree_cache import tree_cache
+from services.kinship_graph import TRAVERSAL_DIRECTIONS
+from utils.streaming import wants_stream, stream_tree
+from utils.tree_format import wants_columnar, encode_columnar, COLUMNAR_MIMETYPE
+from utils.http_cache import conditional_on_revision
 
 tree_bp = Blueprint('tree', __name__, url_prefix='/api/tree')
 
 @tree_bp.route('', methods=['GET'])
+@conditional_on_revision
 def get_tree():
-    """Get a family tree based on root person id or get the full tree"""
+    """
+    Get a family tree based on root person id or get the full tree.
+    
+    Subtree query parameters:
+        depth: Maximum number of hops from the root (default 3)
+        max_nodes: Maximum number of persons returned
+        directions: Comma-separated subset of ancestors, descendants, spouses, siblings, other
+        engine: graph (in-memory kinship graph), sql (recursive query in SQLite)
+                or auto (default: the graph if it is loaded, SQLite otherwise)
+    
+    The full tree can be streamed with stream=1 (chunked JSON) or
+    format=ndjson / Accept: application/x-ndjson (one node or link per line).
+    
+    Any tree can be requested in the compact columnar format with
+    Accept: application/vnd.genetree.columnar+json (or format=columnar).
+    """
     print("DEBUG: Tree route called")
     
     # Check if we're requesting a specific subtree (support both root_id and root for backward compatibility)
@@ -15,93 +34,75 @@ def get_tree():
     
     if root_id:
         print(f"DEBUG: Getting tree for root ID: {root_id}")
+        try:
+            options = parse_traversal_options(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         try:
             # Get tree data from service
-            tree_data = TreeService.get_tree_from_root(int(root_id))
+            tree_data = TreeService.get_tree_from_root(int(root_id), **options)
             print(f"DEBUG: Tree data generated with {len(tree_data['nodes'])} nodes and {len(tree_data['links'])} links")
-            return jsonify(tree_data)
+            return tree_response(tree_data)
         except Exception as e:
             print(f"ERROR: Failed to get tree: {str(e)}")
             return jsonify({'error': str(e)}), 400
+    elif wants_stream() and not wants_columnar():
+        # Stream nodes and links straight from the database cursors
+        print("DEBUG: Streaming full tree")
+        return stream_tree(TreeService.iter_full_tree_nodes(), TreeService.iter_full_tree_links())
     else:
         # Get the full tree data
         print("DEBUG: Getting full tree")
         tree_data = TreeService.get_full_tree()
         print(f"DEBUG: Full tree generated with {len(tree_data['nodes'])} nodes and {len(tree_data['links'])} links")
-        return jsonify(tree_data)
+        return tree_response(tree_data)
 
-def create_node(person):
-    """Create a node representation for a person"""
-    return {
-        'id': person.id,
-        'name': f"{person.first_name} {person.last_name}",
-        'gender': person.gender,
-        'birth_date': person.birth_date.isoformat() if person.birth_date else None,
-        'death_date': person.death_date.isoformat() if person.death_date else None,
-        'has_profile': True  # Indicates this person has a detailed profile
-    }
+@tree_bp.route('/cache', methods=['GET'])
+def get_tree_cache_stats():
+    """Hit, miss, eviction and invalidation counters of the tree payload cache"""
+    return jsonify(tree_cache.snapshot())
 
-def create_link(relationship):
-    """Create a link representation for a relationship"""
-    return {
-        'source': relationship.person1_id,
-        'target': relationship.person2_id,
-        'type': relationship.relationship_type
-    }
+def tree_response(tree_data):
+    """Serialize tree data as plain JSON or, if negotiated, in the columnar format"""
+    if wants_columnar():
+        response = jsonify(encode_columnar(tree_data))
+        response.mimetype = COLUMNAR_MIMETYPE
+    else:
+        response = jsonify(tree_data)
+    response.vary.add('Accept')
+    return response
 
-def build_tree_from_root(root_person, max_depth=3, current_depth=0, visited=None):
-    """
-    Recursively build a family tree starting from a root person.
-    No virtual "Family" root node will be added.
-    
-    Args:
-        root_person: The Person object to start from
-        max_depth: Maximum depth to traverse (prevent infinite recursion)
-        current_depth: Current depth in the recursion
-        visited: Set of visited person IDs to prevent cycles
-    
-    Returns:
-        Dict with nodes and links representing the family tree
-    """
-    if visited is None:
-        visited = set()
-    
-    # Don't recurse beyond max_depth
-    if current_depth > max_depth:
-        return {'nodes': [], 'links': []}
+def parse_traversal_options(args):
+    """Read depth, max_nodes, directions and engine query parameters for a subtree request"""
+    options = {'max_depth': DEFAULT_TREE_DEPTH, 'max_nodes': None, 'directions': None, 'engine': 'auto'}
     
-    # Add this person's node
-    nodes = [create_node(root_person)]
-    links = []
-    
-    # If already visited, don't explore further to prevent cycles
-    if root_person.id in visited:
-        return {'nodes': nodes, 'links': []}
+    if args.get('depth'):
+        try:
+            options['max_depth'] = int(args['depth'])
+        except ValueError:
+            raise ValueError("depth must be an integer")
+        if options['max_depth'] < 0:
+            raise ValueError("depth must not be negative")
     
-    # Mark as visited
-    visited.add(root_person.id)
+    if args.get('max_nodes'):
+        try:
+            options['max_nodes'] = int(args['max_nodes'])
+        except ValueError:
+            raise ValueError("max_nodes must be an integer")
+        if options['max_nodes'] < 1:
+            raise ValueError("max_nodes must be at least 1")
     
-    # Get all relationships for this person
-    relationships = Relationship.query.filter(
-        (Relationship.person1_id == root_person.id) | (Relationship.person2_id == root_person.id)
-    ).all()
+    if args.get('directions'):
+        directions = [direction.strip() for direction in args['directions'].split(',') if direction.strip()]
+        unknown = [direction for direction in directions if direction not in TRAVERSAL_DIRECTIONS]
+        if unknown:
+            raise ValueError(f"directions must be any of: {', '.join(TRAVERSAL_DIRECTIONS)}")
+        options['directions'] = directions
     
-    for rel in relationships:
-        # Determine the other person in this relationship
-        other_person_id = rel.person2_id if rel.person1_id == root_person.id else rel.person1_id
-        other_person = Person.query.get(other_person_id)
-        
-        if other_person:
-            # Always add link between root and other person
-            links.append(create_link(rel))
-            
-            # Only recurse if not already visited
-            if other_person.id not in visited:
-                # Recursively get the subtree for the other person
-                subtree = build_tree_from_root(other_person, max_depth, current_depth + 1, visited)
-                
-                # Add subtree nodes and links
-                nodes.extend(subtree['nodes'])
-                links.extend(subtree['links'])
+    if args.get('engine'):
+        if args['engine'] not in TRAVERSAL_ENGINES:
+            raise ValueError(f"engine must be one of: {', '.join(TRAVERSAL_ENGINES)}")
+        options['engine'] = args['engine']
     
-    return {'nodes': nodes, 'links': links} 
\ No newline at end of file
+    return options
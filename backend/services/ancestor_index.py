@@ -0,0 +1,350 @@
+#ancestor_index.py
+import heapq
+from collections import OrderedDict
+
+# Paint flags of the nearest-common-ancestor walk
+FROM_A = 1
+FROM_B = 2
+FROM_BOTH = FROM_A | FROM_B
+STALE = 4
+
+# Ancestor sets kept at once (one per queried person, least recently used dropped first)
+ANCESTOR_CACHE_SIZE = 4096
+
+
+class AncestorIndex:
+    """
+    Common-ancestor lookups over the parent-child edges of a KinshipGraph.
+
+    generation maps every person to a number higher than that of any of their
+    parents (the length of the longest parent chain above them when the index is
+    built), so an ancestor always has a lower generation than any of their
+    descendants; searches use this to stop early. Every person who
+    is somebody's ancestor gets a bit number, and the ancestors of a queried
+    person are cached as one Python int with a bit per ancestor, which makes
+    "common ancestors of A and B" a single AND.
+
+    The index is kept up to date edge by edge through the graph's add/remove
+    hooks. Parent edges that would make someone their own ancestor are recorded
+    in loop_edges and left out.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.generation = {}
+        self.loop_edges = set()
+        self._bits = {}
+        self._ids = []
+        self._ancestors = OrderedDict()
+
+    @classmethod
+    def build(cls, graph):
+        """Number every person's generation in one depth-first pass up the parent edges"""
+        index = cls(graph)
+        generation = index.generation
+        on_path = set()
+        for root_id in graph.persons:
+            if root_id in generation:
+                continue
+            on_path.add(root_id)
+            stack = [(root_id, iter(graph.adjacency[root_id]['parents']))]
+            while stack:
+                person_id, parents = stack[-1]
+                for parent_id, rel_id in parents:
+                    if parent_id in on_path:
+                        # The parent is also a descendant: this edge closes a loop
+                        index.loop_edges.add(rel_id)
+                    elif parent_id not in generation and parent_id in graph.persons:
+                        on_path.add(parent_id)
+                        stack.append((parent_id, iter(graph.adjacency[parent_id]['parents'])))
+                        break
+                else:
+                    # Every parent is numbered: the generation is final
+                    stack.pop()
+                    on_path.discard(person_id)
+                    generation[person_id] = index._generation_from_parents(person_id)
+        return index
+
+    # Graph hooks
+
+    def person_added(self, person_id):
+        self.generation.setdefault(person_id, 0)
+
+    def person_removed(self, person_id):
+        """Called once every edge of the person has been removed"""
+        self.generation.pop(person_id, None)
+        self._ancestors.pop(person_id, None)
+        bit = self._bits.pop(person_id, None)
+        if bit is not None:
+            self._ids[bit] = None
+
+    def parent_edge_added(self, parent_id, child_id, relationship_id):
+        self.person_added(parent_id)
+        self.person_added(child_id)
+        if self._is_ancestor(child_id, parent_id):
+            self.loop_edges.add(relationship_id)
+            return
+        self._forget_descendants(child_id)
+        self._raise_generations(child_id, self.generation[parent_id] + 1)
+
+    def parent_edge_removed(self, parent_id, child_id, relationship_id):
+        if relationship_id in self.loop_edges:
+            self.loop_edges.discard(relationship_id)
+            return
+        if child_id not in self.generation:
+            return
+        # Generations are left as they are: every remaining parent still has a lower one
+        self._forget_descendants(child_id)
+        # A removed edge may have been what made another edge a loop
+        for loop_id in list(self.loop_edges):
+            edge = self.graph.edges.get(loop_id)
+            if edge is None:
+                self.loop_edges.discard(loop_id)
+                continue
+            parent_id, loop_child_id = self.graph.parent_and_child(edge)
+            if not self._is_ancestor(loop_child_id, parent_id):
+                self.loop_edges.discard(loop_id)
+                self._forget_descendants(loop_child_id)
+                self._raise_generations(loop_child_id, self.generation[parent_id] + 1)
+
+    # Queries
+
+    def ancestors(self, person_id, include_self=False):
+        """IDs of every ancestor of a person (and the person, if include_self)"""
+        if person_id not in self.generation:
+            return set()
+        return set(self._unpack(self._ancestor_bits(person_id, include_self)))
+
+    def common_ancestors(self, person_a_id, person_b_id):
+        """
+        IDs of every common ancestor of two persons
+
+        A person counts as their own ancestor here, so the common ancestors of a
+        father and his son include the father.
+        """
+        if person_a_id not in self.generation or person_b_id not in self.generation:
+            return set()
+        bits = self._ancestor_bits(person_a_id, True) & self._ancestor_bits(person_b_id, True)
+        return set(self._unpack(bits))
+
+    def nearest_common_ancestors(self, person_a_id, person_b_id):
+        """
+        Common ancestors none of whose children is also a common ancestor
+
+        When both persons' ancestor sets are cached, their AND says which
+        persons are common ancestors and each side walks up only until it meets
+        one. Otherwise both persons' ancestors are painted in one walk that always
+        continues from the highest generation left, so every child is handled
+        before its parents. A person painted from both sides is a nearest common
+        ancestor and paints everyone above them as "stale"; the walk ends once
+        only stale persons are left, so it never goes further up than the
+        nearest common ancestors themselves.
+
+        Returns:
+            List of (ancestor_id, generations_from_a, generations_from_b), the
+            closest ancestors first
+        """
+        if person_a_id not in self.generation or person_b_id not in self.generation:
+            return []
+        if person_a_id in self._ancestors and person_b_id in self._ancestors:
+            return self._nearest_from_cache(person_a_id, person_b_id)
+
+        paint = {person_a_id: FROM_A}
+        paint[person_b_id] = paint.get(person_b_id, 0) | FROM_B
+        generation = self.generation
+        heap = [(-generation[person_id], person_id) for person_id in paint]
+        heapq.heapify(heap)
+        # Persons waiting in the heap that are not stale yet
+        live = len(heap)
+        nearest = []
+        while live:
+            _, person_id = heapq.heappop(heap)
+            flags = paint[person_id]
+            if not flags & STALE:
+                live -= 1
+                if flags & FROM_BOTH == FROM_BOTH:
+                    nearest.append(person_id)
+                    flags = paint[person_id] = flags | STALE
+            # Parents have a lower generation, so none of them has been popped yet
+            for parent_id in self._parents(person_id):
+                parent_flags = paint.get(parent_id)
+                if parent_flags is None:
+                    heapq.heappush(heap, (-generation[parent_id], parent_id))
+                    parent_flags = 0
+                    if not flags & STALE:
+                        live += 1
+                elif parent_flags | flags == parent_flags:
+                    continue
+                elif flags & STALE and not parent_flags & STALE:
+                    live -= 1
+                paint[parent_id] = parent_flags | flags
+
+        # No shortest way up to a nearest common ancestor passes a person painted from the other side
+        from_a = self._steps_up(person_a_id, lambda person_id: paint.get(person_id) != FROM_A)
+        from_b = self._steps_up(person_b_id, lambda person_id: paint.get(person_id) != FROM_B)
+        return self._with_steps(nearest, from_a, from_b)
+
+    # Internals
+
+    def _nearest_from_cache(self, person_a_id, person_b_id):
+        common = self._ancestor_bits(person_a_id, True) & self._ancestor_bits(person_b_id, True)
+        if not common:
+            return []
+        common = set(self._unpack(common))
+        from_a = self._steps_up(person_a_id, common.__contains__)
+        from_b = self._steps_up(person_b_id, common.__contains__)
+        nearest = [
+            ancestor_id for ancestor_id in from_a
+            if not any(child_id in common for child_id in self._children(ancestor_id))
+        ]
+        return self._with_steps(nearest, from_a, from_b)
+
+    @staticmethod
+    def _with_steps(nearest, from_a, from_b):
+        found = [(ancestor_id, from_a[ancestor_id], from_b[ancestor_id]) for ancestor_id in nearest]
+        return sorted(found, key=lambda entry: (entry[1] + entry[2], entry[0]))
+
+    def _parents(self, person_id):
+        return self._linked(person_id, 'parents')
+
+    def _children(self, person_id):
+        return self._linked(person_id, 'children')
+
+    def _linked(self, person_id, kind):
+        neighbors = self.graph.adjacency.get(person_id)
+        if not neighbors:
+            return []
+        loop_edges, generation = self.loop_edges, self.generation
+        return [
+            other_id for other_id, rel_id in neighbors[kind]
+            if other_id in generation and rel_id not in loop_edges
+        ]
+
+    def _generation_from_parents(self, person_id):
+        return max((self.generation[parent_id] for parent_id in self._parents(person_id)), default=-1) + 1
+
+    def _is_ancestor(self, ancestor_id, person_id):
+        """Whether ancestor_id is person_id or reaches them along child edges"""
+        if ancestor_id == person_id:
+            return True
+        limit = self.generation[person_id]
+        if self.generation[ancestor_id] >= limit:
+            return False
+        # Only persons of a lower generation than person_id can lie on the way down to them
+        seen = {ancestor_id}
+        stack = [ancestor_id]
+        while stack:
+            for child_id in self._children(stack.pop()):
+                if child_id == person_id:
+                    return True
+                if child_id not in seen and self.generation[child_id] < limit:
+                    seen.add(child_id)
+                    stack.append(child_id)
+        return False
+
+    def _raise_generations(self, person_id, minimum):
+        if self.generation[person_id] >= minimum:
+            return
+        self.generation[person_id] = minimum
+        stack = [person_id]
+        while stack:
+            parent_id = stack.pop()
+            child_generation = self.generation[parent_id] + 1
+            for child_id in self._children(parent_id):
+                if self.generation[child_id] < child_generation:
+                    self.generation[child_id] = child_generation
+                    stack.append(child_id)
+
+    def _forget_descendants(self, person_id):
+        """Drop the cached ancestor sets of a person and of everyone descending from them"""
+        self._ancestors.pop(person_id, None)
+        bit = self._bits.get(person_id)
+        if bit is None:
+            # Never anybody's ancestor so far, so in no cached set
+            return
+        stale = [cached_id for cached_id, bits in self._ancestors.items() if bits >> bit & 1]
+        for cached_id in stale:
+            del self._ancestors[cached_id]
+
+    def _bit(self, person_id):
+        bit = self._bits.get(person_id)
+        if bit is None:
+            bit = self._bits[person_id] = len(self._ids)
+            self._ids.append(person_id)
+        return bit
+
+    def _ancestor_bits(self, person_id, include_self=False):
+        bits = self._ancestors.get(person_id)
+        if bits is not None:
+            self._ancestors.move_to_end(person_id)
+        else:
+            bits = 0
+            found = []
+            seen = {person_id}
+            stack = [person_id]
+            while stack:
+                for parent_id in self._parents(stack.pop()):
+                    if parent_id in seen:
+                        continue
+                    seen.add(parent_id)
+                    found.append(self._bit(parent_id))
+                    parent_bits = self._ancestors.get(parent_id)
+                    if parent_bits is None:
+                        stack.append(parent_id)
+                    else:
+                        # A cached parent already covers everything above it
+                        bits |= parent_bits
+            bits |= self._pack(found)
+            self._ancestors[person_id] = bits
+            if len(self._ancestors) > ANCESTOR_CACHE_SIZE:
+                self._ancestors.popitem(last=False)
+        if include_self:
+            bits |= 1 << self._bit(person_id)
+        return bits
+
+    @staticmethod
+    def _pack(bit_numbers):
+        """Int with the given bits set, built in one pass instead of one shift-and-or per bit"""
+        if not bit_numbers:
+            return 0
+        packed = bytearray(max(bit_numbers) // 8 + 1)
+        for bit in bit_numbers:
+            packed[bit >> 3] |= 1 << (bit & 7)
+        return int.from_bytes(packed, 'little')
+
+    def _unpack(self, bits):
+        digits = bin(bits)
+        # bin() writes the highest bit first, after the '0b' prefix
+        highest = len(digits) - 1
+        ids = []
+        position = digits.find('1', 2)
+        while position != -1:
+            ids.append(self._ids[highest - position])
+            position = digits.find('1', position + 1)
+        return ids
+
+    def _steps_up(self, person_id, stop):
+        """
+        Fewest parent steps from a person up to every ancestor for which stop()
+        holds, reached without going past another such ancestor
+        """
+        if stop(person_id):
+            return {person_id: 0}
+        steps = {}
+        seen = {person_id}
+        frontier = [person_id]
+        distance = 0
+        while frontier:
+            distance += 1
+            next_frontier = []
+            for current_id in frontier:
+                for parent_id in self._parents(current_id):
+                    if parent_id in seen:
+                        continue
+                    seen.add(parent_id)
+                    if stop(parent_id):
+                        steps[parent_id] = distance
+                    else:
+                        next_frontier.append(parent_id)
+            frontier = next_frontier
+        return steps
@@ -0,0 +1,190 @@
+#blob_store.py
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from flask import current_app
+from models import db
+from models.media import Media
+from services.derivative_service import DerivativeService
+from utils.uploads import file_extension, UPLOAD_CHUNK_SIZE
+
+# Blobs live under UPLOAD_FOLDER/<BLOB_DIRECTORY>/ab/cd/<sha256>.<ext>
+BLOB_DIRECTORY = 'blobs'
+
+# Files still being received, on the same filesystem as the blobs so they can be renamed in
+PARTIAL_DIRECTORY = '.partial'
+
+logger = logging.getLogger(__name__)
+
+
+class BlobStore:
+    """
+    Content-addressed file storage for media.
+
+    A file is stored once per content hash, in directories sharded by the first
+    two byte pairs of its SHA-256. Media rows reference blobs through their
+    file_path, so the number of rows with that path is the blob's reference
+    count: identical uploads share one file, and a blob is unlinked only when the
+    last row referencing it is gone.
+    """
+
+    # Held from store() until the new reference is committed, and by release(), so a
+    # blob is never unlinked between being found and being referenced
+    lock = threading.RLock()
+
+    @staticmethod
+    def blob_path(content_hash, filename):
+        """Relative path (under UPLOAD_FOLDER) of the blob for this hash and file type"""
+        extension = file_extension(filename)
+        name = f"{content_hash}.{extension}" if extension else content_hash
+        return '/'.join((BLOB_DIRECTORY, content_hash[:2], content_hash[2:4], name))
+
+    @staticmethod
+    def absolute_path(relative_path):
+        return os.path.join(current_app.config['UPLOAD_FOLDER'], *relative_path.split('/'))
+
+    @staticmethod
+    def temp_file():
+        """Create an empty file to receive an upload into; returns (handle, path)"""
+        folder = BlobStore.partial_folder()
+        os.makedirs(folder, exist_ok=True)
+        return tempfile.mkstemp(dir=folder, prefix='upload-')
+
+    @staticmethod
+    def partial_folder():
+        return os.path.join(current_app.config['UPLOAD_FOLDER'], PARTIAL_DIRECTORY)
+
+    @staticmethod
+    def store(temp_path, content_hash, filename):
+        """
+        Move a received file into the store
+
+        If a blob with the same content already exists the received copy is
+        discarded. Hold BlobStore.lock until the Media row referencing the
+        returned path is committed.
+
+        Returns:
+            (relative blob path, True if the content was already stored)
+        """
+        relative_path = BlobStore.blob_path(content_hash, filename)
+        target = BlobStore.absolute_path(relative_path)
+        with BlobStore.lock:
+            if os.path.exists(target):
+                os.remove(temp_path)
+                return relative_path, True
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(temp_path, target)
+        return relative_path, False
+
+    @staticmethod
+    def reference_count(relative_path):
+        """Number of Media rows pointing at a blob"""
+        return db.session.query(Media.id).filter(Media.file_path == relative_path).count()
+
+    @staticmethod
+    def release(relative_path):
+        """
+        Unlink a blob (and its derivatives) if no Media row references it any more
+
+        Call after the referencing row has been deleted and committed.
+
+        Returns:
+            True if the file was removed
+        """
+        with BlobStore.lock:
+            if BlobStore.reference_count(relative_path):
+                return False
+            path = BlobStore.absolute_path(relative_path)
+            if not os.path.exists(path):
+                return False
+            os.remove(path)
+        BlobStore._prune_empty_directories(os.path.dirname(path))
+        if relative_path.startswith(BLOB_DIRECTORY + '/'):
+            DerivativeService.remove(os.path.basename(relative_path).split('.')[0])
+        return True
+
+    @staticmethod
+    def migrate_legacy_uploads(batch_size=100, progress=None):
+        """
+        Move files stored at uploads/<member_id>/<filename> into the blob store
+
+        Every Media row that does not point at a blob yet has its file hashed and
+        copied (or deduplicated) into the store, and is updated with its blob path,
+        size and hash. A legacy file is removed once no row references it. Rows are
+        committed in batches, so the migration can be interrupted and run again;
+        rows whose file is missing are left as they are and reported.
+
+        Args:
+            batch_size: Media rows updated per transaction
+            progress: Optional callable receiving the running summary
+
+        Returns:
+            Dict with migrated, deduplicated and bytes_saved counts and the missing media IDs
+        """
+        summary = {'migrated': 0, 'deduplicated': 0, 'missing': [], 'bytes_saved': 0}
+        while True:
+            query = Media.query.filter(~Media.file_path.startswith(BLOB_DIRECTORY + '/'))
+            if summary['missing']:
+                query = query.filter(Media.id.notin_(summary['missing']))
+            batch = query.order_by(Media.id).limit(batch_size).all()
+            if not batch:
+                break
+
+            legacy_paths = set()
+            with BlobStore.lock:
+                for media in batch:
+                    legacy_path = media.file_path
+                    if not os.path.isfile(BlobStore.absolute_path(legacy_path)):
+                        logger.debug(f"Media {media.id} file {legacy_path} is missing, skipping")
+                        summary['missing'].append(media.id)
+                        continue
+
+                    filename = media.filename or os.path.basename(legacy_path)
+                    temp_path, content_hash, size = BlobStore._copy_to_temp(legacy_path)
+                    media.file_path, existed = BlobStore.store(temp_path, content_hash, filename)
+                    media.filename = filename
+                    media.content_hash = content_hash
+                    media.file_size = size
+                    legacy_paths.add(legacy_path)
+                    summary['migrated'] += 1
+                    if existed:
+                        summary['deduplicated'] += 1
+                        summary['bytes_saved'] += size
+                db.session.commit()
+
+            # Several rows can share a legacy file (same-named uploads overwrote each other)
+            for legacy_path in legacy_paths:
+                if not BlobStore.reference_count(legacy_path):
+                    path = BlobStore.absolute_path(legacy_path)
+                    os.remove(path)
+                    BlobStore._prune_empty_directories(os.path.dirname(path))
+            if progress:
+                progress(summary)
+        return summary
+
+    @staticmethod
+    def _copy_to_temp(relative_path):
+        """Copy a stored file to a new temp file, hashing it on the way; returns (temp path, sha256, size)"""
+        digest = hashlib.sha256()
+        size = 0
+        handle, temp_path = BlobStore.temp_file()
+        with open(BlobStore.absolute_path(relative_path), 'rb') as source, os.fdopen(handle, 'wb') as destination:
+            for chunk in iter(lambda: source.read(UPLOAD_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                destination.write(chunk)
+                size += len(chunk)
+        return temp_path, digest.hexdigest(), size
+
+    @staticmethod
+    def _prune_empty_directories(directory):
+        """Remove now-empty directories up to (not including) UPLOAD_FOLDER"""
+        root = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+        directory = os.path.abspath(directory)
+        while directory.startswith(root + os.sep):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                return
+            directory = os.path.dirname(directory)
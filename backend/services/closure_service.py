@@ -0,0 +1,283 @@
+#closure_service.py
+from flask import current_app
+from sqlalchemy import select, delete, func, text
+from models import db
+from models.person import Person
+from models.ancestor_closure import AncestorClosure
+from services.kinship_graph import locked_graph, parent_map, id_chunks
+from services.tree_service import TreeService
+
+# Closure rows written per executemany
+CLOSURE_INSERT_BATCH_SIZE = 10000
+
+# Direction -> (column holding the person, column holding their relatives, graph neighbor kind)
+LINEAGE_DIRECTIONS = {
+    'ancestors': ('descendant_id', 'ancestor_id', 'parents'),
+    'descendants': ('ancestor_id', 'descendant_id', 'children'),
+}
+
+# Pair the parent and each of their ancestors with the child and each of their
+# descendants, keeping the shorter distance where a pair already exists; nothing
+# when either person is missing (relationship rows outlive deleted persons)
+_EXTEND_CLOSURE = text(
+    "INSERT INTO ancestor_closure (ancestor_id, descendant_id, distance) "
+    "SELECT up.ancestor_id, down.descendant_id, MIN(up.distance + 1 + down.distance) "
+    "FROM (SELECT :parent_id AS ancestor_id, 0 AS distance UNION ALL "
+    "      SELECT ancestor_id, distance FROM ancestor_closure WHERE descendant_id = :parent_id) AS up, "
+    "     (SELECT :child_id AS descendant_id, 0 AS distance UNION ALL "
+    "      SELECT descendant_id, distance FROM ancestor_closure WHERE ancestor_id = :child_id) AS down "
+    "WHERE up.ancestor_id != down.descendant_id "
+    "AND EXISTS (SELECT 1 FROM person WHERE id = :parent_id) "
+    "AND EXISTS (SELECT 1 FROM person WHERE id = :child_id) "
+    "GROUP BY up.ancestor_id, down.descendant_id "
+    "ON CONFLICT (ancestor_id, descendant_id) DO UPDATE SET distance = MIN(distance, excluded.distance)"
+)
+
+_INSERT_CLOSURE_ROW = "INSERT INTO ancestor_closure (ancestor_id, descendant_id, distance) VALUES (?, ?, ?)"
+
+
+class ClosureService:
+    """
+    The optional ancestor_closure table (ANCESTOR_CLOSURE config) and the
+    pedigree, descendancy and descendant count queries it serves.
+
+    The maintenance methods run inside the caller's transaction, right before
+    the commit that stores the relationship change, so the closure and the
+    relationship rows always change together. They do nothing while the
+    closure is disabled; after enabling it on an existing database, fill it
+    with `flask rebuild-closure`. Queries are answered from the in-memory
+    kinship graph while it is disabled.
+    """
+
+    @staticmethod
+    def enabled():
+        return bool(current_app.config.get('ANCESTOR_CLOSURE', False))
+
+    @staticmethod
+    def edge_added(parent_id, child_id):
+        """Add the pairs a new parent-child relationship creates (none if either person is missing)"""
+        if not ClosureService.enabled():
+            return
+        db.session.execute(_EXTEND_CLOSURE, {'parent_id': parent_id, 'child_id': child_id})
+
+    @staticmethod
+    def edge_removed(child_id):
+        """Recompute the pairs of a child and their descendants after one of the child's parent links is deleted"""
+        if not ClosureService.enabled():
+            return
+        db.session.flush()
+        ClosureService._recompute({child_id} | ClosureService._relative_ids(child_id, 'descendants'))
+
+    @staticmethod
+    def person_removed(person_id):
+        """Drop a deleted person's pairs and recompute their descendants' pairs without them"""
+        if not ClosureService.enabled():
+            return
+        db.session.flush()
+        descendants = ClosureService._relative_ids(person_id, 'descendants')
+        db.session.execute(delete(AncestorClosure).where(
+            (AncestorClosure.ancestor_id == person_id) | (AncestorClosure.descendant_id == person_id)
+        ))
+        ClosureService._recompute(descendants)
+
+    @staticmethod
+    def rebuild(progress=None):
+        """
+        Refill the closure table from the relationship table in one transaction
+
+        Args:
+            progress: Optional callable receiving the summary after each batch of rows
+
+        Returns:
+            Dict with the number of persons that have ancestors and the rows written
+        """
+        person_ids = set(db.session.execute(select(Person.id)).scalars())
+        parents = parent_map(person_ids, restrict=False)
+
+        connection = db.session.connection()
+        db.session.execute(delete(AncestorClosure))
+        # Building the secondary indexes once at the end is far cheaper than updating them row by row
+        indexes = AncestorClosure.__table__.indexes
+        for index in indexes:
+            index.drop(connection)
+        summary = {'persons': 0, 'rows': 0}
+        rows = []
+        for person_id in parents:
+            distances = ClosureService._distances_up(person_id, parents, person_ids, {})
+            rows.extend((ancestor_id, person_id, distance) for ancestor_id, distance in distances.items())
+            summary['persons'] += 1
+            if len(rows) >= CLOSURE_INSERT_BATCH_SIZE:
+                summary['rows'] += ClosureService._insert_rows(rows)
+                rows = []
+                if progress:
+                    progress(summary)
+        summary['rows'] += ClosureService._insert_rows(rows)
+        for index in indexes:
+            index.create(connection)
+        db.session.commit()
+        return summary
+
+    @staticmethod
+    def ancestors(person_id, max_depth=None):
+        """Ancestors of a person nearest first; see _lineage"""
+        return ClosureService._lineage(person_id, 'ancestors', max_depth)
+
+    @staticmethod
+    def descendants(person_id, max_depth=None):
+        """Descendants of a person nearest first; see _lineage"""
+        return ClosureService._lineage(person_id, 'descendants', max_depth)
+
+    @staticmethod
+    def descendant_counts(person_ids):
+        """
+        Number of descendants of each person
+
+        Args:
+            person_ids: IDs of the persons to count for
+
+        Returns:
+            Dict mapping each ID to its descendant count (0 for unknown IDs)
+        """
+        counts = dict.fromkeys(person_ids, 0)
+        if ClosureService.enabled():
+            for chunk in id_chunks(person_ids):
+                rows = db.session.execute(
+                    select(AncestorClosure.ancestor_id, func.count())
+                    .where(AncestorClosure.ancestor_id.in_(chunk))
+                    .group_by(AncestorClosure.ancestor_id)
+                )
+                counts.update(dict(rows.all()))
+            return counts
+
+        with locked_graph() as graph:
+            for person_id in person_ids:
+                if person_id in graph.persons:
+                    depths, _ = graph.traverse(person_id, kinds=('children',))
+                    counts[person_id] = len(depths) - 1
+        return counts
+
+    @staticmethod
+    def _lineage(person_id, direction, max_depth=None):
+        """
+        Ancestors or descendants of a person, with the generations between them
+
+        Args:
+            person_id: ID of the person
+            direction: 'ancestors' or 'descendants'
+            max_depth: Furthest generation returned (None for all)
+
+        Returns:
+            List of tree nodes with a distance key, nearest generation first,
+            or None if the person does not exist
+        """
+        own_column, relative_column, kind = LINEAGE_DIRECTIONS[direction]
+        if ClosureService.enabled():
+            relative_id = getattr(AncestorClosure, relative_column)
+            query = (
+                select(Person.id, Person.first_name, Person.last_name, Person.gender,
+                       Person.birth_date, Person.death_date, AncestorClosure.distance)
+                .join(AncestorClosure, relative_id == Person.id)
+                .where(getattr(AncestorClosure, own_column) == person_id)
+                .order_by(AncestorClosure.distance, relative_id)
+            )
+            if max_depth is not None:
+                query = query.where(AncestorClosure.distance <= max_depth)
+            rows = db.session.execute(query).all()
+            if not rows and db.session.get(Person, person_id) is None:
+                return None
+            return [dict(TreeService._create_node(row), distance=row.distance) for row in rows]
+
+        with locked_graph() as graph:
+            if person_id not in graph.persons:
+                return None
+            depths, _ = graph.traverse(person_id, max_depth, kinds=(kind,))
+            del depths[person_id]
+            return [
+                dict(TreeService._create_node(graph.persons[relative_id]), distance=distance)
+                for relative_id, distance in sorted(depths.items(), key=lambda item: (item[1], item[0]))
+            ]
+
+    @staticmethod
+    def _relative_ids(person_id, direction):
+        own_column, relative_column, _ = LINEAGE_DIRECTIONS[direction]
+        return set(db.session.execute(
+            select(getattr(AncestorClosure, relative_column))
+            .where(getattr(AncestorClosure, own_column) == person_id)
+        ).scalars())
+
+    @staticmethod
+    def _recompute(affected):
+        """
+        Rewrite the ancestor rows of every person in affected
+
+        affected must hold every descendant of its members. Everyone else's rows
+        are still right, so the walk up from each affected person stops at the
+        first unaffected ancestor on each line and continues from that person's rows.
+        """
+        if not affected:
+            return
+        parents = parent_map(affected)
+        border = {
+            parent_id for parent_ids in parents.values() for parent_id in parent_ids
+            if parent_id not in affected
+        }
+        above = {}
+        for chunk in id_chunks(border):
+            rows = db.session.execute(
+                select(AncestorClosure.descendant_id, AncestorClosure.ancestor_id, AncestorClosure.distance)
+                .where(AncestorClosure.descendant_id.in_(chunk))
+            )
+            for descendant_id, ancestor_id, distance in rows:
+                above.setdefault(descendant_id, {})[ancestor_id] = distance
+
+        for chunk in id_chunks(affected):
+            db.session.execute(delete(AncestorClosure).where(AncestorClosure.descendant_id.in_(chunk)))
+        rows = []
+        for person_id in affected:
+            distances = ClosureService._distances_up(person_id, parents, affected, above)
+            rows.extend((ancestor_id, person_id, distance) for ancestor_id, distance in distances.items())
+            if len(rows) >= CLOSURE_INSERT_BATCH_SIZE:
+                ClosureService._insert_rows(rows)
+                rows = []
+        ClosureService._insert_rows(rows)
+
+    @staticmethod
+    def _distances_up(person_id, parents, inside, above):
+        """
+        Fewest generations from a person up to each of their ancestors
+
+        Breadth-first up the parents map while inside the given set of persons;
+        the ancestors of persons outside it are taken from above
+        ({person_id: {ancestor_id: distance}}).
+        """
+        distances = {}
+        border_steps = {}
+        frontier = [person_id]
+        step = 0
+        while frontier:
+            step += 1
+            next_frontier = []
+            for current_id in frontier:
+                for parent_id in parents.get(current_id, ()):
+                    if parent_id in distances or parent_id == person_id:
+                        continue
+                    distances[parent_id] = step
+                    if parent_id in inside:
+                        next_frontier.append(parent_id)
+                    else:
+                        border_steps[parent_id] = step
+            frontier = next_frontier
+
+        for border_id, border_step in border_steps.items():
+            for ancestor_id, distance in above.get(border_id, {}).items():
+                if ancestor_id != person_id and border_step + distance < distances.get(ancestor_id, float('inf')):
+                    distances[ancestor_id] = border_step + distance
+        return distances
+
+    @staticmethod
+    def _insert_rows(rows):
+        """Write (ancestor_id, descendant_id, distance) tuples in one executemany"""
+        if rows:
+            # Straight to the driver: the ORM and Core per-row parameter handling costs more than SQLite's insert
+            db.session.connection().exec_driver_sql(_INSERT_CLOSURE_ROW, rows)
+        return len(rows)
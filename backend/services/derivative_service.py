@@ -0,0 +1,192 @@
+#derivative_service.py
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from models import db
+from models.media import Media
+from models.data_revision import DataRevision
+from services.tree_service import TreeService
+from utils.media_derivatives import (
+    derivative_folder, derivative_paths, derivative_source_kind, generate_derivatives
+)
+
+logger = logging.getLogger(__name__)
+
+# Worker processes for derivative generation (DERIVATIVE_WORKERS config)
+DEFAULT_DERIVATIVE_WORKERS = 2
+
+# Seconds a request waits for derivatives generated on demand
+DERIVATIVE_TIMEOUT = 60
+
+# Backfill jobs report progress every this many media
+DERIVATIVE_PROGRESS_INTERVAL = 50
+
+
+class DerivativeService:
+    """
+    Thumbnails, WebP variants and video poster frames.
+
+    Every image (and a frame of every video) is scaled to DERIVATIVE_SIZES and
+    written as WebP and JPEG next to the blob store, keyed by content hash.
+    Generation is CPU-bound, so it runs in a process pool: it is started when a
+    file is uploaded, and a request for a derivative that does not exist yet
+    (uploaded before this, or generation failed) generates it on demand. Requests
+    for a file already being generated wait for that run instead of starting
+    another one.
+    """
+
+    _executor = None
+    _lock = threading.Lock()
+    _pending = {}  # content hash -> Future of the running generation
+
+    @staticmethod
+    def schedule(media):
+        """
+        Start generating a media item's derivatives in the background
+
+        Does nothing if the file type has no derivatives, they already exist or
+        DERIVATIVES_ON_UPLOAD is disabled.
+
+        Returns:
+            The Future of the generation, or None
+        """
+        if not current_app.config.get('DERIVATIVES_ON_UPLOAD', True):
+            return None
+        return DerivativeService._submit(media.content_hash, media.file_path)
+
+    @staticmethod
+    def ensure(content_hash, timeout=DERIVATIVE_TIMEOUT):
+        """
+        Make sure the derivatives of a file exist, generating them if needed
+
+        Returns:
+            True if they exist afterwards, False if no media has this content or
+            the file type has no derivatives
+        """
+        media = Media.query.filter(Media.content_hash == content_hash).first()
+        if media is None:
+            return False
+        future = DerivativeService._submit(content_hash, media.file_path)
+        if future is not None:
+            future.result(timeout=timeout)
+        return DerivativeService._complete(content_hash)
+
+    @staticmethod
+    def remove(content_hash):
+        """Delete a file's derivatives if no media has that content any more"""
+        if not content_hash or Media.query.filter(Media.content_hash == content_hash).first():
+            return False
+        folder = DerivativeService._absolute(derivative_folder(content_hash))
+        if not os.path.isdir(folder):
+            return False
+        shutil.rmtree(folder, ignore_errors=True)
+        # Drop the two shard levels above it once they are empty
+        for shard in (os.path.dirname(folder), os.path.dirname(os.path.dirname(folder))):
+            try:
+                os.rmdir(shard)
+            except OSError:
+                break
+        return True
+
+    @staticmethod
+    def generate_missing(progress=None):
+        """
+        Generate derivatives for every stored file that lacks them (backfill)
+
+        Args:
+            progress: Optional callable receiving the running summary
+
+        Returns:
+            Dict with checked, generated and failed counts
+        """
+        summary = {'checked': 0, 'generated': 0, 'failed': 0}
+        content = (
+            db.session.query(Media.content_hash, db.func.min(Media.file_path))
+            .filter(Media.content_hash.isnot(None))
+            .group_by(Media.content_hash)
+        )
+        for content_hash, file_path in content.yield_per(500):
+            summary['checked'] += 1
+            try:
+                future = DerivativeService._submit(content_hash, file_path)
+                if future is not None:
+                    future.result(timeout=DERIVATIVE_TIMEOUT)
+                    summary['generated'] += 1
+            except Exception as e:
+                logger.exception(f"Error generating derivatives for {file_path}: {str(e)}")
+                summary['failed'] += 1
+            if progress and summary['checked'] % DERIVATIVE_PROGRESS_INTERVAL == 0:
+                progress(dict(summary))
+        return summary
+
+    @staticmethod
+    def _submit(content_hash, file_path):
+        """Start (or join) the generation for a file; None if there is nothing to do"""
+        kind = derivative_source_kind(file_path)
+        if not content_hash or kind is None or DerivativeService._complete(content_hash):
+            return None
+
+        with DerivativeService._lock:
+            future = DerivativeService._pending.get(content_hash)
+            if future is not None:
+                return future
+            if DerivativeService._executor is None:
+                DerivativeService._executor = ProcessPoolExecutor(
+                    max_workers=current_app.config.get('DERIVATIVE_WORKERS', DEFAULT_DERIVATIVE_WORKERS)
+                )
+            logger.debug(f"Generating derivatives of {file_path}")
+            future = DerivativeService._executor.submit(
+                generate_derivatives, DerivativeService._absolute(file_path), kind,
+                DerivativeService._absolute(derivative_folder(content_hash))
+            )
+            DerivativeService._pending[content_hash] = future
+
+        app = current_app._get_current_object()
+
+        def finished(done):
+            with DerivativeService._lock:
+                DerivativeService._pending.pop(content_hash, None)
+            # Runs on the executor's result thread, where an uncaught error would only be printed
+            if done.exception() is not None:
+                logger.error(f"Error generating derivatives for {file_path}: {str(done.exception())}",
+                             exc_info=done.exception())
+                return
+            result = done.result()
+            if result['width'] and result['height']:
+                with app.app_context():
+                    DerivativeService._record_dimensions(content_hash, result['width'], result['height'])
+        future.add_done_callback(finished)
+        return future
+
+    @staticmethod
+    def _record_dimensions(content_hash, width, height):
+        """Fill in the dimensions of media that do not have them yet (videos, older uploads)"""
+        try:
+            updated = Media.query.filter(Media.content_hash == content_hash, Media.width.is_(None)).update(
+                {'width': width, 'height': height}, synchronize_session=False
+            )
+            if not updated:
+                db.session.rollback()
+                return
+            revision = DataRevision.bump()
+            db.session.commit()
+            TreeService.after_write(revision)
+        except Exception as e:
+            db.session.rollback()
+            logger.exception(f"Error recording dimensions of {content_hash}: {str(e)}")
+
+    @staticmethod
+    def _complete(content_hash):
+        """True if every derivative of the file is on disk"""
+        return all(
+            os.path.exists(DerivativeService._absolute(path))
+            for formats in derivative_paths(content_hash).values()
+            for path in formats.values()
+        )
+
+    @staticmethod
+    def _absolute(relative_path):
+        return os.path.join(current_app.config['UPLOAD_FOLDER'], *relative_path.split('/'))
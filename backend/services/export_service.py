@@ -0,0 +1,372 @@
+#export_service.py
+import json
+import re
+from itertools import islice
+from sqlalchemy import select, func, case, literal, union_all, or_
+from sqlalchemy.orm import aliased
+from models import db
+from models.person import Person
+from models.relationship import Relationship
+from models.custom_field import CustomField
+from services.tree_service import TreeService
+from services.kinship_graph import id_chunks
+from services.gedcom_service import GEDCOM_FIELD_LABELS
+from utils.gedcom import gedcom_lines, format_gedcom_date
+
+# Rows fetched per round trip by the export cursors
+EXPORT_BATCH_SIZE = 1000
+
+GEDCOM_SEX = {'male': 'M', 'female': 'F', 'unknown': 'U', 'other': 'X'}
+
+GEDCOM_TAGS_BY_LABEL = {label: tag for tag, label in GEDCOM_FIELD_LABELS.items()}
+
+# Custom fields the importer creates for BIRT/DEAT details; written back into those events
+EVENT_FIELDS = {
+    'Birth date': ('BIRT', 'DATE'), 'Birth place': ('BIRT', 'PLAC'),
+    'Death date': ('DEAT', 'DATE'), 'Death place': ('DEAT', 'PLAC')
+}
+
+# Field names that can be written as a tag of their own (imported user-defined tags)
+GEDCOM_TAG = re.compile(r'^_?[A-Z0-9]{3,31}$')
+
+PERSON_COLUMNS = (
+    Person.id, Person.first_name, Person.last_name, Person.gender,
+    Person.birth_date, Person.death_date, Person.biography
+)
+
+
+class ExportService:
+    """
+    Streaming exports of the whole database or of one person's subtree.
+
+    Every export is a generator of text lines. The full export reads persons,
+    custom fields and relationships from yield_per cursors a batch at a time, so
+    memory stays flat however large the database is. A subtree export takes its
+    person and relationship IDs from TreeService.collect_subtree.
+    """
+
+    @staticmethod
+    def collect_subtree(root_id, **options):
+        """Person IDs, EdgeRecords and {person_id: gender} of a subtree, or None if the root does not exist"""
+        subtree = TreeService.collect_subtree(root_id, **options)
+        if subtree is None:
+            return None
+        persons, relationships = subtree
+        return (sorted(person.id for person in persons), relationships,
+                {person.id: person.gender for person in persons})
+
+    @staticmethod
+    def iter_ndjson(subtree=None, batch_size=EXPORT_BATCH_SIZE):
+        """
+        Yield NDJSON lines: {"member": {...}} for every person, then {"relationship": {...}}
+
+        Member objects have the shape accepted by POST /api/members/bulk (plus id).
+
+        Args:
+            subtree: Result of collect_subtree, or None for the whole database
+            batch_size: Rows fetched per round trip
+        """
+        for person, custom_fields in ExportService._iter_persons(subtree, batch_size):
+            member = {
+                'id': person.id,
+                'first_name': person.first_name,
+                'last_name': person.last_name,
+                'gender': person.gender,
+                'birth_date': person.birth_date.isoformat() if person.birth_date else None,
+                'death_date': person.death_date.isoformat() if person.death_date else None,
+                'biography': person.biography,
+                'custom_fields': [
+                    {'field_name': field_name, 'field_value': field_value}
+                    for field_name, field_value in custom_fields
+                ]
+            }
+            yield ExportService._encode({'member': member})
+
+        for relationship in ExportService._iter_relationships(subtree, batch_size):
+            yield ExportService._encode({'relationship': {
+                'id': relationship.id,
+                'person1_id': relationship.person1_id,
+                'person2_id': relationship.person2_id,
+                'relationship_type': relationship.relationship_type
+            }})
+
+    @staticmethod
+    def iter_gedcom(subtree=None, batch_size=EXPORT_BATCH_SIZE):
+        """
+        Yield the lines of a GEDCOM 5.5.1 file
+
+        Persons become INDI records and couples with their children become FAM
+        records. The parents are listed as HUSB and WIFE by gender, in ID order
+        where the genders do not tell. Families are identified by their parents
+        (@F<parent>_<parent>@), so every INDI record can point to its families
+        (FAMC, FAMS) without holding the family list in memory. Sibling and
+        other relationships have no GEDCOM equivalent and are left out (use the
+        NDJSON export for a lossless copy).
+
+        Args:
+            subtree: Result of collect_subtree, or None for the whole database
+            batch_size: Rows fetched per round trip
+        """
+        yield '0 HEAD\n1 SOUR GENETREE\n1 GEDC\n2 VERS 5.5.1\n2 FORM LINEAGE-LINKED\n1 CHAR UTF-8\n'
+
+        subtree_links = None
+        if subtree is not None:
+            subtree_links = ExportService._family_links(ExportService._subtree_family_rows(subtree[1]))
+        for batch in ExportService._iter_person_batches(subtree, batch_size):
+            links = subtree_links
+            if links is None:
+                links = ExportService._batch_family_links([person.id for person, _ in batch])
+            for person, custom_fields in batch:
+                yield ''.join(ExportService._individual_lines(person, custom_fields, links.get(person.id)))
+
+        for key, parents, child_ids in ExportService._iter_families(subtree, batch_size):
+            lines = list(gedcom_lines(0, 'FAM', xref=ExportService._family_xref(key)))
+            for tag, parent_id in ExportService._spouse_roles(parents):
+                lines.extend(gedcom_lines(1, tag, f'@I{parent_id}@'))
+            for child_id in child_ids:
+                lines.extend(gedcom_lines(1, 'CHIL', f'@I{child_id}@'))
+            yield ''.join(lines)
+
+        yield '0 TRLR\n'
+
+    @staticmethod
+    def _encode(item):
+        return json.dumps(item, separators=(',', ':'), default=str) + '\n'
+
+    @staticmethod
+    def _iter_persons(subtree, batch_size):
+        """Yield (person row, [(field_name, field_value), ...]) in ID order"""
+        for batch in ExportService._iter_person_batches(subtree, batch_size):
+            yield from batch
+
+    @staticmethod
+    def _iter_person_batches(subtree, batch_size):
+        """Yield lists of (person row, [(field_name, field_value), ...]) in ID order"""
+        if subtree is None:
+            rows = iter(db.session.query(*PERSON_COLUMNS).order_by(Person.id).yield_per(batch_size))
+            batches = iter(lambda: list(islice(rows, batch_size)), [])
+        else:
+            person_ids = subtree[0]
+            batches = (
+                db.session.query(*PERSON_COLUMNS)
+                .filter(Person.id.in_(person_ids[start:start + batch_size]))
+                .order_by(Person.id).all()
+                for start in range(0, len(person_ids), batch_size)
+            )
+
+        for batch in batches:
+            # One query for the custom fields of the whole batch
+            custom_fields = {}
+            field_rows = db.session.query(
+                CustomField.person_id, CustomField.field_name, CustomField.field_value
+            ).filter(CustomField.person_id.in_([person.id for person in batch])).order_by(CustomField.id)
+            for person_id, field_name, field_value in field_rows:
+                custom_fields.setdefault(person_id, []).append((field_name, field_value))
+            yield [(person, custom_fields.get(person.id, [])) for person in batch]
+
+    @staticmethod
+    def _iter_relationships(subtree, batch_size):
+        if subtree is not None:
+            return iter(subtree[1])
+        return db.session.query(
+            Relationship.id, Relationship.person1_id, Relationship.person2_id, Relationship.relationship_type
+        ).order_by(Relationship.id).yield_per(batch_size)
+
+    @staticmethod
+    def _individual_lines(person, custom_fields, family_links=None):
+        yield from gedcom_lines(0, 'INDI', xref=f'@I{person.id}@')
+        yield from gedcom_lines(1, 'NAME', f"{person.first_name} /{person.last_name}/")
+        yield from gedcom_lines(2, 'GIVN', person.first_name)
+        yield from gedcom_lines(2, 'SURN', person.last_name)
+        if person.gender in GEDCOM_SEX:
+            yield from gedcom_lines(1, 'SEX', GEDCOM_SEX[person.gender])
+
+        events = {'BIRT': {}, 'DEAT': {}}
+        if person.birth_date:
+            events['BIRT']['DATE'] = format_gedcom_date(person.birth_date)
+        if person.death_date:
+            events['DEAT']['DATE'] = format_gedcom_date(person.death_date)
+        other_fields = []
+        for field_name, field_value in custom_fields:
+            if field_name in EVENT_FIELDS and field_value:
+                # An approximate date kept by the importer is more faithful than the column
+                event, tag = EVENT_FIELDS[field_name]
+                events[event][tag] = field_value
+            else:
+                other_fields.append((field_name, field_value))
+
+        for event, details in events.items():
+            if details:
+                yield from gedcom_lines(1, event)
+                for tag in ('DATE', 'PLAC'):
+                    if tag in details:
+                        yield from gedcom_lines(2, tag, details[tag])
+
+        for field_name, field_value in other_fields:
+            tag = GEDCOM_TAGS_BY_LABEL.get(field_name)
+            if tag is None and GEDCOM_TAG.match(field_name):
+                tag = field_name
+            if tag is not None:
+                yield from gedcom_lines(1, tag, field_value)
+            else:
+                yield from gedcom_lines(1, 'EVEN', field_value)
+                yield from gedcom_lines(2, 'TYPE', field_name)
+
+        if person.biography:
+            yield from gedcom_lines(1, 'NOTE', person.biography)
+
+        if family_links:
+            for tag in ('FAMC', 'FAMS'):
+                for key in sorted(family_links[tag], key=ExportService._family_sort_key):
+                    yield from gedcom_lines(1, tag, ExportService._family_xref(key))
+
+    @staticmethod
+    def _iter_families(subtree, batch_size):
+        """
+        Yield (key, [(parent ID, gender), ...], [child IDs]) per couple or single parent
+
+        A child's family is keyed by the lowest and highest ID among its parents
+        (its only two parents for nearly everyone; None for a single parent);
+        spouse rows with no children still form a family. Families are produced
+        from rows sorted by their parents, so only one family is held in memory
+        at a time.
+        """
+        if subtree is None:
+            rows = db.session.execute(ExportService._family_rows_query()).yield_per(batch_size)
+        else:
+            genders = subtree[2]
+            rows = (
+                (parent1_id, parent2_id, child_id, genders.get(parent1_id), genders.get(parent2_id))
+                for parent1_id, parent2_id, child_id in ExportService._subtree_family_rows(subtree[1])
+            )
+
+        current_key = None
+        for parent1_id, parent2_id, child_id, gender1, gender2 in rows:
+            key = (parent1_id, parent2_id)
+            if key != current_key:
+                if current_key is not None:
+                    yield current_key, parents, child_ids
+                current_key = key
+                parents = [(parent1_id, gender1)] + ([(parent2_id, gender2)] if parent2_id is not None else [])
+                child_ids = []
+            if child_id is not None:
+                child_ids.append(child_id)
+        if current_key is not None:
+            yield current_key, parents, child_ids
+
+    @staticmethod
+    def _spouse_roles(parents):
+        """
+        [(tag, parent ID)] for the parents of a family, in ID order
+
+        HUSB and WIFE follow the parents' genders; where they do not decide it
+        (unknown, other or the same gender) the lower ID is HUSB.
+        """
+        if len(parents) == 1:
+            parent_id, gender = parents[0]
+            return [('WIFE' if gender == 'female' else 'HUSB', parent_id)]
+        (first_id, first_gender), (second_id, second_gender) = parents
+        if first_gender != second_gender and (first_gender == 'female' or second_gender == 'male'):
+            return [('WIFE', first_id), ('HUSB', second_id)]
+        return [('HUSB', first_id), ('WIFE', second_id)]
+
+    @staticmethod
+    def _family_xref(key):
+        return '@F' + '_'.join(str(parent_id) for parent_id in key if parent_id is not None) + '@'
+
+    @staticmethod
+    def _family_sort_key(key):
+        return tuple(-1 if parent_id is None else parent_id for parent_id in key)
+
+    @staticmethod
+    def _family_links(rows):
+        """
+        {person_id: {'FAMC': {family keys}, 'FAMS': {family keys}}}
+        from (parent1_id, parent2_id, child_id) rows
+        """
+        links = {}
+        for parent1_id, parent2_id, child_id in rows:
+            key = (parent1_id, parent2_id)
+            for parent_id in key:
+                if parent_id is not None:
+                    links.setdefault(parent_id, {'FAMC': set(), 'FAMS': set()})['FAMS'].add(key)
+            if child_id is not None:
+                links.setdefault(child_id, {'FAMC': set(), 'FAMS': set()})['FAMC'].add(key)
+        return links
+
+    @staticmethod
+    def _batch_family_links(person_ids):
+        """
+        _family_links for a batch of persons, from the rows of _family_rows_query
+        that involve them: their own parents, the parents of their children and
+        their spouse rows
+        """
+        child_ids = set(person_ids)
+        for chunk in id_chunks(person_ids):
+            child_ids.update(db.session.execute(
+                select(Relationship.person2_id)
+                .where(Relationship.relationship_type == 'parent-child', Relationship.person1_id.in_(chunk))
+            ).scalars())
+
+        rows = []
+        for chunk in id_chunks(child_ids):
+            rows.extend(db.session.execute(
+                ExportService._children_query().where(Relationship.person2_id.in_(chunk))
+            ).all())
+        for chunk in id_chunks(person_ids):
+            rows.extend(db.session.execute(
+                ExportService._couples_query()
+                .where(or_(Relationship.person1_id.in_(chunk), Relationship.person2_id.in_(chunk)))
+            ).all())
+        return ExportService._family_links(rows)
+
+    @staticmethod
+    def _children_query():
+        """(parent1_id, parent2_id, child_id) per child, keyed by its lowest and highest parent ID"""
+        return (
+            select(
+                func.min(Relationship.person1_id).label('parent1_id'),
+                case((func.count() > 1, func.max(Relationship.person1_id)), else_=None).label('parent2_id'),
+                Relationship.person2_id.label('child_id')
+            )
+            .where(Relationship.relationship_type == 'parent-child')
+            .group_by(Relationship.person2_id)
+        )
+
+    @staticmethod
+    def _couples_query():
+        """(parent1_id, parent2_id, None) per spouse row"""
+        return select(
+            Relationship.person1_id, Relationship.person2_id, literal(None)
+        ).where(Relationship.relationship_type == 'spouse')
+
+    @staticmethod
+    def _family_rows_query():
+        """
+        (parent1_id, parent2_id, child_id, parent1 gender, parent2 gender) rows
+        sorted by couple; SQLite does the sorting
+        """
+        rows = union_all(ExportService._children_query(), ExportService._couples_query()).subquery()
+        parent1, parent2 = aliased(Person), aliased(Person)
+        return (
+            select(rows.c.parent1_id, rows.c.parent2_id, rows.c.child_id, parent1.gender, parent2.gender)
+            .outerjoin(parent1, parent1.id == rows.c.parent1_id)
+            .outerjoin(parent2, parent2.id == rows.c.parent2_id)
+            .order_by(rows.c.parent1_id, rows.c.parent2_id, rows.c.child_id)
+        )
+
+    @staticmethod
+    def _subtree_family_rows(relationships):
+        """Same rows as _family_rows_query for a subtree's in-memory edges"""
+        parents = {}
+        rows = []
+        for relationship in relationships:
+            if relationship.relationship_type == 'parent-child':
+                parents.setdefault(relationship.person2_id, []).append(relationship.person1_id)
+            elif relationship.relationship_type == 'spouse':
+                rows.append((relationship.person1_id, relationship.person2_id, None))
+        for child_id, parent_ids in parents.items():
+            parent_ids.sort()
+            rows.append((parent_ids[0], parent_ids[-1] if len(parent_ids) > 1 else None, child_id))
+        # None sorts first, as NULL does in SQLite
+        return sorted(rows, key=lambda row: tuple(-1 if value is None else value for value in row))
@@ -0,0 +1,261 @@
+#gedcom_service.py
+from array import array
+import os
+from datetime import date
+from flask import current_app
+from services.member_service import MemberService, DEFAULT_IMPORT_BATCH_SIZE
+from services.relationship_service import RelationshipService
+from utils.gedcom import iter_gedcom_records, parse_gedcom_date, split_gedcom_name
+
+# Stop collecting per-record errors after this many so a bad file cannot grow the report unbounded
+MAX_REPORTED_ERRORS = 100
+
+GEDCOM_GENDERS = {'M': 'male', 'F': 'female', 'U': 'unknown', 'X': 'other'}
+
+# Custom field labels for common INDI tags; any other tag is stored under its own name
+GEDCOM_FIELD_LABELS = {
+    'OCCU': 'Occupation', 'RELI': 'Religion', 'EDUC': 'Education', 'NATI': 'Nationality',
+    'TITL': 'Title', 'NICK': 'Nickname', 'BAPM': 'Baptism', 'CHR': 'Christening',
+    'BURI': 'Burial', 'CREM': 'Cremation', 'RESI': 'Residence', 'EMIG': 'Emigration',
+    'IMMI': 'Immigration', 'NATU': 'Naturalization', 'GRAD': 'Graduation',
+    'RETI': 'Retirement', 'CENS': 'Census', 'EVEN': 'Event', 'FACT': 'Fact',
+    'CAST': 'Caste', 'DSCR': 'Description', 'IDNO': 'ID number', 'SSN': 'Social security number',
+    'DATE': 'Date', 'PLAC': 'Place', 'ADDR': 'Address', 'AGE': 'Age', 'TYPE': 'Type'
+}
+
+# INDI tags that are mapped onto Person columns or links rather than custom fields
+MAPPED_INDI_TAGS = {'NAME', 'SEX', 'BIRT', 'DEAT', 'NOTE', 'FAMS', 'FAMC', 'CHAN', 'RIN'}
+
+# Compact codes for the relationship types buffered during an import
+EDGE_TYPES = ['parent-child', 'spouse']
+
+
+def _add_id_ranges(ranges, ids):
+    """Record IDs in a list of [first, last] ranges, extending the last range where they follow on"""
+    for new_id in ids:
+        if ranges and ranges[-1][1] + 1 == new_id:
+            ranges[-1][1] = new_id
+        else:
+            ranges.append([new_id, new_id])
+
+
+class GedcomService:
+    @staticmethod
+    def import_gedcom_file(path, batch_size=None, progress=None, remove=False):
+        """
+        Import a GEDCOM file from disk (see import_gedcom)
+
+        Args:
+            path: Path of the GEDCOM file
+            batch_size: Members per transaction
+            progress: Optional progress callable
+            remove: Delete the file afterwards (used for spooled uploads)
+        """
+        try:
+            with open(path, 'rb') as stream:
+                return GedcomService.import_gedcom(stream, batch_size, progress)
+        finally:
+            if remove and os.path.exists(path):
+                os.remove(path)
+
+    @staticmethod
+    def import_gedcom(stream, batch_size=None, progress=None):
+        """
+        Import a GEDCOM 5.5.1 file
+
+        The file is parsed one record at a time. INDI records become members (with
+        extra tags as custom fields) and are written through
+        MemberService.bulk_create_members a batch at a time. FAM records become one
+        spouse edge and a parent-child edge per parent and child; the edges are kept
+        as packed integer arrays and written through
+        RelationshipService.bulk_create_relationships once every INDI is stored, so
+        families may reference individuals that appear later in the file.
+
+        Args:
+            stream: Binary or text file-like object
+            batch_size: Members per transaction (IMPORT_BATCH_SIZE config, default 1000)
+            progress: Optional callable receiving the running summary after each batch
+
+        Every batch is committed as it goes, so an import stopped part way (a
+        cancelled job) leaves the rows stored so far in place. The summary lists
+        their IDs as [first, last] ranges in person_ids and relationship_ids so
+        they can be found and deleted.
+
+        Returns:
+            Summary dict with persons, custom_fields, relationships, duplicates,
+            skipped (record counts by tag), errors ({'record': xref, 'errors': [...]})
+            and the person_ids and relationship_ids ranges created
+
+        Raises:
+            GedcomSyntaxError: If the file is not a GEDCOM file
+        """
+        if batch_size is None:
+            batch_size = current_app.config.get('IMPORT_BATCH_SIZE', DEFAULT_IMPORT_BATCH_SIZE)
+
+        summary = {
+            'persons': 0, 'custom_fields': 0, 'relationships': 0,
+            'duplicates': 0, 'skipped': {}, 'errors': [],
+            'person_ids': [], 'relationship_ids': []
+        }
+        person_ids = {}
+        edges = {'person1': array('q'), 'person2': array('q'), 'type': bytearray()}
+        unresolved = []
+        pending = []
+
+        def flush():
+            GedcomService._store_individuals(pending, person_ids, summary)
+            pending.clear()
+            if progress:
+                progress(summary)
+
+        for record in iter_gedcom_records(stream):
+            if record.tag == 'INDI' and record.xref:
+                pending.append((record.xref, GedcomService._individual_to_member(record)))
+                if len(pending) >= batch_size:
+                    flush()
+            elif record.tag == 'FAM':
+                for xref1, xref2, edge_type in GedcomService._family_edges(record):
+                    if xref1 in person_ids and xref2 in person_ids:
+                        GedcomService._buffer_edge(edges, person_ids[xref1], person_ids[xref2], edge_type)
+                    else:
+                        unresolved.append((xref1, xref2, edge_type))
+            elif record.tag not in ('HEAD', 'TRLR'):
+                summary['skipped'][record.tag] = summary['skipped'].get(record.tag, 0) + 1
+        if pending:
+            flush()
+
+        for xref1, xref2, edge_type in unresolved:
+            if xref1 in person_ids and xref2 in person_ids:
+                GedcomService._buffer_edge(edges, person_ids[xref1], person_ids[xref2], edge_type)
+            else:
+                GedcomService._report(summary, xref1 if xref1 not in person_ids else xref2,
+                                      ["Family references an individual that was not imported"])
+
+        result = RelationshipService.bulk_create_relationships(
+            GedcomService._iter_edges(edges), batch_size
+        )
+        summary['relationships'] = len(result['created'])
+        _add_id_ranges(summary['relationship_ids'], result['created'])
+        summary['duplicates'] = result['duplicates']
+        for error in result['errors']:
+            GedcomService._report(summary, f"edge {error['index']}", error['errors'])
+        if progress:
+            progress(summary)
+        return summary
+
+    @staticmethod
+    def _store_individuals(pending, person_ids, summary):
+        """Insert one batch of (xref, member dict) and record the new IDs by xref"""
+        result = MemberService.bulk_create_members([member for _, member in pending], len(pending))
+        _add_id_ranges(summary['person_ids'], result['created'])
+
+        # Created IDs come back in input order for the rows that were not rejected
+        rejected = {error['index'] for error in result['errors']}
+        created = iter(result['created'])
+        for index, (xref, member) in enumerate(pending):
+            if index not in rejected:
+                person_ids[xref] = next(created)
+                summary['persons'] += 1
+                summary['custom_fields'] += len(member['custom_fields'])
+        for error in result['errors']:
+            GedcomService._report(summary, pending[error['index']][0], error['errors'])
+
+    @staticmethod
+    def _individual_to_member(record):
+        """Map an INDI record onto the member dict accepted by MemberService"""
+        given, surname = '', ''
+        name = record.first('NAME')
+        if name is not None:
+            given, surname = split_gedcom_name(name.value)
+            given = name.child_value('GIVN') or given
+            surname = name.child_value('SURN') or surname
+
+        custom_fields = []
+        member = {
+            'first_name': given or 'Unknown',
+            'last_name': surname or 'Unknown',
+            'gender': GEDCOM_GENDERS.get((record.child_value('SEX') or '').strip()[:1].upper()),
+            'birth_date': None,
+            'death_date': None,
+            'biography': None,
+            'custom_fields': custom_fields
+        }
+
+        for tag, key, label in (('BIRT', 'birth_date', 'Birth'), ('DEAT', 'death_date', 'Death')):
+            event = record.first(tag)
+            if event is None:
+                continue
+            raw_date = event.child_value('DATE')
+            member[key], exact = GedcomService._convert_date(raw_date)
+            if raw_date and not exact:
+                # Keep what the file actually says when the column can only hold an approximation
+                custom_fields.append({'field_name': f'{label} date', 'field_value': raw_date})
+            place = event.child_value('PLAC')
+            if place:
+                custom_fields.append({'field_name': f'{label} place', 'field_value': place})
+
+        notes = [note.value for note in record.all('NOTE') if note.value and not note.value.startswith('@')]
+        if notes:
+            member['biography'] = '\n\n'.join(notes)
+
+        for child in record.children:
+            if child.tag in MAPPED_INDI_TAGS:
+                continue
+            value = GedcomService._flatten(child)
+            if value:
+                custom_fields.append({
+                    'field_name': GEDCOM_FIELD_LABELS.get(child.tag, child.tag),
+                    'field_value': value
+                })
+        return member
+
+    @staticmethod
+    def _convert_date(value):
+        """Return (ISO date string or None, exact) for a GEDCOM date value"""
+        parsed = parse_gedcom_date(value)
+        if parsed is None:
+            return None, False
+        year, month, day, exact = parsed
+        try:
+            converted = date(year, month or 1, day or 1)
+        except ValueError:
+            return None, False
+        return converted.isoformat(), exact and day is not None
+
+    @staticmethod
+    def _flatten(node):
+        """Render a tag and its subordinate lines as one readable value"""
+        parts = [node.value] if node.value else []
+        for child in node.children:
+            value = GedcomService._flatten(child)
+            if value:
+                parts.append(f"{GEDCOM_FIELD_LABELS.get(child.tag, child.tag)}: {value}")
+        return '; '.join(parts)
+
+    @staticmethod
+    def _family_edges(record):
+        """Yield (xref1, xref2, relationship_type) for the links a FAM record describes"""
+        parents = [value for value in (record.child_value('HUSB'), record.child_value('WIFE')) if value]
+        if len(parents) == 2:
+            yield parents[0], parents[1], 'spouse'
+        for child in record.all('CHIL'):
+            if not child.value:
+                continue
+            for parent in parents:
+                yield parent, child.value, 'parent-child'
+
+    @staticmethod
+    def _buffer_edge(edges, person1_id, person2_id, relationship_type):
+        edges['person1'].append(person1_id)
+        edges['person2'].append(person2_id)
+        edges['type'].append(EDGE_TYPES.index(relationship_type))
+
+    @staticmethod
+    def _iter_edges(edges):
+        for person1_id, person2_id, code in zip(edges['person1'], edges['person2'], edges['type']):
+            yield {'person1_id': person1_id, 'person2_id': person2_id, 'relationship_type': EDGE_TYPES[code]}
+
+    @staticmethod
+    def _report(summary, record, errors):
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append({'record': record, 'errors': errors})
@@ -0,0 +1,364 @@
+#job_service.py
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update
+from models import db
+from models.job import Job
+
+logger = logging.getLogger(__name__)
+
+# Worker threads per process (JOB_WORKERS config)
+DEFAULT_JOB_WORKERS = 2
+
+# Seconds an idle worker waits before looking for jobs queued by another process
+JOB_POLL_INTERVAL = 1.0
+
+# Seconds between the heartbeats a process writes to the jobs it is running
+JOB_HEARTBEAT_INTERVAL = 10
+
+# A running job whose heartbeat is older than this many seconds has lost its process
+JOB_HEARTBEAT_TIMEOUT = 60
+
+# Export jobs report progress (and notice cancellation) every this many records
+EXPORT_PROGRESS_INTERVAL = 10000
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once its cancellation has been requested"""
+
+
+def _run_gedcom_import(job_id, params, progress):
+    from services.gedcom_service import GedcomService
+    return GedcomService.import_gedcom_file(params['path'], params.get('batch_size'), progress, remove=True)
+
+
+def _run_export(job_id, params, progress):
+    from services.export_service import ExportService
+
+    subtree = None
+    if params.get('root_id') is not None:
+        subtree = ExportService.collect_subtree(
+            params['root_id'], max_depth=params.get('depth'),
+            max_nodes=params.get('max_nodes'), directions=params.get('directions')
+        )
+        if subtree is None:
+            raise ValueError(f"Member with ID {params['root_id']} not found")
+
+    export_format = params.get('format', 'gedcom')
+    iter_lines = ExportService.iter_gedcom if export_format == 'gedcom' else ExportService.iter_ndjson
+    folder = JobService.export_folder()
+    os.makedirs(folder, exist_ok=True)
+    file_name = f"{job_id}.{'ged' if export_format == 'gedcom' else 'ndjson'}"
+    path = os.path.join(folder, file_name)
+
+    records = 0
+    try:
+        with open(path + '.part', 'w', encoding='utf-8') as output:
+            for records, text in enumerate(iter_lines(subtree), start=1):
+                output.write(text)
+                if records % EXPORT_PROGRESS_INTERVAL == 0:
+                    progress({'records': records})
+        os.replace(path + '.part', path)
+    finally:
+        if os.path.exists(path + '.part'):
+            os.remove(path + '.part')
+    return {'file': file_name, 'format': export_format, 'records': records, 'size': os.path.getsize(path)}
+
+
+def _run_media_derivatives(job_id, params, progress):
+    from services.derivative_service import DerivativeService
+    return DerivativeService.generate_missing(progress)
+
+
+def _run_pedigree_analysis(job_id, params, progress):
+    from services.pedigree_service import PedigreeService
+    return PedigreeService.analyze(params.get('generations'), progress)
+
+
+# kind -> callable(job_id, params, progress) returning a JSON-serializable result
+JOB_HANDLERS = {
+    'gedcom-import': _run_gedcom_import,
+    'export': _run_export,
+    'media-derivatives': _run_media_derivatives,
+    'pedigree-analysis': _run_pedigree_analysis
+}
+
+# kind -> param naming a spooled file the job deletes when it runs, and which
+# must be deleted instead when the job never gets to run
+JOB_SPOOLED_FILES = {
+    'gedcom-import': 'path'
+}
+
+
+class JobWorkerPool:
+    """Worker threads that claim queued jobs from the job table and run them"""
+
+    def __init__(self, app, size):
+        self.app = app
+        self.size = size
+        self.wakeup = threading.Event()
+        self.threads = []
+
+    def start(self):
+        for number in range(self.size):
+            thread = threading.Thread(target=self._work, name=f'job-worker-{number}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        thread = threading.Thread(target=self._beat, name='job-heartbeat', daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def notify(self):
+        self.wakeup.set()
+
+    def _work(self):
+        while True:
+            # A fresh app context (and so a fresh session) per job
+            with self.app.app_context():
+                job_id = JobService._claim_next()
+                if job_id is not None:
+                    JobService._execute(job_id)
+                    continue
+            self.wakeup.wait(JOB_POLL_INTERVAL)
+            self.wakeup.clear()
+
+    def _beat(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    JobService._heartbeat()
+                    JobService.fail_interrupted_jobs()
+            except Exception:
+                logger.exception("Error in the job heartbeat")
+            time.sleep(JOB_HEARTBEAT_INTERVAL)
+
+
+class JobService:
+    """
+    Persistent background jobs.
+
+    Jobs are rows in the job table, so their status survives restarts and is
+    visible to every process sharing the database. Each process runs a small pool
+    of worker threads; a worker claims the oldest queued job with a single
+    conditional UPDATE, which SQLite applies atomically, so a job never runs twice.
+    Handlers report progress through a callback, which is also where a requested
+    cancellation interrupts them.
+
+    A claimed job records its process ("hostname:pid"), and the pool refreshes
+    the heartbeat of its running jobs every JOB_HEARTBEAT_INTERVAL seconds, so
+    jobs whose process has died can be told apart from jobs of live processes.
+    """
+
+    _start_lock = threading.Lock()
+
+    @staticmethod
+    def submit(kind, params=None):
+        """
+        Queue a job
+
+        Args:
+            kind: One of JOB_HANDLERS
+            params: JSON-serializable parameters passed to the handler
+
+        Returns:
+            The new Job
+        """
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = Job(id=uuid.uuid4().hex, kind=kind, status='queued', params=params or {})
+        db.session.add(job)
+        db.session.commit()
+        logger.debug(f"Queued {kind} job {job.id}")
+        JobService.start_workers().notify()
+        return job
+
+    @staticmethod
+    def get_job(job_id):
+        """Get a job by ID"""
+        return db.session.get(Job, job_id)
+
+    @staticmethod
+    def list_jobs(status=None, kind=None, limit=50):
+        """Most recent jobs first, optionally filtered by status and kind"""
+        query = Job.query
+        if status:
+            query = query.filter(Job.status == status)
+        if kind:
+            query = query.filter(Job.kind == kind)
+        return query.order_by(Job.created_at.desc()).limit(limit).all()
+
+    @staticmethod
+    def cancel_job(job_id):
+        """
+        Cancel a job: queued jobs are cancelled at once, running jobs stop at their
+        next progress report. Work a running job has committed is kept; its last
+        progress report becomes the result of the cancelled job (for a GEDCOM
+        import, the ID ranges of the persons and relationships already stored).
+
+        Returns:
+            The Job, or None if it does not exist
+        """
+        with db.engine.begin() as connection:
+            cancelled = connection.execute(
+                update(Job).where(Job.id == job_id, Job.status == 'queued')
+                .values(status='cancelled', finished_at=datetime.utcnow())
+                .returning(Job.kind, Job.params)
+            ).all()
+            if not cancelled:
+                connection.execute(
+                    update(Job).where(Job.id == job_id, Job.status == 'running').values(cancel_requested=True)
+                )
+        for kind, params in cancelled:
+            JobService._discard_spooled_file(kind, params)
+        db.session.expire_all()
+        return JobService.get_job(job_id)
+
+    @staticmethod
+    def export_folder():
+        """Directory finished export jobs write their files to (EXPORT_FOLDER config)"""
+        return current_app.config.get('EXPORT_FOLDER', os.path.join(current_app.instance_path, 'exports'))
+
+    @staticmethod
+    def start_workers():
+        """Start this app's worker pool if it is not running yet and return it"""
+        app = current_app._get_current_object()
+        pool = app.extensions.get('job_workers')
+        if pool is not None:
+            return pool
+        with JobService._start_lock:
+            pool = app.extensions.get('job_workers')
+            if pool is None:
+                pool = JobWorkerPool(app, app.config.get('JOB_WORKERS', DEFAULT_JOB_WORKERS))
+                app.extensions['job_workers'] = pool
+                pool.start()
+        return pool
+
+    @staticmethod
+    def fail_interrupted_jobs():
+        """
+        Mark running jobs whose process is gone as failed
+
+        A job is interrupted when its heartbeat is older than JOB_HEARTBEAT_TIMEOUT,
+        or when it belongs to a process on this host that no longer exists. Jobs of
+        live processes, including other workers sharing the database, are left alone.
+
+        Returns:
+            The number of jobs marked as failed
+        """
+        stale_before = datetime.utcnow() - timedelta(seconds=JOB_HEARTBEAT_TIMEOUT)
+        running = db.session.execute(
+            select(Job.id, Job.worker, Job.heartbeat_at).where(Job.status == 'running')
+        ).all()
+        db.session.commit()
+        interrupted = [
+            job_id for job_id, worker, heartbeat_at in running
+            if heartbeat_at is None or heartbeat_at < stale_before or not JobService._worker_alive(worker)
+        ]
+        if not interrupted:
+            return 0
+        with db.engine.begin() as connection:
+            failed = connection.execute(
+                update(Job).where(Job.id.in_(interrupted), Job.status == 'running')
+                .values(status='failed', error='Interrupted: the worker process stopped',
+                        finished_at=datetime.utcnow())
+                .returning(Job.kind, Job.params)
+            ).all()
+        for kind, params in failed:
+            JobService._discard_spooled_file(kind, params)
+        return len(failed)
+
+    @staticmethod
+    def _discard_spooled_file(kind, params):
+        """Delete the spooled file of a job that will never run (see JOB_SPOOLED_FILES)"""
+        path = (params or {}).get(JOB_SPOOLED_FILES.get(kind))
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    @staticmethod
+    def _worker_id():
+        # Computed on each call since a forked worker process gets a new pid
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    @staticmethod
+    def _worker_alive(worker):
+        """Whether the process named by a job's worker may still be running"""
+        host, _, pid = (worker or '').rpartition(':')
+        if host != socket.gethostname() or not pid.isdigit():
+            # Processes on other hosts are judged by their heartbeat alone
+            return True
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            # Exists, but belongs to another user
+            return True
+        return True
+
+    @staticmethod
+    def _heartbeat():
+        """Refresh the heartbeat of every job this process is running"""
+        with db.engine.begin() as connection:
+            return connection.execute(
+                update(Job).where(Job.status == 'running', Job.worker == JobService._worker_id())
+                .values(heartbeat_at=datetime.utcnow())
+            ).rowcount
+
+    @staticmethod
+    def _claim_next():
+        """Atomically move the oldest queued job to running and return its ID"""
+        oldest = (
+            select(Job.id).where(Job.status == 'queued')
+            .order_by(Job.created_at).limit(1).scalar_subquery()
+        )
+        now = datetime.utcnow()
+        with db.engine.begin() as connection:
+            return connection.execute(
+                update(Job).where(Job.id == oldest, Job.status == 'queued')
+                .values(status='running', started_at=now, worker=JobService._worker_id(), heartbeat_at=now)
+                .returning(Job.id)
+            ).scalar()
+
+    @staticmethod
+    def _execute(job_id):
+        job = db.session.get(Job, job_id)
+        kind, params = job.kind, dict(job.params or {})
+        db.session.commit()
+
+        reported = {}
+
+        def progress(value):
+            reported['value'] = value
+            with db.engine.begin() as connection:
+                cancel_requested = connection.execute(
+                    update(Job).where(Job.id == job_id).values(progress=value, heartbeat_at=datetime.utcnow())
+                    .returning(Job.cancel_requested)
+                ).scalar()
+            if cancel_requested:
+                raise JobCancelled()
+
+        try:
+            result = JOB_HANDLERS[kind](job_id, params, progress)
+            JobService._finish(job_id, 'finished', result=result)
+        except JobCancelled:
+            db.session.rollback()
+            # What the job had done (e.g. the rows a GEDCOM import had already stored)
+            JobService._finish(job_id, 'cancelled', result=reported.get('value'))
+        except Exception as e:
+            db.session.rollback()
+            logger.exception(f"Error in {kind} job {job_id}: {str(e)}")
+            JobService._finish(job_id, 'failed', error=str(e))
+
+    @staticmethod
+    def _finish(job_id, status, result=None, error=None):
+        with db.engine.begin() as connection:
+            connection.execute(
+                update(Job).where(Job.id == job_id)
+                .values(status=status, result=result, error=error, finished_at=datetime.utcnow())
+            )
@@ -0,0 +1,414 @@
+#kinship_graph.py
+from collections import namedtuple, deque
+from contextlib import contextmanager
+from itertools import islice
+import threading
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from models import db
+from models.person import Person
+from models.relationship import Relationship
+from models.data_revision import DataRevision
+from services.ancestor_index import AncestorIndex
+
+# Lightweight snapshots so the graph never holds on to session-bound ORM objects
+PersonRecord = namedtuple('PersonRecord', ['id', 'first_name', 'last_name', 'gender', 'birth_date', 'death_date'])
+EdgeRecord = namedtuple('EdgeRecord', ['id', 'person1_id', 'person2_id', 'relationship_type'])
+
+# Neighbor kinds kept for every person
+NEIGHBOR_KINDS = ('parents', 'children', 'spouses', 'siblings', 'other')
+
+# Neighbor kind -> the kind of the same edge seen from the other end
+INVERSE_KINDS = {
+    'parents': 'children',
+    'children': 'parents',
+    'spouses': 'spouses',
+    'siblings': 'siblings',
+    'other': 'other'
+}
+
+# IDs bound per IN (...) list, well below SQLite's variable limit
+ID_CHUNK_SIZE = 500
+
+# Direction filters accepted by traversals, mapped to the neighbor kinds they follow
+TRAVERSAL_DIRECTIONS = {
+    'ancestors': 'parents',
+    'descendants': 'children',
+    'spouses': 'spouses',
+    'siblings': 'siblings',
+    'other': 'other'
+}
+
+
+def person_record(person):
+    """Snapshot a Person (or a row with the same columns) as a PersonRecord"""
+    return PersonRecord(person.id, person.first_name, person.last_name,
+                        person.gender, person.birth_date, person.death_date)
+
+
+def edge_record(relationship):
+    """Snapshot a Relationship (or a row with the same columns) as an EdgeRecord"""
+    return EdgeRecord(relationship.id, relationship.person1_id,
+                      relationship.person2_id, relationship.relationship_type)
+
+
+def id_chunks(ids, size=ID_CHUNK_SIZE):
+    """Split IDs into lists small enough to bind in one IN (...)"""
+    ids = iter(ids)
+    while True:
+        chunk = list(islice(ids, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parent_map(child_ids, restrict=True):
+    """
+    {child_id: [parent_id, ...]} from the stored parent-child relationships
+
+    Read straight from the database, for the closure table and the pedigree
+    analysis, which must not depend on the shared graph being loaded.
+    Relationships left behind by a deleted parent or child are ignored.
+    With restrict=False every relationship is read and child_ids only
+    filters out deleted children.
+    """
+    parent, child = aliased(Person), aliased(Person)
+    query = (
+        select(Relationship.person1_id, Relationship.person2_id)
+        .join(parent, parent.id == Relationship.person1_id)
+        .join(child, child.id == Relationship.person2_id)
+        .where(Relationship.relationship_type == 'parent-child')
+    )
+    chunks = id_chunks(child_ids) if restrict else [None]
+    parents = {}
+    for chunk in chunks:
+        rows = db.session.execute(
+            query if chunk is None else query.where(Relationship.person2_id.in_(chunk))
+        )
+        for parent_id, child_id in rows:
+            if chunk is not None or child_id in child_ids:
+                parents.setdefault(child_id, []).append(parent_id)
+    return parents
+
+
+class KinshipGraph:
+    """
+    In-memory adjacency list of the whole family tree.
+
+    persons maps person id -> PersonRecord, edges maps relationship id -> EdgeRecord
+    and adjacency maps person id -> {kind: [(neighbor_id, relationship_id), ...]}.
+    revision is the DataRevision the graph reflects. The AncestorIndex over the
+    parent-child edges is built on first use and then kept in step by every
+    add/remove below.
+    """
+
+    def __init__(self, revision=0):
+        self.persons = {}
+        self.edges = {}
+        self.adjacency = {}
+        self.revision = revision
+        self._ancestry = None
+
+    @classmethod
+    def load(cls, revision):
+        """Build the graph with one bulk query per table"""
+        graph = cls(revision)
+        person_rows = db.session.query(
+            Person.id, Person.first_name, Person.last_name,
+            Person.gender, Person.birth_date, Person.death_date
+        )
+        for row in person_rows:
+            graph.add_person(person_record(row))
+
+        # In ID order, so neighbor lists (and traversal order) do not depend on the index SQLite picks
+        edge_rows = db.session.query(
+            Relationship.id, Relationship.person1_id,
+            Relationship.person2_id, Relationship.relationship_type
+        ).order_by(Relationship.id)
+        for row in edge_rows:
+            graph.add_edge(edge_record(row))
+        return graph
+
+    def ancestor_index(self):
+        """The graph's AncestorIndex, built on first use"""
+        if self._ancestry is None:
+            self._ancestry = AncestorIndex.build(self)
+        return self._ancestry
+
+    def _neighbors_of(self, person_id):
+        if person_id not in self.adjacency:
+            self.adjacency[person_id] = {kind: [] for kind in NEIGHBOR_KINDS}
+        return self.adjacency[person_id]
+
+    @staticmethod
+    def _edge_kinds(edge):
+        """Return (kind as seen from person1, kind as seen from person2)"""
+        if edge.relationship_type == 'parent-child':
+            return 'children', 'parents'
+        if edge.relationship_type == 'child-parent':
+            return 'parents', 'children'
+        if edge.relationship_type == 'spouse':
+            return 'spouses', 'spouses'
+        if edge.relationship_type == 'sibling':
+            return 'siblings', 'siblings'
+        return 'other', 'other'
+
+    @classmethod
+    def parent_and_child(cls, edge):
+        """(parent_id, child_id) of a parent-child edge, None for other edges"""
+        kind1, _ = cls._edge_kinds(edge)
+        if kind1 == 'children':
+            return edge.person1_id, edge.person2_id
+        if kind1 == 'parents':
+            return edge.person2_id, edge.person1_id
+        return None
+
+    def add_person(self, record):
+        """Insert or refresh a person"""
+        self.persons[record.id] = record
+        self._neighbors_of(record.id)
+        if self._ancestry is not None:
+            self._ancestry.person_added(record.id)
+
+    def add_persons(self, records):
+        """Insert or refresh several persons"""
+        for record in records:
+            self.add_person(record)
+
+    def remove_person(self, person_id):
+        """Drop a person together with every edge touching them"""
+        self.persons.pop(person_id, None)
+        neighbors = self.adjacency.get(person_id, {})
+        edge_ids = {rel_id for kind in neighbors.values() for _, rel_id in kind}
+        for rel_id in edge_ids:
+            self.remove_edge(rel_id)
+        self.adjacency.pop(person_id, None)
+        if self._ancestry is not None:
+            self._ancestry.person_removed(person_id)
+
+    def add_edge(self, record):
+        """Insert an edge, replacing any previous version with the same id"""
+        if record.id in self.edges:
+            self.remove_edge(record.id)
+        self.edges[record.id] = record
+        kind1, kind2 = self._edge_kinds(record)
+        self._neighbors_of(record.person1_id)[kind1].append((record.person2_id, record.id))
+        self._neighbors_of(record.person2_id)[kind2].append((record.person1_id, record.id))
+        if self._ancestry is not None and kind1 in ('children', 'parents'):
+            self._ancestry.parent_edge_added(*self.parent_and_child(record), record.id)
+
+    def add_edges(self, records):
+        """Insert several edges"""
+        for record in records:
+            self.add_edge(record)
+
+    def remove_edge(self, relationship_id):
+        """Remove an edge if it is present"""
+        record = self.edges.pop(relationship_id, None)
+        if record is None:
+            return
+        kind1, kind2 = self._edge_kinds(record)
+        for person_id, kind in ((record.person1_id, kind1), (record.person2_id, kind2)):
+            entries = self.adjacency.get(person_id, {}).get(kind)
+            if entries:
+                entries[:] = [entry for entry in entries if entry[1] != relationship_id]
+        if self._ancestry is not None and kind1 in ('children', 'parents'):
+            self._ancestry.parent_edge_removed(*self.parent_and_child(record), record.id)
+
+    def remove_edges(self, relationship_ids):
+        """Remove several edges"""
+        for relationship_id in relationship_ids:
+            self.remove_edge(relationship_id)
+
+    def neighbors(self, person_id, kinds=NEIGHBOR_KINDS):
+        """Yield (neighbor_id, relationship_id) pairs for the requested kinds"""
+        neighbors = self.adjacency.get(person_id)
+        if not neighbors:
+            return
+        for kind in kinds:
+            yield from neighbors[kind]
+
+    def traverse(self, root_id, max_depth=None, max_nodes=None, kinds=NEIGHBOR_KINDS):
+        """
+        Breadth-first walk from root_id.
+
+        Args:
+            root_id: Person ID to start from
+            max_depth: Maximum number of hops from the root (None for unlimited)
+            max_nodes: Maximum number of persons to return (None for unlimited)
+            kinds: Neighbor kinds to follow while expanding
+
+        Returns:
+            (person_ids, relationship_ids): persons in BFS order mapped to their depth,
+            and the sorted IDs of every relationship between two returned persons
+        """
+        if root_id not in self.persons:
+            return {}, []
+
+        depths = {root_id: 0}
+        queue = deque([root_id])
+        while queue and (max_nodes is None or len(depths) < max_nodes):
+            person_id = queue.popleft()
+            depth = depths[person_id]
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for other_id, _ in self.neighbors(person_id, kinds):
+                if other_id in depths or other_id not in self.persons:
+                    continue
+                depths[other_id] = depth + 1
+                if max_nodes is not None and len(depths) >= max_nodes:
+                    break
+                queue.append(other_id)
+
+        # Every relationship between two collected persons, whatever its kind
+        relationship_ids = set()
+        for person_id in depths:
+            for other_id, rel_id in self.neighbors(person_id):
+                if other_id in depths:
+                    relationship_ids.add(rel_id)
+        return depths, sorted(relationship_ids)
+
+    def shortest_path(self, source_id, target_id, kinds=NEIGHBOR_KINDS, max_length=None):
+        """
+        Shortest path between two persons, by bidirectional breadth-first search.
+
+        Both ends grow one full BFS level at a time, always the end with the smaller
+        frontier, so on a tree with branching factor b a path of length d visits
+        about 2 * b^(d/2) persons instead of b^d. The first level on which the two
+        searches meet contains a shortest path.
+
+        Args:
+            source_id: Person ID the path starts at
+            target_id: Person ID the path ends at
+            kinds: Neighbor kinds that may be followed
+            max_length: Maximum number of edges (None for unlimited)
+
+        Returns:
+            List of (person_id, kind, relationship_id) steps from source to target,
+            where kind is what that person is to the previous one (None for the
+            source), or None if the persons are not connected
+        """
+        if source_id not in self.persons or target_id not in self.persons:
+            return None
+        if source_id == target_id:
+            return [(source_id, None, None)]
+
+        # person -> (previous person towards that side's start, kind, relationship id)
+        forward = {source_id: None}
+        backward = {target_id: None}
+        forward_frontier, backward_frontier = [source_id], [target_id]
+        length = 0
+
+        while forward_frontier and backward_frontier:
+            if max_length is not None and length >= max_length:
+                return None
+            expand_forward = len(forward_frontier) <= len(backward_frontier)
+            if expand_forward:
+                frontier, visited, other = forward_frontier, forward, backward
+            else:
+                frontier, visited, other = backward_frontier, backward, forward
+
+            next_frontier = []
+            meeting = None
+            for person_id in frontier:
+                for other_id, rel_id, kind in self._typed_neighbors(person_id, kinds):
+                    if other_id in visited or other_id not in self.persons:
+                        continue
+                    visited[other_id] = (person_id, kind, rel_id)
+                    next_frontier.append(other_id)
+                    if meeting is None and other_id in other:
+                        meeting = other_id
+            length += 1
+            if meeting is not None:
+                # Every node of the finished level is equally far from its start, so any meeting point is on a shortest path
+                return self._join_paths(meeting, forward, backward)
+
+            if expand_forward:
+                forward_frontier = next_frontier
+            else:
+                backward_frontier = next_frontier
+        return None
+
+    def _typed_neighbors(self, person_id, kinds):
+        neighbors = self.adjacency.get(person_id)
+        if not neighbors:
+            return
+        for kind in kinds:
+            for other_id, rel_id in neighbors[kind]:
+                yield other_id, rel_id, kind
+
+    @staticmethod
+    def _join_paths(meeting_id, forward, backward):
+        """Stitch the two BFS trees together at meeting_id into source-to-target steps"""
+        steps = []
+        person_id = meeting_id
+        while forward[person_id] is not None:
+            previous_id, kind, rel_id = forward[person_id]
+            steps.append((person_id, kind, rel_id))
+            person_id = previous_id
+        steps.append((person_id, None, None))
+        steps.reverse()
+
+        person_id = meeting_id
+        while backward[person_id] is not None:
+            next_id, kind, rel_id = backward[person_id]
+            # The backward search recorded what person_id is to next_id; the path needs the reverse
+            steps.append((next_id, INVERSE_KINDS[kind], rel_id))
+            person_id = next_id
+        return steps
+
+
+# Process-wide graph, loaded lazily on first read
+_graph = None
+_graph_lock = threading.RLock()
+
+
+def get_graph():
+    """Return the shared graph, (re)loading it if missing or behind the database revision"""
+    global _graph
+    revision = DataRevision.current()
+    with _graph_lock:
+        if _graph is None or _graph.revision != revision:
+            _graph = KinshipGraph.load(revision)
+        return _graph
+
+
+def graph_is_loaded():
+    """Whether the shared graph is loaded and up to date, so reading it needs no reload"""
+    revision = DataRevision.current()
+    with _graph_lock:
+        return _graph is not None and _graph.revision == revision
+
+
+@contextmanager
+def locked_graph():
+    """Hold the shared graph for a traversal so writers cannot patch it mid-walk"""
+    with _graph_lock:
+        yield get_graph()
+
+
+def invalidate_graph():
+    """Discard the shared graph so the next read reloads it"""
+    global _graph
+    with _graph_lock:
+        _graph = None
+
+
+def patch_graph(revision, update=None):
+    """
+    Bring the shared graph up to a just-committed revision.
+
+    If the graph is loaded and sits exactly one revision behind, update(graph) is
+    applied in place; otherwise another writer got in between and the graph is
+    discarded so the next read reloads it.
+    """
+    global _graph
+    with _graph_lock:
+        if _graph is None:
+            return
+        if _graph.revision != revision - 1:
+            _graph = None
+            return
+        if update is not None:
+            update(_graph)
+        _graph.revision = revision
@@ -0,0 +1,274 @@
+#kinship_service.py
+from collections import OrderedDict
+from services.kinship_graph import locked_graph
+
+# Neighbor kinds a kinship path may follow ("other" relationships say nothing about kinship)
+KINSHIP_KINDS = ('parents', 'children', 'spouses', 'siblings')
+
+# Longest path searched for, in edges
+DEFAULT_MAX_PATH_LENGTH = 40
+
+# Pair results kept per data revision
+KINSHIP_MEMO_SIZE = 10000
+
+# Neighbor kind -> (generations up, generations down) it moves along a blood line
+BLOOD_STEPS = {'parents': (1, 0), 'children': (0, 1), 'siblings': (1, 1)}
+
+# Gendered words: (male, female, unknown)
+SPOUSE_WORDS = ('husband', 'wife', 'spouse')
+PARENT_WORDS = ('father', 'mother', 'parent')
+CHILD_WORDS = ('son', 'daughter', 'child')
+SIBLING_WORDS = ('brother', 'sister', 'sibling')
+UNCLE_WORDS = ('uncle', 'aunt', 'uncle or aunt')
+NEPHEW_WORDS = ('nephew', 'niece', 'nephew or niece')
+
+# Neighbor kind -> name of the step in a returned path
+STEP_NAMES = {'parents': 'parent', 'children': 'child', 'spouses': 'spouse', 'siblings': 'sibling'}
+
+
+def _word(words, gender, prefix=''):
+    word = words[0] if gender == 'male' else words[1] if gender == 'female' else words[2]
+    # 'uncle or aunt' becomes 'granduncle or grandaunt', not 'granduncle or aunt'
+    return ' or '.join(prefix + part for part in word.split(' or '))
+
+
+def _ordinal(number):
+    if 10 <= number % 100 <= 20:
+        suffix = 'th'
+    else:
+        suffix = {1: 'st', 2: 'nd', 3: 'rd'}.get(number % 10, 'th')
+    return f"{number}{suffix}"
+
+
+def _times(number):
+    return {1: 'once', 2: 'twice'}.get(number, f"{number} times")
+
+
+def _greats(count):
+    """'' / 'great-' / 'great-great-' / '3rd great-' ... for count extra generations"""
+    if count <= 0:
+        return ''
+    if count <= 2:
+        return 'great-' * count
+    return f"{_ordinal(count)} great-"
+
+
+def blood_relationship_name(up, down, gender):
+    """
+    Name of a blood relative, as seen from the other person
+
+    Args:
+        up: Generations from the first person up to the common ancestor
+        down: Generations from the common ancestor down to the relative
+        gender: Gender of the relative
+
+    Returns:
+        E.g. 'mother', 'great-grandson', 'second cousin once removed'
+    """
+    if up == 0 and down == 0:
+        return 'self'
+    if down == 0:
+        return _word(PARENT_WORDS, gender, '' if up == 1 else _greats(up - 2) + 'grand')
+    if up == 0:
+        return _word(CHILD_WORDS, gender, '' if down == 1 else _greats(down - 2) + 'grand')
+    if up == 1 and down == 1:
+        return _word(SIBLING_WORDS, gender)
+    if down == 1:
+        # A sibling of an ancestor
+        return _word(UNCLE_WORDS, gender, '' if up == 2 else _greats(up - 3) + 'grand')
+    if up == 1:
+        # A descendant of a sibling
+        return _word(NEPHEW_WORDS, gender, '' if down == 2 else _greats(down - 3) + 'grand')
+
+    cousin = min(up, down) - 1
+    removed = abs(up - down)
+    words = {1: 'first', 2: 'second', 3: 'third', 4: 'fourth', 5: 'fifth'}
+    name = f"{words.get(cousin, _ordinal(cousin))} cousin"
+    return f"{name} {_times(removed)} removed" if removed else name
+
+
+def split_kinship_path(steps):
+    """
+    Cut a path into blood segments joined by marriages
+
+    A blood segment only goes up and then down (through one common ancestor);
+    a spouse step, or going up again after going down, starts a new segment.
+
+    Args:
+        steps: Path from KinshipGraph.shortest_path
+
+    Returns:
+        List of ('blood', up, down, end_person_id) and ('spouse', end_person_id) segments
+    """
+    segments = []
+    up = down = 0
+    for person_id, kind, _ in steps[1:]:
+        if kind == 'spouses':
+            if up or down:
+                segments.append(('blood', up, down, previous_id))
+                up = down = 0
+            segments.append(('spouse', person_id))
+        else:
+            step_up, step_down = BLOOD_STEPS[kind]
+            if step_up and down:
+                segments.append(('blood', up, down, previous_id))
+                up = down = 0
+            up += step_up
+            down += step_down
+        previous_id = person_id
+    if up or down:
+        segments.append(('blood', up, down, previous_id))
+    return segments
+
+
+class KinshipService:
+    """
+    "How is A related to B" from the in-memory kinship graph.
+
+    The shortest path over parent, child, spouse and sibling edges is found with
+    a bidirectional BFS (KinshipGraph.shortest_path) and named: a path through
+    one common ancestor is a blood relationship with a degree of consanguinity,
+    other paths are described through the marriages they cross. Results are
+    memoized per pair until the data revision changes.
+    """
+
+    # Only touched while holding the graph lock
+    _memo = OrderedDict()
+    _memo_revision = None
+
+    @staticmethod
+    def relationship_between(person_a_id, person_b_id, max_length=DEFAULT_MAX_PATH_LENGTH):
+        """
+        Describe how person B is related to person A
+
+        Args:
+            person_a_id: ID of the person the relationship is seen from
+            person_b_id: ID of the relative
+            max_length: Longest path searched for, in edges
+
+        Returns:
+            Dict with related, relationship (what B is to A), blood, consanguinity
+            and path, or None if either person does not exist
+        """
+        with locked_graph() as graph:
+            key = (person_a_id, person_b_id, max_length)
+            if KinshipService._memo_revision != graph.revision:
+                KinshipService._memo.clear()
+                KinshipService._memo_revision = graph.revision
+            elif key in KinshipService._memo:
+                KinshipService._memo.move_to_end(key)
+                return KinshipService._memo[key]
+
+            if person_a_id not in graph.persons or person_b_id not in graph.persons:
+                return None
+            steps = graph.shortest_path(person_a_id, person_b_id, KINSHIP_KINDS, max_length)
+            result = KinshipService._describe(graph, person_a_id, person_b_id, steps)
+
+            KinshipService._memo[key] = result
+            if len(KinshipService._memo) > KINSHIP_MEMO_SIZE:
+                KinshipService._memo.popitem(last=False)
+        return result
+
+    @staticmethod
+    def common_ancestors(person_a_id, person_b_id):
+        """
+        Common ancestors of two persons, from the graph's AncestorIndex
+
+        Args:
+            person_a_id: ID of the first person
+            person_b_id: ID of the second person
+
+        Returns:
+            Dict with the IDs of every common ancestor and the nearest ones (those
+            with no child who is also a common ancestor) with the generations up
+            from each person and the resulting degree of consanguinity, or None if
+            either person does not exist
+        """
+        with locked_graph() as graph:
+            if person_a_id not in graph.persons or person_b_id not in graph.persons:
+                return None
+            index = graph.ancestor_index()
+            common = index.common_ancestors(person_a_id, person_b_id)
+            nearest = index.nearest_common_ancestors(person_a_id, person_b_id)
+            return {
+                'a': KinshipService._person_summary(graph.persons[person_a_id]),
+                'b': KinshipService._person_summary(graph.persons[person_b_id]),
+                'common_ancestors': sorted(common, key=lambda person_id: (-index.generation[person_id], person_id)),
+                'nearest': [
+                    dict(KinshipService._person_summary(graph.persons[ancestor_id]),
+                         generations_a=up, generations_b=down, degree=up + down)
+                    for ancestor_id, up, down in nearest
+                ]
+            }
+
+    @staticmethod
+    def _describe(graph, person_a_id, person_b_id, steps):
+        person_a = graph.persons[person_a_id]
+        person_b = graph.persons[person_b_id]
+        result = {
+            'a': KinshipService._person_summary(person_a),
+            'b': KinshipService._person_summary(person_b),
+            'related': steps is not None,
+            'relationship': None,
+            'blood': False,
+            'consanguinity': None,
+            'distance': None,
+            'path': []
+        }
+        if steps is None:
+            return result
+
+        segments = split_kinship_path(steps)
+        result['relationship'] = KinshipService._name_segments(graph, segments)
+        result['distance'] = len(steps) - 1
+        result['path'] = [
+            dict(KinshipService._person_summary(graph.persons[person_id]),
+                 step=STEP_NAMES.get(kind),
+                 relationship_id=rel_id)
+            for person_id, kind, rel_id in steps
+        ]
+        if len(segments) == 1 and segments[0][0] == 'blood':
+            _, up, down, _ = segments[0]
+            result['blood'] = True
+            # Civil-law degree: generations from each person up to the common ancestor, added
+            result['consanguinity'] = {'degree': up + down, 'generations_a': up, 'generations_b': down}
+        return result
+
+    @staticmethod
+    def _name_segments(graph, segments):
+        """Name a segmented path, e.g. 'second cousin', 'brother-in-law' or "wife's cousin's husband" """
+        if not segments:
+            return 'self'
+
+        def gender_of(person_id):
+            return graph.persons[person_id].gender
+
+        names = []
+        for segment in segments:
+            if segment[0] == 'spouse':
+                names.append(_word(SPOUSE_WORDS, gender_of(segment[1])))
+            else:
+                _, up, down, end_id = segment
+                names.append(blood_relationship_name(up, down, gender_of(end_id)))
+
+        # Spouse's near relatives and near relatives' spouses have names of their own
+        kinds = tuple(segment[0] for segment in segments)
+        if kinds == ('spouse', 'blood'):
+            relation = segments[1][1:3]
+            if relation == (0, 1):
+                return _word(CHILD_WORDS, gender_of(segments[1][3]), 'step')
+            if relation in ((1, 0), (1, 1)):
+                return names[1] + '-in-law'
+        if kinds == ('blood', 'spouse'):
+            relation, gender = segments[0][1:3], gender_of(segments[1][1])
+            if relation == (1, 0):
+                return _word(PARENT_WORDS, gender, 'step')
+            if relation == (1, 1):
+                return _word(SIBLING_WORDS, gender) + '-in-law'
+            if relation == (0, 1):
+                return _word(CHILD_WORDS, gender) + '-in-law'
+        return "'s ".join(names)
+
+    @staticmethod
+    def _person_summary(person):
+        return {'id': person.id, 'name': f"{person.first_name} {person.last_name}"}
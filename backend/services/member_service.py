@@ -1,23 +1,125 @@
 #member_service.py
 from models import db
 from models.person import Person
+from models.data_revision import DataRevision
 from models.custom_field import CustomField
 from models.media import Media
-from datetime import datetime
+from services.kinship_graph import person_record, PersonRecord
+from services.tree_service import TreeService
+from services.closure_service import ClosureService
+from services.blob_store import BlobStore
+from services.derivative_service import DerivativeService
+from utils.validators import validate_member_data
+from utils.uploads import copy_stream, media_size_limit, is_video
+from utils.media_derivatives import image_dimensions
+from datetime import datetime, date
+from itertools import islice
+import hashlib
+import logging
 import os
 from werkzeug.utils import secure_filename
 from flask import current_app
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import selectinload, load_only
+
+logger = logging.getLogger(__name__)
+
+# Rows inserted per transaction by bulk imports unless configured otherwise
+DEFAULT_IMPORT_BATCH_SIZE = 1000
+
+# Columns each serialized member field needs, used to push projections down to SQL
+MEMBER_FIELD_COLUMNS = {
+    'id': ['id'],
+    'first_name': ['first_name'],
+    'last_name': ['last_name'],
+    'full_name': ['first_name', 'last_name'],
+    'gender': ['gender'],
+    'birth_date': ['birth_date'],
+    'death_date': ['death_date'],
+    'biography': ['biography'],
+    'custom_fields': [],
+    'media': []
+}
 
 class MemberService:
+    @staticmethod
+    def _with_collections(query):
+        """Batch-load custom fields and media so to_dict() issues no per-member queries"""
+        return query.options(selectinload(Person.custom_fields), selectinload(Person.media))
+    
     @staticmethod
     def get_all_members():
         """Get all members from the database"""
-        return Person.query.all()
+        return MemberService._with_collections(Person.query).all()
+    
+    @staticmethod
+    def list_members(**options):
+        """List members in ID order; takes the same options as member_query"""
+        return MemberService.member_query(**options).all()
+    
+    @staticmethod
+    def iter_members(batch_size=1000, **options):
+        """Yield members in ID order, fetching batch_size rows per round trip"""
+        return MemberService.member_query(**options).yield_per(batch_size)
+    
+    @staticmethod
+    def member_query(after_id=None, limit=None, fields=None, surname=None,
+                     birth_year_min=None, birth_year_max=None, gender=None):
+        """
+        Build the member listing query with keyset pagination, projection and filters
+        
+        Args:
+            after_id: Only return members with an ID greater than this
+            limit: Maximum number of members to return (None for all)
+            fields: Set of MEMBER_FIELD_COLUMNS keys to load (None for all)
+            surname: Case-insensitive last name prefix
+            birth_year_min: Earliest birth year (inclusive)
+            birth_year_max: Latest birth year (inclusive)
+            gender: Exact gender
+        
+        Returns:
+            Query yielding Person objects with only the requested fields loaded
+        """
+        query = Person.query
+        
+        if fields is None:
+            query = MemberService._with_collections(query)
+        else:
+            columns = {column for field in fields for column in MEMBER_FIELD_COLUMNS[field]}
+            query = query.options(load_only(*[getattr(Person, column) for column in columns]))
+            if 'custom_fields' in fields:
+                query = query.options(selectinload(Person.custom_fields))
+            if 'media' in fields:
+                query = query.options(selectinload(Person.media))
+        
+        if surname:
+            # Range on the NOCASE index instead of LIKE so the prefix scan stays indexed
+            last_name = Person.last_name.collate('NOCASE')
+            query = query.filter(last_name >= surname, last_name < surname + '\U0010ffff')
+        if birth_year_min:
+            query = query.filter(Person.birth_date >= date(birth_year_min, 1, 1))
+        if birth_year_max:
+            query = query.filter(Person.birth_date < date(birth_year_max + 1, 1, 1))
+        if gender:
+            query = query.filter(Person.gender == gender)
+        if after_id is not None:
+            query = query.filter(Person.id > after_id)
+        
+        query = query.order_by(Person.id)
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+    
+    @staticmethod
+    def member_exists(member_id):
+        """True if a member with this ID exists (a primary key lookup, no collections)"""
+        return db.session.query(Person.id).filter(Person.id == member_id).first() is not None
     
     @staticmethod
     def get_member_by_id(member_id):
         """Get a member by ID"""
-        return Person.query.get(member_id)
+        return MemberService._with_collections(Person.query).filter(Person.id == member_id).first()
     
     @staticmethod
     def create_member(data):
@@ -62,9 +164,124 @@ class MemberService:
                     )
                     db.session.add(custom_field)
         
+        revision = DataRevision.bump()
         db.session.commit()
+        
+        record = person_record(new_person)
+        TreeService.after_write(revision, [record.id], lambda graph: graph.add_person(record))
         return new_person
     
+    @staticmethod
+    def bulk_create_members(records, batch_size=None):
+        """
+        Create many members, committing once per batch
+        
+        Rows are validated a batch at a time with validate_member_data; invalid rows
+        are reported and skipped without affecting the rest of their batch. Valid rows
+        are written with one executemany for persons and one for custom fields.
+        
+        Args:
+            records: Iterable of member dicts (same shape as create_member); anything
+                     that is not a dict is reported as an invalid row
+            batch_size: Rows per transaction (IMPORT_BATCH_SIZE config, default 1000)
+        
+        Returns:
+            Dict with the created IDs (in input order) and a list of
+            {'index': row_number, 'errors': [...]} for rejected rows
+        """
+        if batch_size is None:
+            batch_size = current_app.config.get('IMPORT_BATCH_SIZE', DEFAULT_IMPORT_BATCH_SIZE)
+        
+        result = {'created': [], 'errors': []}
+        records = iter(records)
+        offset = 0
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            
+            rows = []
+            for index, outcome in enumerate(map(MemberService._prepare_import_row, batch), start=offset):
+                if isinstance(outcome, list):
+                    result['errors'].append({'index': index, 'errors': outcome})
+                else:
+                    rows.append((index, outcome))
+            offset += len(batch)
+            
+            if rows:
+                try:
+                    result['created'].extend(MemberService._insert_member_rows([row for _, row in rows]))
+                except SQLAlchemyError:
+                    # Isolate the offending rows by retrying one at a time
+                    db.session.rollback()
+                    for index, row in rows:
+                        try:
+                            result['created'].extend(MemberService._insert_member_rows([row]))
+                        except SQLAlchemyError as e:
+                            db.session.rollback()
+                            result['errors'].append({'index': index, 'errors': [str(e.orig or e)]})
+        
+        return result
+    
+    @staticmethod
+    def _prepare_import_row(data):
+        """Validate one import row, returning insert values or a list of errors"""
+        if not isinstance(data, dict):
+            return ["Row must be a JSON object"]
+        try:
+            is_valid, errors = validate_member_data(data)
+        except (AttributeError, TypeError):
+            return ["Row contains values of the wrong type"]
+        if not is_valid:
+            return errors
+        
+        def parse_date(value):
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).date() if value else None
+        
+        custom_fields = [
+            {'field_name': field['field_name'], 'field_value': field['field_value']}
+            for field in data.get('custom_fields') or []
+            if 'field_name' in field and 'field_value' in field
+        ]
+        return {
+            'person': {
+                'first_name': data['first_name'],
+                'last_name': data['last_name'],
+                'gender': data.get('gender'),
+                'birth_date': parse_date(data.get('birth_date')),
+                'death_date': parse_date(data.get('death_date')),
+                'biography': data.get('biography')
+            },
+            'custom_fields': custom_fields
+        }
+    
+    @staticmethod
+    def _insert_member_rows(rows):
+        """Insert prepared rows in one transaction and return their new IDs"""
+        person_ids = db.session.execute(
+            insert(Person).returning(Person.id, sort_by_parameter_order=True),
+            [row['person'] for row in rows]
+        ).scalars().all()
+        
+        field_rows = [
+            dict(field, person_id=person_id)
+            for person_id, row in zip(person_ids, rows)
+            for field in row['custom_fields']
+        ]
+        if field_rows:
+            db.session.execute(insert(CustomField), field_rows)
+        
+        revision = DataRevision.bump()
+        db.session.commit()
+        
+        records = [
+            PersonRecord(person_id, row['person']['first_name'], row['person']['last_name'],
+                         row['person']['gender'], row['person']['birth_date'], row['person']['death_date'])
+            for person_id, row in zip(person_ids, rows)
+        ]
+        TreeService.after_write(revision, person_ids, lambda graph: graph.add_persons(records))
+        return person_ids
+    
     @staticmethod
     def update_member(member_id, data):
         """Update an existing member"""
@@ -117,7 +334,11 @@ class MemberService:
                     )
                     db.session.add(custom_field)
         
+        revision = DataRevision.bump()
         db.session.commit()
+        
+        record = person_record(member)
+        TreeService.after_write(revision, [record.id], lambda graph: graph.add_person(record))
         return member
     
     @staticmethod
@@ -128,50 +349,135 @@ class MemberService:
         if not member:
             raise ValueError(f"Member with ID {member_id} not found")
         
+        media_paths = {media.file_path for media in member.media}
         db.session.delete(member)
+        ClosureService.person_removed(member_id)
+        revision = DataRevision.bump()
         db.session.commit()
+        
+        # Unlink the member's media files that no other member shares
+        for file_path in media_paths:
+            BlobStore.release(file_path)
+        
+        TreeService.after_write(revision, [member_id], lambda graph: graph.remove_person(member_id))
         return True
     
     @staticmethod
-    def save_media(member_id, file, title, description):
-        """Save media file for a member"""
+    def save_media(member_id, file, title, description, media_type=''):
+        """
+        Save an uploaded media file for a member
+        
+        The upload is copied to disk in UPLOAD_CHUNK_SIZE pieces; the size limit is
+        enforced and the SHA-256 computed while copying, so the file is never held
+        in memory as a whole.
+        
+        Raises:
+            ValueError: If the member does not exist
+            UploadTooLarge: If the file is over its size limit
+        """
         # Check if the member exists
         member = Person.query.get(member_id)
         
         if not member:
             raise ValueError(f"Member with ID {member_id} not found")
         
-        filename = secure_filename(file.filename)
+        max_size = media_size_limit(file.filename, media_type)
+        digest = hashlib.sha256()
         
-        # Make sure the upload folder exists
-        os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
+        handle, temp_path = BlobStore.temp_file()
+        try:
+            with os.fdopen(handle, 'wb') as destination:
+                size = copy_stream(file.stream, destination, max_size, digest)
+            return MemberService.store_media_file(
+                member_id, temp_path, file.filename, size, digest.hexdigest(), title, description
+            )
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    @staticmethod
+    def store_media_file(member_id, temp_path, filename, size, content_hash, title, description):
+        """
+        Move a fully received upload into the blob store and create its Media record
         
-        # Create a folder for this member if it doesn't exist
-        member_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], str(member_id))
-        os.makedirs(member_folder, exist_ok=True)
+        Identical files are stored once: if the content is already in the store the
+        new record references the existing blob and the received copy is dropped.
         
-        file_path = os.path.join(member_folder, filename)
-        file.save(file_path)
+        Args:
+            member_id: Owner of the media
+            temp_path: Path of the received file (moved, not copied)
+            filename: Original client file name
+            size: File size in bytes
+            content_hash: SHA-256 hex digest of the file
+        """
+        filename = secure_filename(filename)
         
         # Determine media type based on file extension
-        media_type = 'photo'
-        if filename.rsplit('.', 1)[1].lower() in {'mp4', 'mov'}:
-            media_type = 'video'
-        
-        # Create a new media record
-        new_media = Media(
-            person_id=member_id,
-            media_type=media_type,
-            file_path=os.path.join(str(member_id), filename),  # Store relative path
-            title=title or '',
-            description=description or ''
-        )
+        media_type = 'video' if is_video(filename) else 'photo'
         
-        db.session.add(new_media)
-        db.session.commit()
+        # Image sizes come from the header; video sizes arrive with the poster frame
+        width, height = image_dimensions(temp_path) if media_type == 'photo' else (None, None)
+        
+        with BlobStore.lock:
+            file_path, deduplicated = BlobStore.store(temp_path, content_hash, filename)
+            if deduplicated:
+                logger.debug(f"{filename} is already stored as {file_path}, sharing it")
+            
+            # Create a new media record
+            new_media = Media(
+                person_id=member_id,
+                media_type=media_type,
+                file_path=file_path,  # Relative to UPLOAD_FOLDER
+                filename=filename,
+                title=title or '',
+                description=description or '',
+                file_size=size,
+                content_hash=content_hash,
+                width=width,
+                height=height
+            )
+            
+            db.session.add(new_media)
+            revision = DataRevision.bump()
+            db.session.commit()
         
+        # Media does not change the tree, but the graph and cache must follow the revision
+        TreeService.after_write(revision)
+        
+        # Thumbnails are generated in the background; a failure here must not fail the upload
+        try:
+            DerivativeService.schedule(new_media)
+        except Exception as e:
+            print(f"ERROR scheduling derivatives for media {new_media.id}: {str(e)}")
         return new_media
     
+    @staticmethod
+    def list_media(member_ids, after_id=None, limit=None, media_type=None):
+        """
+        Media of one or more members in a single query
+        
+        The person_id index keys rows by (person_id, id), so ordering by member
+        and then ID reads the index in order without a sort step.
+        
+        Args:
+            member_ids: IDs of the members
+            after_id: Only return media with an ID greater than this
+            limit: Maximum number of media to return (None for all)
+            media_type: 'photo' or 'video' to only return that type
+        
+        Returns:
+            List of Media ordered by member ID, then media ID
+        """
+        query = Media.query.filter(Media.person_id.in_(member_ids))
+        if media_type:
+            query = query.filter(Media.media_type == media_type)
+        if after_id is not None:
+            query = query.filter(Media.id > after_id)
+        query = query.order_by(Media.person_id, Media.id)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+    
     @staticmethod
     def delete_media(media_id, member_id=None):
         """Delete media for a member"""
@@ -184,13 +490,12 @@ class MemberService:
         if member_id and media.person_id != member_id:
             raise ValueError(f"Media does not belong to member with ID {member_id}")
         
-        # Delete the file from the filesystem
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], media.file_path)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        
-        # Delete the database record
+        # Delete the database record, then the file if no other record shares it
+        file_path = media.file_path
         db.session.delete(media)
+        revision = DataRevision.bump()
         db.session.commit()
+        BlobStore.release(file_path)
         
+        TreeService.after_write(revision)
         return True
\ No newline at end of file
@@ -0,0 +1,277 @@
+#pedigree_service.py
+import logging
+from sqlalchemy import select, delete
+from models import db
+from models.person import Person
+from models.job import Job
+from models.data_revision import DataRevision
+from models.pedigree_diagnostic import PedigreeDiagnostic
+from services.kinship_graph import parent_map
+
+logger = logging.getLogger(__name__)
+
+# Generations of ancestors the implex of each person is computed over
+DEFAULT_IMPLEX_GENERATIONS = 5
+
+# The analysis reports progress (and notices cancellation) every this many persons
+ANALYSIS_PROGRESS_INTERVAL = 10000
+
+# Loops and collapsed pedigrees listed by the diagnostics report
+DEFAULT_REPORT_SIZE = 20
+
+_INSERT_DIAGNOSTIC_ROW = (
+    "INSERT INTO pedigree_diagnostic (person_id, cycle_id, ancestors, ancestor_slots, implex) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+
+
+class PedigreeService:
+    """
+    Pedigree analysis: loops in the parent-child relationships (somebody
+    their own ancestor, usually an import error) and pedigree collapse
+    (implex, the same ancestor reached along several lines, as in
+    intermarried families).
+
+    analyze runs as the pedigree-analysis job and stores its findings in the
+    pedigree_diagnostic table; the summary is the job's result. Loading the
+    parent edges and the loop search are linear in the number of persons and
+    parent-child relationships. The implex walk expands, for each person,
+    every distinct ancestor of each generation within the window: up to
+    2^(generations + 1) - 2 per person in a tree without collapse, about 500
+    at MAX_IMPLEX_GENERATIONS and 62 at the default of 5, and far fewer
+    where the pedigree is incomplete or collapses.
+    """
+
+    @staticmethod
+    def analyze(generations=None, progress=None):
+        """
+        Find the loops and compute every person's implex, replacing the stored findings
+
+        Loops are the strongly connected components of the parent edges
+        (Tarjan's algorithm). The components come out ancestors first, a
+        topological order used to number the longest line of ancestors.
+        Implex is computed with the relationships inside loops left out.
+
+        Args:
+            generations: Generations of ancestors the implex covers (DEFAULT_IMPLEX_GENERATIONS if None)
+            progress: Optional callable receiving {'stage', 'persons'} now and then
+
+        Returns:
+            Summary dict of the analysis
+        """
+        generations = generations or DEFAULT_IMPLEX_GENERATIONS
+        revision = DataRevision.current()
+        person_ids = list(db.session.execute(select(Person.id).order_by(Person.id)).scalars())
+        parents = parent_map(set(person_ids), restrict=False)
+        parent_edges = sum(len(parent_ids) for parent_ids in parents.values())
+        logger.debug(f"Analyzing the pedigree of {len(person_ids)} persons")
+
+        cycle_of = {}
+        cycles = 0
+        line_length = {}
+        for component in PedigreeService.strongly_connected_components(person_ids, parents):
+            members = set(component)
+            if len(component) > 1 or component[0] in parents.get(component[0], ()):
+                cycles += 1
+                cycle_of.update(dict.fromkeys(component, cycles))
+            # Every ancestor outside the component has been numbered already
+            longest = max(
+                (line_length[parent_id] + 1 for person_id in component
+                 for parent_id in parents.get(person_id, ()) if parent_id not in members),
+                default=0
+            )
+            line_length.update(dict.fromkeys(component, longest))
+        if progress:
+            progress({'stage': 'cycles', 'persons': 0})
+
+        # Without the relationships inside loops the parent edges form a DAG
+        for person_id, cycle_id in cycle_of.items():
+            parents[person_id] = [
+                parent_id for parent_id in parents[person_id] if cycle_of.get(parent_id) != cycle_id
+            ]
+
+        rows = []
+        max_implex = 0.0
+        for done, person_id in enumerate(person_ids, start=1):
+            ancestors, slots = PedigreeService._pedigree_window(person_id, parents, generations)
+            implex = 1 - ancestors / slots if slots else 0.0
+            if implex > 0 or person_id in cycle_of:
+                rows.append((person_id, cycle_of.get(person_id), ancestors, slots, implex))
+                max_implex = max(max_implex, implex)
+            if progress and done % ANALYSIS_PROGRESS_INTERVAL == 0:
+                progress({'stage': 'implex', 'persons': done})
+
+        db.session.execute(delete(PedigreeDiagnostic))
+        if rows:
+            db.session.connection().exec_driver_sql(_INSERT_DIAGNOSTIC_ROW, rows)
+        db.session.commit()
+
+        return {
+            'revision': revision,
+            'persons': len(person_ids),
+            'parent_edges': parent_edges,
+            'generations': generations,
+            'cycles': cycles,
+            'persons_in_cycles': len(cycle_of),
+            'collapsed_persons': sum(1 for row in rows if row[4] > 0),
+            'max_implex': max_implex,
+            'longest_line': max(line_length.values(), default=0)
+        }
+
+    @staticmethod
+    def strongly_connected_components(person_ids, parents):
+        """
+        Tarjan's algorithm over the parent edges, without recursion
+
+        Args:
+            person_ids: Every person to visit
+            parents: {child_id: [parent_id, ...]}
+
+        Yields:
+            Lists of person IDs, one per component, every component after
+            the components of its ancestors
+        """
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        for root_id in person_ids:
+            if root_id in index:
+                continue
+            index[root_id] = lowlink[root_id] = len(index)
+            stack.append(root_id)
+            on_stack.add(root_id)
+            work = [(root_id, iter(parents.get(root_id, ())))]
+            while work:
+                person_id, pending = work[-1]
+                for parent_id in pending:
+                    if parent_id not in index:
+                        index[parent_id] = lowlink[parent_id] = len(index)
+                        stack.append(parent_id)
+                        on_stack.add(parent_id)
+                        work.append((parent_id, iter(parents.get(parent_id, ()))))
+                        break
+                    if parent_id in on_stack:
+                        lowlink[person_id] = min(lowlink[person_id], index[parent_id])
+                else:
+                    # Every parent is done
+                    work.pop()
+                    if work:
+                        child_id = work[-1][0]
+                        lowlink[child_id] = min(lowlink[child_id], lowlink[person_id])
+                    if lowlink[person_id] == index[person_id]:
+                        component = []
+                        while True:
+                            member_id = stack.pop()
+                            on_stack.discard(member_id)
+                            component.append(member_id)
+                            if member_id == person_id:
+                                break
+                        yield component
+
+    @staticmethod
+    def latest_analysis():
+        """The most recently finished pedigree-analysis job, or None"""
+        return (
+            Job.query.filter(Job.kind == 'pedigree-analysis', Job.status == 'finished')
+            .order_by(Job.finished_at.desc()).first()
+        )
+
+    @staticmethod
+    def report(limit=DEFAULT_REPORT_SIZE):
+        """
+        Findings of the latest analysis
+
+        Args:
+            limit: Loops and collapsed pedigrees to list
+
+        Returns:
+            Dict with the analysis summary, whether the tree has changed since
+            (stale), the first loops with their members and the persons with the
+            highest implex; None if no analysis has finished yet
+        """
+        job = PedigreeService.latest_analysis()
+        if job is None:
+            return None
+
+        loop_rows = db.session.execute(
+            select(PedigreeDiagnostic, Person.first_name, Person.last_name)
+            .join(Person, Person.id == PedigreeDiagnostic.person_id)
+            .where(PedigreeDiagnostic.cycle_id.isnot(None), PedigreeDiagnostic.cycle_id <= limit)
+            .order_by(PedigreeDiagnostic.cycle_id, PedigreeDiagnostic.person_id)
+        )
+        cycles = {}
+        for diagnostic, first_name, last_name in loop_rows:
+            cycles.setdefault(diagnostic.cycle_id, []).append(
+                {'id': diagnostic.person_id, 'name': f"{first_name} {last_name}"}
+            )
+
+        collapsed_rows = db.session.execute(
+            select(PedigreeDiagnostic, Person.first_name, Person.last_name)
+            .join(Person, Person.id == PedigreeDiagnostic.person_id)
+            .where(PedigreeDiagnostic.implex > 0)
+            .order_by(PedigreeDiagnostic.implex.desc(), PedigreeDiagnostic.person_id)
+            .limit(limit)
+        )
+        return {
+            'job_id': job.id,
+            'analyzed_at': job.finished_at.isoformat() if job.finished_at else None,
+            'stale': job.result['revision'] != DataRevision.current(),
+            'summary': job.result,
+            'cycles': [
+                {'id': cycle_id, 'size': len(members), 'members': members} for cycle_id, members in cycles.items()
+            ],
+            'most_collapsed': [
+                dict(diagnostic.to_dict(), name=f"{first_name} {last_name}")
+                for diagnostic, first_name, last_name in collapsed_rows
+            ]
+        }
+
+    @staticmethod
+    def person_report(person_id):
+        """
+        Findings of the latest analysis for one person
+
+        Returns:
+            The person's diagnostic (zeros when the analysis found nothing) with
+            the other members of their loop, or None if the person does not exist
+        """
+        if db.session.get(Person, person_id) is None:
+            return None
+        diagnostic = db.session.get(PedigreeDiagnostic, person_id)
+        if diagnostic is None:
+            return PedigreeDiagnostic(person_id=person_id, ancestors=0, ancestor_slots=0, implex=0.0).to_dict()
+
+        data = diagnostic.to_dict()
+        if diagnostic.cycle_id is not None:
+            data['cycle_members'] = list(db.session.execute(
+                select(PedigreeDiagnostic.person_id)
+                .join(Person, Person.id == PedigreeDiagnostic.person_id)
+                .where(PedigreeDiagnostic.cycle_id == diagnostic.cycle_id)
+                .order_by(PedigreeDiagnostic.person_id)
+            ).scalars())
+        return data
+
+    @staticmethod
+    def _pedigree_window(person_id, parents, generations):
+        """
+        (distinct ancestors, ancestor slots) of a person within the given generations
+
+        Walks up one generation at a time, carrying for each ancestor the number
+        of lines leading to them from the person, so an ancestor reached along
+        several lines is expanded once per generation.
+        """
+        seen = set()
+        slots = 0
+        frontier = {person_id: 1}
+        for _ in range(generations):
+            next_frontier = {}
+            for current_id, lines in frontier.items():
+                for parent_id in parents.get(current_id, ()):
+                    next_frontier[parent_id] = next_frontier.get(parent_id, 0) + lines
+            if not next_frontier:
+                break
+            slots += sum(next_frontier.values())
+            seen.update(next_frontier)
+            frontier = next_frontier
+        return len(seen), slots
@@ -2,6 +2,23 @@
 from models import db
 from models.relationship import Relationship
 from models.person import Person
+from models.data_revision import DataRevision
+from services.kinship_graph import edge_record, EdgeRecord
+from services.tree_service import TreeService
+from services.closure_service import ClosureService
+from services.member_service import DEFAULT_IMPORT_BATCH_SIZE
+from utils.validators import validate_relationship_data
+from itertools import islice
+from flask import current_app
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+class DuplicateRelationship(ValueError):
+    """Raised when an update would turn a relationship into a copy of another stored one"""
+    def __init__(self, existing):
+        super().__init__(f"Relationship {existing.id} already links these persons this way")
+        self.existing = existing
+
 
 class RelationshipService:
     @staticmethod
@@ -9,6 +26,45 @@ class RelationshipService:
         """Get all relationships"""
         return Relationship.query.all()
     
+    @staticmethod
+    def list_relationships(**options):
+        """List relationships in ID order; takes the same options as relationship_query"""
+        return RelationshipService.relationship_query(**options).all()
+    
+    @staticmethod
+    def iter_relationships(batch_size=1000, **options):
+        """Yield relationships in ID order, fetching batch_size rows per round trip"""
+        return RelationshipService.relationship_query(**options).yield_per(batch_size)
+    
+    @staticmethod
+    def relationship_query(after_id=None, limit=None, person_id=None, relationship_type=None):
+        """
+        Build the relationship listing query with keyset pagination and filters
+        
+        Args:
+            after_id: Only return relationships with an ID greater than this
+            limit: Maximum number of relationships to return (None for all)
+            person_id: Only relationships involving this person
+            relationship_type: Only relationships of this stored type
+        
+        Returns:
+            Query yielding Relationship objects
+        """
+        query = Relationship.query
+        if person_id is not None:
+            query = query.filter(
+                (Relationship.person1_id == person_id) | (Relationship.person2_id == person_id)
+            )
+        if relationship_type:
+            query = query.filter(Relationship.relationship_type == relationship_type)
+        if after_id is not None:
+            query = query.filter(Relationship.id > after_id)
+        
+        query = query.order_by(Relationship.id)
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+    
     @staticmethod
     def get_relationship_by_id(relationship_id):
         """Get a relationship by ID"""
@@ -23,7 +79,7 @@ class RelationshipService:
     
     @staticmethod
     def create_relationship(data):
-        """Create a new relationship"""
+        """Create a new relationship, stored as a single canonical row"""
         # Verify both persons exist
         person1 = Person.query.get(data['person1_id'])
         person2 = Person.query.get(data['person2_id'])
@@ -31,86 +87,168 @@ class RelationshipService:
         if not person1 or not person2:
             raise ValueError("One or both persons do not exist")
         
-        # Check if relationship already exists between these two persons
+        person1_id, person2_id, relationship_type = Relationship.canonical_edge(
+            data['person1_id'], data['person2_id'], data['relationship_type']
+        )
+        
+        # Check if relationship already exists between these two persons (in either direction)
         existing_relationship = Relationship.query.filter_by(
-            person1_id=data['person1_id'],
-            person2_id=data['person2_id'],
-            relationship_type=data['relationship_type']
+            person1_id=person1_id,
+            person2_id=person2_id,
+            relationship_type=relationship_type
         ).first()
         
         if existing_relationship:
             # Relationship already exists, return it instead of creating a duplicate
             return existing_relationship
         
-        # Create the relationship
+        # Create the relationship; the inverse view is derived on read
         new_relationship = Relationship(
-            person1_id=data['person1_id'],
-            person2_id=data['person2_id'],
-            relationship_type=data['relationship_type'],
+            person1_id=person1_id,
+            person2_id=person2_id,
+            relationship_type=relationship_type,
             description=data.get('description')
         )
         
         db.session.add(new_relationship)
+        if relationship_type == 'parent-child':
+            ClosureService.edge_added(person1_id, person2_id)
+        revision = DataRevision.bump()
+        db.session.commit()
         
-        # For parent-child relationships, create the reciprocal relationship automatically
-        if data['relationship_type'] == 'parent-child':
-            # Check if reciprocal relationship already exists
-            existing_reciprocal = Relationship.query.filter_by(
-                person1_id=data['person2_id'],  # Child
-                person2_id=data['person1_id'],  # Parent
-                relationship_type='child-parent'
-            ).first()
-            
-            if not existing_reciprocal:
-                # Add the reciprocal relationship (from child to parent)
-                reciprocal = Relationship(
-                    person1_id=data['person2_id'],  # Child
-                    person2_id=data['person1_id'],  # Parent
-                    relationship_type='child-parent',
-                    description=data.get('description')
-                )
-                db.session.add(reciprocal)
-        
-        # For spouse relationships, create the reciprocal relationship automatically
-        elif data['relationship_type'] == 'spouse':
-            # Check if reciprocal relationship already exists
-            existing_reciprocal = Relationship.query.filter_by(
-                person1_id=data['person2_id'],
-                person2_id=data['person1_id'],
-                relationship_type='spouse'
-            ).first()
+        # Keep the in-memory graph in step with the new row
+        record = edge_record(new_relationship)
+        TreeService.after_write(revision, [record.person1_id, record.person2_id],
+                                lambda graph: graph.add_edge(record))
+        return new_relationship
+    
+    @staticmethod
+    def bulk_create_relationships(records, batch_size=None):
+        """
+        Create many relationships, committing once per batch
+        
+        Valid person IDs and existing edges are loaded once up front, so duplicate and
+        existence checks happen in memory. Each row is validated with
+        validate_relationship_data and stored in canonical form; rows that duplicate an
+        existing edge (or an earlier row of the import) are skipped like
+        create_relationship would.
+        
+        Args:
+            records: Iterable of relationship dicts (same shape as create_relationship)
+            batch_size: Rows per transaction (IMPORT_BATCH_SIZE config, default 1000)
+        
+        Returns:
+            Dict with the created IDs, the number of duplicates skipped and a list of
+            {'index': row_number, 'errors': [...]} for rejected rows
+        """
+        if batch_size is None:
+            batch_size = current_app.config.get('IMPORT_BATCH_SIZE', DEFAULT_IMPORT_BATCH_SIZE)
+        
+        person_ids = set(db.session.execute(select(Person.id)).scalars())
+        existing = RelationshipService._load_edge_keys()
+        
+        result = {'created': [], 'duplicates': 0, 'errors': []}
+        records = iter(records)
+        offset = 0
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
             
-            if not existing_reciprocal:
-                # Add the reciprocal relationship (spouse works both ways)
-                reciprocal = Relationship(
-                    person1_id=data['person2_id'],
-                    person2_id=data['person1_id'],
-                    relationship_type='spouse',
-                    description=data.get('description')
+            rows = []
+            for index, data in enumerate(batch, start=offset):
+                if not isinstance(data, dict):
+                    result['errors'].append({'index': index, 'errors': ["Row must be a JSON object"]})
+                    continue
+                is_valid, errors = validate_relationship_data(data)
+                if not is_valid:
+                    result['errors'].append({'index': index, 'errors': errors})
+                    continue
+                # JSON may carry any type; only ints can name a person (and be hashed and packed)
+                type_errors = [
+                    f"{name} must be an integer" for name in ('person1_id', 'person2_id')
+                    if isinstance(data[name], bool) or not isinstance(data[name], int)
+                ]
+                if type_errors:
+                    result['errors'].append({'index': index, 'errors': type_errors})
+                    continue
+                if data['person1_id'] not in person_ids or data['person2_id'] not in person_ids:
+                    result['errors'].append({'index': index, 'errors': ["One or both persons do not exist"]})
+                    continue
+                
+                person1_id, person2_id, relationship_type = Relationship.canonical_edge(
+                    data['person1_id'], data['person2_id'], data['relationship_type']
                 )
-                db.session.add(reciprocal)
-        
-        # For sibling relationships, create the reciprocal relationship automatically
-        elif data['relationship_type'] == 'sibling':
-            # Check if reciprocal relationship already exists
-            existing_reciprocal = Relationship.query.filter_by(
-                person1_id=data['person2_id'],
-                person2_id=data['person1_id'],
-                relationship_type='sibling'
-            ).first()
+                keys = existing.setdefault(relationship_type, set())
+                key = RelationshipService._pack_pair(person1_id, person2_id)
+                if key in keys:
+                    result['duplicates'] += 1
+                    continue
+                keys.add(key)
+                rows.append((index, {
+                    'person1_id': person1_id,
+                    'person2_id': person2_id,
+                    'relationship_type': relationship_type,
+                    'description': data.get('description')
+                }))
+            offset += len(batch)
             
-            if not existing_reciprocal:
-                # Add the reciprocal relationship (sibling works both ways)
-                reciprocal = Relationship(
-                    person1_id=data['person2_id'],
-                    person2_id=data['person1_id'],
-                    relationship_type='sibling',
-                    description=data.get('description')
-                )
-                db.session.add(reciprocal)
+            if rows:
+                try:
+                    created = RelationshipService._insert_relationship_rows([row for _, row in rows])
+                    result['created'].extend(created)
+                except SQLAlchemyError:
+                    # Isolate the offending rows by retrying one at a time
+                    db.session.rollback()
+                    for index, row in rows:
+                        try:
+                            result['created'].extend(RelationshipService._insert_relationship_rows([row]))
+                        except SQLAlchemyError as e:
+                            db.session.rollback()
+                            existing[row['relationship_type']].discard(
+                                RelationshipService._pack_pair(row['person1_id'], row['person2_id'])
+                            )
+                            result['errors'].append({'index': index, 'errors': [str(e.orig or e)]})
         
+        return result
+    
+    @staticmethod
+    def _pack_pair(person1_id, person2_id):
+        # One int per edge keeps the in-memory key set compact for millions of edges
+        return (person1_id << 32) | person2_id
+    
+    @staticmethod
+    def _load_edge_keys():
+        """Return {relationship_type: set of packed (person1_id, person2_id)} for stored edges"""
+        keys = {}
+        rows = db.session.execute(
+            select(Relationship.relationship_type, Relationship.person1_id, Relationship.person2_id)
+            .execution_options(yield_per=10000)
+        )
+        for relationship_type, person1_id, person2_id in rows:
+            keys.setdefault(relationship_type, set()).add(RelationshipService._pack_pair(person1_id, person2_id))
+        return keys
+    
+    @staticmethod
+    def _insert_relationship_rows(rows):
+        """Insert canonical rows in one transaction and return their new IDs"""
+        relationship_ids = db.session.execute(
+            insert(Relationship).returning(Relationship.id, sort_by_parameter_order=True),
+            rows
+        ).scalars().all()
+        for row in rows:
+            if row['relationship_type'] == 'parent-child':
+                ClosureService.edge_added(row['person1_id'], row['person2_id'])
+        revision = DataRevision.bump()
         db.session.commit()
-        return new_relationship
+        
+        records = [
+            EdgeRecord(relationship_id, row['person1_id'], row['person2_id'], row['relationship_type'])
+            for relationship_id, row in zip(relationship_ids, rows)
+        ]
+        touched = {row['person1_id'] for row in rows} | {row['person2_id'] for row in rows}
+        TreeService.after_write(revision, touched, lambda graph: graph.add_edges(records))
+        return relationship_ids
     
     @staticmethod
     def update_relationship(relationship_id, data):
@@ -120,32 +258,66 @@ class RelationshipService:
         if not relationship:
             raise ValueError(f"Relationship with ID {relationship_id} not found")
         
+        old_parent_edge = RelationshipService._parent_edge(relationship)
+        
         # Update fields
         if 'relationship_type' in data:
-            relationship.relationship_type = data['relationship_type']
+            # A type change may flip which person is stored first
+            person1_id, person2_id, relationship_type = Relationship.canonical_edge(
+                relationship.person1_id, relationship.person2_id, data['relationship_type']
+            )
+            # The canonical row may already exist (e.g. a sibling row turned into an existing spouse row)
+            existing = Relationship.query.filter(
+                Relationship.person1_id == person1_id,
+                Relationship.person2_id == person2_id,
+                Relationship.relationship_type == relationship_type,
+                Relationship.id != relationship_id
+            ).first()
+            if existing:
+                raise DuplicateRelationship(existing)
+            relationship.person1_id, relationship.person2_id, relationship.relationship_type = (
+                person1_id, person2_id, relationship_type
+            )
         if 'description' in data:
             relationship.description = data['description']
         
+        new_parent_edge = RelationshipService._parent_edge(relationship)
+        if new_parent_edge != old_parent_edge:
+            if old_parent_edge:
+                ClosureService.edge_removed(old_parent_edge[1])
+            if new_parent_edge:
+                ClosureService.edge_added(*new_parent_edge)
+        
+        revision = DataRevision.bump()
         db.session.commit()
+        
+        record = edge_record(relationship)
+        TreeService.after_write(revision, [record.person1_id, record.person2_id],
+                                lambda graph: graph.add_edge(record))
         return relationship
     
     @staticmethod
     def delete_relationship(relationship_id):
-        """Delete a relationship and its reciprocal if it exists"""
+        """Delete a relationship"""
         relationship = Relationship.query.get(relationship_id)
         
         if not relationship:
             raise ValueError(f"Relationship with ID {relationship_id} not found")
         
-        # Find and delete reciprocal relationship if it exists
-        reciprocal = Relationship.query.filter_by(
-            person1_id=relationship.person2_id,
-            person2_id=relationship.person1_id
-        ).first()
-        
-        if reciprocal:
-            db.session.delete(reciprocal)
-        
+        person_ids = [relationship.person1_id, relationship.person2_id]
+        parent_edge = RelationshipService._parent_edge(relationship)
         db.session.delete(relationship)
+        if parent_edge:
+            ClosureService.edge_removed(parent_edge[1])
+        revision = DataRevision.bump()
         db.session.commit()
+        
+        TreeService.after_write(revision, person_ids, lambda graph: graph.remove_edge(relationship_id))
         return True
+    
+    @staticmethod
+    def _parent_edge(relationship):
+        """(parent_id, child_id) of a parent-child relationship, None for other types"""
+        if relationship.relationship_type != 'parent-child':
+            return None
+        return relationship.person1_id, relationship.person2_id
@@ -0,0 +1,110 @@
+#tree_cache.py
+from collections import OrderedDict, namedtuple
+import threading
+import time
+from flask import current_app
+
+# Defaults, overridable with the TREE_CACHE_MAX_BYTES and TREE_CACHE_TTL app config keys
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL = 300
+
+# Rough serialized sizes used to weigh entries without encoding them
+NODE_BYTES = 160
+LINK_BYTES = 60
+
+# person_ids is None for payloads that depend on every person (the full tree)
+CacheEntry = namedtuple('CacheEntry', ['payload', 'person_ids', 'size', 'expires_at'])
+
+
+class TreeCache:
+    """
+    LRU + TTL cache of compiled tree payloads, bounded by estimated size.
+
+    Entries are valid for the data revision the cache is synced to. Writes made
+    in this process call invalidate() with the person IDs they touched, which
+    only drops the entries whose subgraph contains one of them. If the database
+    revision moves in any other way the whole cache is cleared.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.total_size = 0
+        self.revision = None
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        self.lock = threading.Lock()
+
+    def get(self, key, revision):
+        """Return the cached payload for key at revision, or None"""
+        with self.lock:
+            self._sync(revision)
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires_at < time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry.payload
+
+    def put(self, key, revision, payload, person_ids=None):
+        """Store a payload built at revision; person_ids are the persons it contains"""
+        size = len(payload['nodes']) * NODE_BYTES + len(payload['links']) * LINK_BYTES
+        max_bytes = current_app.config.get('TREE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+        ttl = current_app.config.get('TREE_CACHE_TTL', DEFAULT_TTL)
+        with self.lock:
+            if self.revision is not None and revision < self.revision:
+                # Built from an older snapshot than the cache already reflects
+                return
+            self._sync(revision)
+            if size > max_bytes:
+                return
+            if key in self.entries:
+                self._drop(key)
+            entry_ids = frozenset(person_ids) if person_ids is not None else None
+            self.entries[key] = CacheEntry(payload, entry_ids, size, time.monotonic() + ttl)
+            self.total_size += size
+            while self.total_size > max_bytes:
+                oldest_key = next(iter(self.entries))
+                self._drop(oldest_key)
+                self.stats['evictions'] += 1
+
+    def invalidate(self, revision, person_ids):
+        """Advance to a just-committed revision, dropping entries that contain any of person_ids"""
+        person_ids = set(person_ids)
+        with self.lock:
+            if self.revision is None or self.revision != revision - 1:
+                self._clear(revision)
+                return
+            stale = [
+                key for key, entry in self.entries.items()
+                if entry.person_ids is None or not entry.person_ids.isdisjoint(person_ids)
+            ]
+            for key in stale:
+                self._drop(key)
+            self.stats['invalidations'] += len(stale)
+            self.revision = revision
+
+    def snapshot(self):
+        """Counters and occupancy for monitoring"""
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries), bytes=self.total_size, revision=self.revision)
+
+    def _sync(self, revision):
+        if self.revision != revision:
+            self._clear(revision)
+
+    def _clear(self, revision):
+        self.stats['invalidations'] += len(self.entries)
+        self.entries.clear()
+        self.total_size = 0
+        self.revision = revision
+
+    def _drop(self, key):
+        entry = self.entries.pop(key)
+        self.total_size -= entry.size
+
+
+# Process-wide cache shared by all requests
+tree_cache = TreeCache()
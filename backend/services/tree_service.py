@@ -1,118 +1,268 @@
 #tree_service.py
+from sqlalchemy import select, literal, or_
+from models import db
 from models.person import Person
 from models.relationship import Relationship
-import json
+from models.data_revision import DataRevision
+from services.kinship_graph import (KinshipGraph, EdgeRecord, locked_graph, graph_is_loaded, patch_graph,
+                                    person_record, edge_record, NEIGHBOR_KINDS, TRAVERSAL_DIRECTIONS)
+from services.tree_cache import tree_cache
+
+# Number of hops from the root included when no depth is requested
+DEFAULT_TREE_DEPTH = 3
+
+# Subtree traversal engines: the in-memory kinship graph, a recursive query in SQLite,
+# or auto (the graph when it is already loaded and current, SQLite otherwise)
+TRAVERSAL_ENGINES = ('auto', 'graph', 'sql')
+
+# Relationship types with a dedicated neighbor kind; any other type is 'other'
+TYPED_RELATIONSHIPS = ('parent-child', 'child-parent', 'spouse', 'sibling')
+
+# Rows fetched per round trip when streaming the full tree
+STREAM_BATCH_SIZE = 1000
 
 class TreeService:
     @staticmethod
     def get_full_tree():
         """Get the complete family tree with all persons and relationships."""
         print("DEBUG: TreeService.get_full_tree called")
+        
+        cache_key = ('full',)
+        tree_data = tree_cache.get(cache_key, DataRevision.current())
+        if tree_data is not None:
+            return tree_data
 
-        # Fetch all persons and relationships
-        persons = Person.query.all()
-        relationships = Relationship.query.all()
+        # Everything comes from the in-memory graph, no per-request queries
+        with locked_graph() as graph:
+            persons = list(graph.persons.values())
+            relationships = list(graph.edges.values())
+            revision = graph.revision
         
         print(f"DEBUG: Found {len(persons)} persons and {len(relationships)} relationships")
         
         # Initialize tree data structure
         tree_data = TreeService._compile_tree_data(persons, relationships)
+        tree_cache.put(cache_key, revision, tree_data)
         
         print(f"DEBUG: Final tree has {len(tree_data['nodes'])} nodes and {len(tree_data['links'])} links")
-        print(f"DEBUG: Node IDs: {[node['id'] for node in tree_data['nodes']]}")
         
         return tree_data
     
     @staticmethod
-    def get_tree_from_root(person_id):
-        """Get the family tree starting from a root person."""
-        print(f"DEBUG: TreeService.get_tree_from_root called with person_id={person_id}")
+    def after_write(revision, person_ids=(), graph_update=None):
+        """
+        Propagate a committed write to the in-memory graph and the tree cache.
         
-        # Verify person exists
-        root_person = Person.query.get(person_id)
-        if not root_person:
-            print(f"DEBUG: Person with ID {person_id} not found")
-            return {'nodes': [], 'links': []}
+        Args:
+            revision: The DataRevision the write committed
+            person_ids: IDs of the persons whose node or edges changed
+            graph_update: Optional callable applied to the loaded graph
+        """
+        patch_graph(revision, graph_update)
+        tree_cache.invalidate(revision, person_ids)
+    
+    @staticmethod
+    def iter_full_tree_nodes(batch_size=STREAM_BATCH_SIZE):
+        """Yield one node per person, reading the person table in batches."""
+        rows = db.session.query(
+            Person.id, Person.first_name, Person.last_name,
+            Person.gender, Person.birth_date, Person.death_date
+        ).order_by(Person.id).yield_per(batch_size)
+        for row in rows:
+            yield TreeService._create_node(row)
+    
+    @staticmethod
+    def iter_full_tree_links(batch_size=STREAM_BATCH_SIZE):
+        """Yield one link per relationship, reading the relationship table in batches."""
+        rows = db.session.query(
+            Relationship.person1_id, Relationship.person2_id, Relationship.relationship_type
+        ).order_by(Relationship.id).yield_per(batch_size)
+        for row in rows:
+            yield TreeService._create_link(row)
+    
+    @staticmethod
+    def get_tree_from_root(person_id, max_depth=DEFAULT_TREE_DEPTH, max_nodes=None, directions=None,
+                           engine='auto'):
+        """
+        Get the family tree starting from a root person.
         
-        print(f"DEBUG: Root person found: {root_person.first_name} {root_person.last_name}")
+        Args:
+            person_id: ID of the root person
+            max_depth: Maximum number of hops from the root (None for unlimited)
+            max_nodes: Maximum number of persons in the result (None for unlimited)
+            directions: Relationship directions to follow, any of TRAVERSAL_DIRECTIONS
+                        (all of them if None)
+            engine: One of TRAVERSAL_ENGINES; every engine returns the same tree
         
-        # Collect all related persons and relationships recursively
-        collected_persons = []
-        collected_relationships = []
-        visited = set()
+        Returns:
+            Dict with nodes and links
+        """
+        print(f"DEBUG: TreeService.get_tree_from_root called with person_id={person_id}, engine={engine}")
         
-        TreeService._collect_related(root_person, collected_persons, collected_relationships, visited, max_depth=3)
+        revision = DataRevision.current()
+        cache_key = ('root', person_id, max_depth, max_nodes, tuple(sorted(directions)) if directions else None)
+        tree_data = tree_cache.get(cache_key, revision)
+        if tree_data is not None:
+            return tree_data
+        
+        # Collect all related persons and relationships breadth-first
+        subtree = TreeService._collect_subtree(person_id, max_depth, max_nodes, directions, engine, revision)
+        if subtree is None:
+            print(f"DEBUG: Person with ID {person_id} not found")
+            return {'nodes': [], 'links': []}
+        collected_persons, collected_relationships, revision = subtree
         
         print(f"DEBUG: Collected {len(collected_persons)} persons and {len(collected_relationships)} relationships")
         
         # Compile tree data from collected items
         tree_data = TreeService._compile_tree_data(collected_persons, collected_relationships)
+        tree_cache.put(cache_key, revision, tree_data, [person.id for person in collected_persons])
         
         print(f"DEBUG: Final tree has {len(tree_data['nodes'])} nodes and {len(tree_data['links'])} links")
-        print(f"DEBUG: Node IDs: {[node['id'] for node in tree_data['nodes']]}")
         
         return tree_data
     
     @staticmethod
-    def _collect_related(person, persons_list, relationships_list, visited, current_depth=0, max_depth=3):
-        """Recursively collect related persons and relationships."""
-        if current_depth > max_depth or person.id in visited:
-            return
-        
-        # Mark as visited and add to collection
-        visited.add(person.id)
-        persons_list.append(person)
-        
-        # Find all relationships for this person
-        relationships = Relationship.query.filter(
-            (Relationship.person1_id == person.id) | (Relationship.person2_id == person.id)
-        ).all()
-        
-        for rel in relationships:
-            # Add relationship to collection if not already there
-            if rel not in relationships_list:
-                relationships_list.append(rel)
-            
-            # Determine the other person in this relationship
-            other_person_id = rel.person2_id if rel.person1_id == person.id else rel.person1_id
-            other_person = Person.query.get(other_person_id)
-            
-            if other_person and other_person.id not in visited:
-                # Recursively collect related persons
-                TreeService._collect_related(
-                    other_person, 
-                    persons_list, 
-                    relationships_list, 
-                    visited, 
-                    current_depth + 1, 
-                    max_depth
-                )
+    def collect_subtree(person_id, max_depth=DEFAULT_TREE_DEPTH, max_nodes=None, directions=None, engine='auto'):
+        """
+        Snapshot the persons and relationships get_tree_from_root would return
+        
+        Returns:
+            (PersonRecords in traversal order, EdgeRecords), or None if the root does not exist
+        """
+        subtree = TreeService._collect_subtree(person_id, max_depth, max_nodes, directions, engine)
+        return subtree[:2] if subtree is not None else None
+    
+    @staticmethod
+    def _collect_subtree(person_id, max_depth, max_nodes, directions, engine, revision=None):
+        """
+        Run the subtree traversal on the requested engine
+        
+        Returns:
+            (PersonRecords, EdgeRecords, revision the snapshot reflects), or None
+            if the root does not exist
+        """
+        if engine not in TRAVERSAL_ENGINES:
+            raise ValueError(f"engine must be one of: {', '.join(TRAVERSAL_ENGINES)}")
+        if engine == 'auto':
+            engine = 'graph' if graph_is_loaded() else 'sql'
+        
+        if engine == 'sql':
+            if revision is None:
+                revision = DataRevision.current()
+            graph = TreeService._load_reachable_graph(person_id, max_depth, TreeService._traversal_kinds(directions))
+            if person_id not in graph.persons:
+                return None
+            return TreeService._collect_related(graph, person_id, max_depth, max_nodes, directions) + (revision,)
+        
+        with locked_graph() as graph:
+            if person_id not in graph.persons:
+                return None
+            return TreeService._collect_related(graph, person_id, max_depth, max_nodes, directions) + (graph.revision,)
+    
+    @staticmethod
+    def _collect_related(graph, root_id, max_depth=DEFAULT_TREE_DEPTH, max_nodes=None, directions=None):
+        """Collect persons reachable from root_id and the relationships between them."""
+        kinds = TreeService._traversal_kinds(directions)
+        depths, relationship_ids = graph.traverse(root_id, max_depth, max_nodes, kinds)
+        
+        persons = [graph.persons[person_id] for person_id in depths]
+        relationships = [graph.edges[rel_id] for rel_id in relationship_ids]
+        return persons, relationships
+    
+    @staticmethod
+    def _traversal_kinds(directions):
+        if directions is None:
+            return NEIGHBOR_KINDS
+        return tuple(TRAVERSAL_DIRECTIONS[direction] for direction in directions)
+    
+    @staticmethod
+    def _load_reachable_graph(root_id, max_depth, kinds):
+        """
+        Load the part of the family tree a traversal from root_id can reach into a throwaway KinshipGraph
+        
+        A recursive query walks the relationship table inside SQLite and two round
+        trips fetch the persons it reached and every relationship between them.
+        Every shortest path from the root within max_depth stays inside this graph,
+        so the breadth-first traversal over it gives what it gives over a freshly
+        loaded shared graph (same depths, order and max_nodes cut-off).
+        """
+        walk = TreeService._walk_query(root_id, max_depth, kinds)
+        reached = select(walk.c.person_id)
+        
+        graph = KinshipGraph()
+        person_rows = db.session.execute(
+            select(Person.id, Person.first_name, Person.last_name,
+                   Person.gender, Person.birth_date, Person.death_date)
+            .where(Person.id.in_(reached))
+        )
+        graph.add_persons(person_record(row) for row in person_rows)
+        edge_rows = db.session.execute(
+            select(Relationship.id, Relationship.person1_id, Relationship.person2_id, Relationship.relationship_type)
+            .where(Relationship.person1_id.in_(reached), Relationship.person2_id.in_(reached))
+            .order_by(Relationship.id)
+        )
+        graph.add_edges(edge_record(row) for row in edge_rows)
+        return graph
+    
+    @staticmethod
+    def _walk_query(root_id, max_depth, kinds):
+        """
+        WITH RECURSIVE walk over the relationships whose kind (seen from the
+        person being expanded) is in kinds, stepping only onto existing persons
+        
+        With a max_depth every row carries its depth and the walk stops expanding
+        at max_depth; UNION drops a person reached again at the same depth, so
+        loops in the data cannot make it run away. Without one, rows are bare
+        person IDs and UNION expands every person only once.
+        """
+        bounded = max_depth is not None
+        start = [literal(root_id).label('person_id')]
+        if bounded:
+            start.append(literal(0).label('depth'))
+        walk = select(*start).cte('walk', recursive=True)
+        
+        steps = []
+        for side, own_id, other_id in ((0, Relationship.person1_id, Relationship.person2_id),
+                                       (1, Relationship.person2_id, Relationship.person1_id)):
+            kind_filter = TreeService._kind_filter(side, kinds)
+            if kind_filter is None:
+                continue
+            step = select(other_id, walk.c.depth + 1) if bounded else select(other_id)
+            step = (
+                step.select_from(walk)
+                .join(Relationship, own_id == walk.c.person_id)
+                .join(Person, Person.id == other_id)
+                .where(kind_filter)
+            )
+            if bounded:
+                step = step.where(walk.c.depth < max_depth)
+            steps.append(step)
+        return walk.union(*steps) if steps else walk
+    
+    @staticmethod
+    def _kind_filter(side, kinds):
+        """
+        Condition on Relationship.relationship_type selecting the relationships
+        seen as one of kinds from person1 (side 0) or person2 (side 1), the same
+        way KinshipGraph files them; None if no relationship qualifies
+        """
+        types = [
+            relationship_type for relationship_type in TYPED_RELATIONSHIPS
+            if KinshipGraph._edge_kinds(EdgeRecord(None, None, None, relationship_type))[side] in kinds
+        ]
+        conditions = [Relationship.relationship_type.in_(types)] if types else []
+        if 'other' in kinds:
+            conditions.append(Relationship.relationship_type.notin_(TYPED_RELATIONSHIPS))
+        return or_(*conditions) if conditions else None
     
     @staticmethod
     def _compile_tree_data(persons, relationships):
         """Compile tree data structure from persons and relationships."""
-        # Use dictionaries to ensure uniqueness
-        nodes_dict = {}
-        links_dict = {}
-        
-        # Create nodes for each person
-        for person in persons:
-            person_id = person.id
-            if person_id not in nodes_dict:
-                nodes_dict[person_id] = TreeService._create_node(person)
-        
-        # Create links for each relationship
-        for rel in relationships:
-            # Create a unique key for this relationship
-            rel_key = f"{min(rel.person1_id, rel.person2_id)}-{max(rel.person1_id, rel.person2_id)}-{rel.relationship_type}"
-            
-            if rel_key not in links_dict:
-                links_dict[rel_key] = TreeService._create_link(rel)
-        
-        # Return compiled tree data
+        # Persons and relationships are unique and each link is stored as a single row
         return {
-            'nodes': list(nodes_dict.values()),
-            'links': list(links_dict.values())
+            'nodes': [TreeService._create_node(person) for person in persons],
+            'links': [TreeService._create_link(rel) for rel in relationships]
         }
     
     @staticmethod
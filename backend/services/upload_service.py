@@ -0,0 +1,179 @@
+#upload_service.py
+import logging
+import os
+import shutil
+import uuid
+from sqlalchemy import update
+from models import db
+from models.person import Person
+from models.media_upload import MediaUpload
+from services.member_service import MemberService
+from services.blob_store import BlobStore
+from utils.uploads import copy_stream, media_size_limit, file_sha256, UploadTooLarge, UPLOAD_CHUNK_SIZE
+from utils.validators import allowed_file
+
+logger = logging.getLogger(__name__)
+
+
+class UploadOffsetMismatch(ValueError):
+    """Raised when a chunk does not start where the received data ends"""
+    def __init__(self, offset):
+        super().__init__(f"Upload is at offset {offset}")
+        self.offset = offset
+
+
+class UploadService:
+    """
+    Resumable, offset-based media uploads.
+
+    A client creates an upload with the file's name and total size, then PUTs the
+    bytes in any number of chunks, each starting at the offset received so far.
+    After an interruption it asks for the current offset and continues from there.
+    Chunks are appended to a partial file under UPLOAD_FOLDER/.partial in
+    UPLOAD_CHUNK_SIZE pieces; once the last byte arrives the file is hashed and
+    handed to MemberService.store_media_file. The offset is the upload row's
+    received column, which a chunk only moves on with a conditional UPDATE, so
+    concurrent requests for the same upload are serialized by the database
+    across every worker process.
+    """
+
+    @staticmethod
+    def create_upload(member_id, data, allowed_extensions):
+        """
+        Start a resumable upload
+
+        Args:
+            member_id: Member the media belongs to
+            data: Dict with filename, total_size and optional media_type, title, description
+            allowed_extensions: Set of allowed file extensions
+
+        Returns:
+            The new MediaUpload
+
+        Raises:
+            ValueError: If the member does not exist or data is invalid
+            UploadTooLarge: If total_size is over the limit for the file type
+        """
+        if not db.session.get(Person, member_id):
+            raise ValueError(f"Member with ID {member_id} not found")
+
+        filename = data.get('filename') or ''
+        total_size = data.get('total_size')
+        if not filename or not allowed_file(filename, allowed_extensions):
+            raise ValueError(f"File type not allowed. Allowed types: {', '.join(sorted(allowed_extensions))}")
+        if not isinstance(total_size, int) or isinstance(total_size, bool) or total_size < 1:
+            raise ValueError("total_size must be a positive integer")
+
+        max_size = media_size_limit(filename, data.get('media_type', ''))
+        if total_size > max_size:
+            raise UploadTooLarge(max_size)
+
+        upload = MediaUpload(
+            id=uuid.uuid4().hex,
+            person_id=member_id,
+            filename=filename,
+            total_size=total_size,
+            media_type=data.get('media_type'),
+            title=data.get('title', ''),
+            description=data.get('description', '')
+        )
+        os.makedirs(BlobStore.partial_folder(), exist_ok=True)
+        open(UploadService.partial_path(upload.id), 'wb').close()
+        db.session.add(upload)
+        db.session.commit()
+        return upload
+
+    @staticmethod
+    def get_upload(member_id, upload_id):
+        """Return the member's upload with that ID, or None"""
+        upload = db.session.get(MediaUpload, upload_id)
+        if upload is None or upload.person_id != member_id:
+            return None
+        return upload
+
+    @staticmethod
+    def current_offset(upload):
+        """Number of bytes received so far"""
+        return upload.received
+
+    @staticmethod
+    def append_chunk(upload, offset, stream):
+        """
+        Append one chunk of data
+
+        Args:
+            upload: The MediaUpload
+            offset: Position of the chunk's first byte; must equal the current offset
+            stream: Readable binary stream with the chunk (request.stream)
+
+        Returns:
+            (new offset, Media or None): the Media record once the upload is complete
+
+        Raises:
+            UploadOffsetMismatch: If offset is not where the received data ends
+            UploadTooLarge: If the chunk goes past the declared total size
+            OSError: If the chunk could not be written; the offset is unchanged
+        """
+        if offset != upload.received:
+            raise UploadOffsetMismatch(upload.received)
+
+        # Receive the chunk into its own file first, so the upload row is only
+        # locked while the chunk is copied locally, not while a slow client sends it
+        path = UploadService.partial_path(upload.id)
+        handle, spool_path = BlobStore.temp_file()
+        try:
+            with os.fdopen(handle, 'wb') as spool:
+                try:
+                    size = copy_stream(stream, spool, upload.total_size - offset)
+                except UploadTooLarge:
+                    raise UploadTooLarge(upload.total_size, f"Chunk goes past the declared total_size ({upload.total_size} bytes)")
+            new_offset = offset + size
+
+            # Claim the chunk: only one request can move the offset on from where it is,
+            # and the row stays locked until the commit below
+            claimed = db.session.execute(
+                update(MediaUpload)
+                .where(MediaUpload.id == upload.id, MediaUpload.received == offset)
+                .values(received=new_offset)
+            ).rowcount
+            if not claimed:
+                db.session.rollback()
+                db.session.refresh(upload)
+                raise UploadOffsetMismatch(upload.received)
+            try:
+                with open(path, 'r+b') as destination, open(spool_path, 'rb') as spool:
+                    # Bytes past the offset are left over from a request that failed mid-copy
+                    destination.seek(offset)
+                    destination.truncate()
+                    shutil.copyfileobj(spool, destination, UPLOAD_CHUNK_SIZE)
+            except Exception:
+                db.session.rollback()
+                raise
+            db.session.commit()
+        finally:
+            os.remove(spool_path)
+
+        if new_offset < upload.total_size:
+            return new_offset, None
+
+        logger.debug(f"Upload {upload.id} complete, storing {upload.filename}")
+        media = MemberService.store_media_file(
+            upload.person_id, path, upload.filename, new_offset, file_sha256(path),
+            upload.title, upload.description
+        )
+        db.session.delete(upload)
+        db.session.commit()
+        return new_offset, media
+
+    @staticmethod
+    def abort_upload(upload):
+        """Discard an upload and the data received so far"""
+        path = UploadService.partial_path(upload.id)
+        if os.path.exists(path):
+            os.remove(path)
+        db.session.delete(upload)
+        db.session.commit()
+
+    @staticmethod
+    def partial_path(upload_id):
+        return os.path.join(BlobStore.partial_folder(), upload_id)
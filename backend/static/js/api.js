@@ -1,3 +1,42 @@
+// Compact tree representation offered by /api/tree (see backend/utils/tree_format.py)
+const COLUMNAR_TREE_MIMETYPE = 'application/vnd.genetree.columnar+json';
+
+/**
+ * Decode a columnar tree payload back into {nodes, links} objects
+ */
+function decodeColumnarTree(payload) {
+    const strings = payload.strings;
+    const lookup = index => (index === null ? null : strings[index]);
+    const columns = payload.nodes;
+    
+    const nodes = new Array(columns.id.length);
+    for (let i = 0; i < columns.id.length; i++) {
+        nodes[i] = {
+            id: columns.id[i],
+            name: lookup(columns.name[i]),
+            gender: lookup(columns.gender[i]),
+            birth_date: lookup(columns.birth_date[i]),
+            death_date: lookup(columns.death_date[i]),
+            has_profile: columns.has_profile[i] === 1
+        };
+    }
+    
+    const linkColumns = payload.links;
+    const links = new Array(linkColumns.source.length);
+    for (let i = 0; i < linkColumns.source.length; i++) {
+        links[i] = {
+            source: linkColumns.source[i],
+            target: linkColumns.target[i],
+            type: payload.link_types[linkColumns.type[i]]
+        };
+    }
+    
+    return { nodes, links };
+}
+
+// Files larger than this are sent with the resumable upload API, in chunks of this size
+const RESUMABLE_UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024;
+
 /**
  * API service for communicating with the backend
  */
@@ -29,6 +68,16 @@ class ApiService {
         }
     }
     
+    // Fetch a tree, preferring the compact columnar format when the server offers it
+    async fetchTree(endpoint) {
+        const payload = await this.fetchApi(endpoint, {
+            headers: {
+                'Accept': `${COLUMNAR_TREE_MIMETYPE}, application/json;q=0.9`
+            }
+        });
+        return payload && payload.format === 'columnar' ? decodeColumnarTree(payload) : payload;
+    }
+    
     // GET methods
     async getAllMembers() {
         return this.fetchApi('/members');
@@ -51,12 +100,58 @@ class ApiService {
     }
     
     async getFamilyTree() {
-        return this.fetchApi('/tree');
+        return this.fetchTree('/tree');
+    }
+    
+    // options may contain depth, max_nodes, directions (array or comma-separated string) and engine
+    async getFamilyTreeFromRoot(personId, options = {}) {
+        const params = new URLSearchParams({ root_id: personId });
+        if (options.depth !== undefined) params.set('depth', options.depth);
+        if (options.max_nodes !== undefined) params.set('max_nodes', options.max_nodes);
+        if (options.directions) {
+            params.set('directions', Array.isArray(options.directions) ? options.directions.join(',') : options.directions);
+        }
+        if (options.engine) params.set('engine', options.engine);
+        console.log(`DEBUG: API calling /tree?${params}`);
+        return this.fetchTree(`/tree?${params}`);
+    }
+    
+    // Ancestors or descendants of a member, nearest generation first (depth limits the generations)
+    async getAncestors(memberId, depth = null) {
+        const query = depth ? `?depth=${depth}` : '';
+        return this.fetchApi(`/members/${memberId}/ancestors${query}`);
+    }
+    
+    async getDescendants(memberId, depth = null) {
+        const query = depth ? `?depth=${depth}` : '';
+        return this.fetchApi(`/members/${memberId}/descendants${query}`);
+    }
+    
+    // {memberId: number of descendants} for several members at once
+    async getDescendantCounts(memberIds) {
+        const params = new URLSearchParams({ member_ids: memberIds.join(',') });
+        return this.fetchApi(`/members/descendant-counts?${params}`);
     }
     
-    async getFamilyTreeFromRoot(personId) {
-        console.log(`DEBUG: API calling /tree?root_id=${personId}`);
-        return this.fetchApi(`/tree?root_id=${personId}`);
+    // How person b is related to person a (relationship name, consanguinity and path)
+    async getKinship(personAId, personBId) {
+        const params = new URLSearchParams({ a: personAId, b: personBId });
+        return this.fetchApi(`/kinship?${params}`);
+    }
+    
+    // Every common ancestor of two persons, and the nearest ones with their generations
+    async getCommonAncestors(personAId, personBId) {
+        const params = new URLSearchParams({ a: personAId, b: personBId });
+        return this.fetchApi(`/kinship/common-ancestors?${params}`);
+    }
+    
+    // Loops and pedigree collapse found by the latest pedigree analysis job
+    async getPedigreeDiagnostics(limit = 20) {
+        return this.fetchApi(`/diagnostics/pedigree?limit=${limit}`);
+    }
+    
+    async getMemberPedigreeDiagnostics(memberId) {
+        return this.fetchApi(`/diagnostics/pedigree/${memberId}`);
     }
     
     // POST methods
@@ -70,6 +165,17 @@ class ApiService {
         });
     }
     
+    // Queue a pedigree analysis job; its findings show up in getPedigreeDiagnostics once it finishes
+    async startPedigreeAnalysis(generations = null) {
+        return this.fetchApi('/jobs', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ kind: 'pedigree-analysis', params: generations ? { generations } : {} })
+        });
+    }
+    
     async createRelationship(relationshipData) {
         return this.fetchApi('/relationships', {
             method: 'POST',
@@ -88,6 +194,63 @@ class ApiService {
         });
     }
     
+    /**
+     * Upload a file in chunks through /members/<id>/media/uploads.
+     * After a failed chunk the server's offset is fetched and the upload continues from there.
+     * fields may contain title, description and media_type; onProgress receives (sentBytes, totalBytes).
+     */
+    async uploadMediaResumable(personId, file, fields = {}, onProgress = null, maxRetries = 3) {
+        const upload = await this.fetchApi(`/members/${personId}/media/uploads`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ ...fields, filename: file.name, total_size: file.size })
+        });
+        const uploadUrl = `${this.baseUrl}/members/${personId}/media/uploads/${upload.id}`;
+        
+        let offset = 0;
+        let retries = 0;
+        while (true) {
+            const chunk = file.slice(offset, offset + RESUMABLE_UPLOAD_CHUNK_SIZE);
+            let response;
+            try {
+                response = await fetch(uploadUrl, {
+                    method: 'PUT',
+                    headers: {
+                        'Content-Type': 'application/octet-stream',
+                        'Upload-Offset': String(offset)
+                    },
+                    body: chunk
+                });
+            } catch (networkError) {
+                response = null;
+            }
+            
+            if (response && (response.ok || response.status === 409)) {
+                const data = await response.json();
+                if (response.status === 201) {
+                    if (onProgress) onProgress(file.size, file.size);
+                    return data;
+                }
+                offset = parseInt(response.headers.get('Upload-Offset'), 10);
+                retries = 0;
+            } else {
+                if (response && response.status < 500) {
+                    const errorData = await response.json();
+                    throw new Error(errorData.error || `Upload failed with status: ${response.status}`);
+                }
+                if (++retries > maxRetries) {
+                    throw new Error('Upload interrupted, please try again');
+                }
+                // Resume from whatever the server actually received
+                const status = await this.fetchApi(`/members/${personId}/media/uploads/${upload.id}`);
+                offset = status.offset;
+            }
+            if (onProgress) onProgress(offset, file.size);
+        }
+    }
+    
     // PUT methods
     async updateMember(id, memberData) {
         return this.fetchApi(`/members/${id}`, {
@@ -241,13 +241,19 @@ class ProfilesManager {
         if (type === 'photo') {
             const img = document.createElement('img');
             
-            // Fix file path - use direct path to uploads folder
-            const photoUrl = `/uploads/${media.file_path}`;
+            // Gallery tiles show the small preview; the original is only the fallback
+            const photoUrl = this.mediaPreviewUrl(media, 'small');
+            const originalUrl = `/uploads/${media.file_path}`;
             console.log("DEBUG: Loading photo from:", photoUrl);
             
             img.src = photoUrl;
             img.alt = media.title || 'Photo';
+            img.loading = 'lazy';
             img.addEventListener('error', () => {
+                if (!img.src.endsWith(originalUrl)) {
+                    img.src = originalUrl;
+                    return;
+                }
                 console.error(`ERROR: Failed to load image: ${media.file_path}`);
                 // Use a data URI for placeholder to avoid additional HTTP requests
                 img.src = 'data:image/svg+xml;charset=UTF-8,%3Csvg%20width%3D%22150%22%20height%3D%22150%22%20xmlns%3D%22http%3A%2F%2Fwww.w3.org%2F2000%2Fsvg%22%20viewBox%3D%220%200%20150%20150%22%20preserveAspectRatio%3D%22none%22%3E%3Cdefs%3E%3Cstyle%20type%3D%22text%2Fcss%22%3E%23holder_178%20text%20%7B%20fill%3A%23999%3Bfont-weight%3Anormal%3Bfont-family%3AArial%2C%20Helvetica%2C%20Open%20Sans%2C%20sans-serif%2C%20monospace%3Bfont-size%3A10pt%20%7D%20%3C%2Fstyle%3E%3C%2Fdefs%3E%3Cg%20id%3D%22holder_178%22%3E%3Crect%20width%3D%22150%22%20height%3D%22150%22%20fill%3D%22%23EEEEEE%22%3E%3C%2Frect%3E%3Cg%3E%3Ctext%20x%3D%2255.609375%22%20y%3D%2280%22%3EImage%3C%2Ftext%3E%3C%2Fg%3E%3C%2Fg%3E%3C%2Fsvg%3E';
@@ -262,6 +268,13 @@ class ProfilesManager {
             console.log("DEBUG: Loading video from:", videoUrl);
             
             video.src = videoUrl;
+            
+            // With a poster frame the video itself is only fetched when played
+            const posterUrl = this.mediaPreviewUrl(media, 'small', 'jpeg', null);
+            if (posterUrl) {
+                video.poster = posterUrl;
+                video.preload = 'none';
+            }
             video.addEventListener('click', () => {
                 video.play();
             });
@@ -278,6 +291,15 @@ class ProfilesManager {
         return mediaElement;
     }
     
+    /**
+     * URL of a media item's preview image (see Media.to_dict derivatives)
+     * Falls back to the original file when no preview exists for it.
+     */
+    mediaPreviewUrl(media, size, format = 'webp', fallback = `/uploads/${media.file_path}`) {
+        const derivative = media.derivatives && media.derivatives[size];
+        return (derivative && derivative[format]) || fallback;
+    }
+    
     /**
      * Set a photo as the profile photo
      */
@@ -361,11 +383,8 @@ class ProfilesManager {
         profileImage.addEventListener('error', handleImageError);
         profileImage.addEventListener('load', handleImageLoad);
         
-        // Set the profile image src with cache busting
-        // Use consistent path format
-        const photoUrl = `/uploads/${photo.file_path}`;
-        const cacheBuster = new Date().getTime();
-        const finalUrl = `${photoUrl}?t=${cacheBuster}`;
+        // Media URLs are content-addressed (a new file gets a new URL), so no cache busting
+        const finalUrl = this.mediaPreviewUrl(photo, 'small');
         
         try {
             console.log("DEBUG: Loading profile photo from:", finalUrl);
@@ -870,38 +889,52 @@ class ProfilesManager {
                 submitButton.textContent = 'Uploading...';
             }
             
-            // Upload media
-            const response = await fetch(`/api/members/${personId}/media`, {
-                method: 'POST',
-                body: formData
-            });
-            
-            // Check if response is OK
-            if (!response.ok) {
-                let errorMessage = `Upload failed with status: ${response.status}`;
-                
-                // Try to get error details
-                try {
-                    const errorData = await response.json();
-                    if (errorData && errorData.error) {
-                        errorMessage = errorData.error;
+            let data;
+            if (file.size > RESUMABLE_UPLOAD_CHUNK_SIZE) {
+                // Large files go up in chunks so a dropped connection only costs one chunk
+                data = await api.uploadMediaResumable(personId, file, {
+                    title: document.getElementById('media-title').value,
+                    description: document.getElementById('media-description').value,
+                    media_type: mediaType
+                }, (sent, total) => {
+                    if (submitButton) {
+                        submitButton.textContent = `Uploading... ${Math.round(sent * 100 / total)}%`;
                     }
-                } catch (parseError) {
-                    // If we can't parse JSON, try to get text
+                });
+            } else {
+                // Upload media
+                const response = await fetch(`/api/members/${personId}/media`, {
+                    method: 'POST',
+                    body: formData
+                });
+                
+                // Check if response is OK
+                if (!response.ok) {
+                    let errorMessage = `Upload failed with status: ${response.status}`;
+                    
+                    // Try to get error details
                     try {
-                        const errorText = await response.text();
-                        if (errorText && errorText.length < 100) {
-                            errorMessage = errorText;
+                        const errorData = await response.json();
+                        if (errorData && errorData.error) {
+                            errorMessage = errorData.error;
+                        }
+                    } catch (parseError) {
+                        // If we can't parse JSON, try to get text
+                        try {
+                            const errorText = await response.text();
+                            if (errorText && errorText.length < 100) {
+                                errorMessage = errorText;
+                            }
+                        } catch (textError) {
+                            // Ignore text parsing error
                         }
-                    } catch (textError) {
-                        // Ignore text parsing error
                     }
+                    
+                    throw new Error(errorMessage);
                 }
                 
-                throw new Error(errorMessage);
+                data = await response.json();
             }
-            
-            const data = await response.json();
             console.log('Media uploaded successfully:', data);
             
             // Hide modal
@@ -917,8 +950,11 @@ class ProfilesManager {
             // Show success message
             alert('Media uploaded successfully!');
             
-            // Refresh profile
-            this.loadProfile(personId);
+            // Refresh the gallery and profile photo only; the rest of the profile has not changed
+            this.fetchMedia(personId).then(media => {
+                this.displayProfilePhoto(personId, media);
+                this.displayMedia(media);
+            });
         } catch (error) {
             console.error('Error uploading media:', error);
             
@@ -1196,9 +1232,7 @@ class ProfilesManager {
                     
                     if (photoToUse && photoToUse.file_path) {
                         // Use consistent path format
-                        const photoUrl = `/uploads/${photoToUse.file_path}`;
-                        const cacheBuster = new Date().getTime();
-                        profileImage.src = `${photoUrl}?t=${cacheBuster}`;
+                        profileImage.src = this.mediaPreviewUrl(photoToUse, 'small');
                         // Reconnect event listeners for the new attempt
                         profileImage.addEventListener('load', handleSuccess);
                         profileImage.addEventListener('error', handleError);
@@ -1223,14 +1257,12 @@ class ProfilesManager {
             profileImage.addEventListener('load', handleSuccess);
             profileImage.addEventListener('error', handleError);
             
-            // Set the image src with cache busting
-            // Use consistent path format
-            const photoUrl = `/uploads/${photoToUse.file_path}`;
-            const cacheBuster = new Date().getTime();
+            // Media URLs are content-addressed and cached by the browser, so no cache busting
+            const photoUrl = this.mediaPreviewUrl(photoToUse, 'small');
             
             try {
-                console.log("DEBUG: Loading profile photo from:", `${photoUrl}?t=${cacheBuster}`);
-                profileImage.src = `${photoUrl}?t=${cacheBuster}`;
+                console.log("DEBUG: Loading profile photo from:", photoUrl);
+                profileImage.src = photoUrl;
             } catch (error) {
                 console.error("ERROR: Exception when setting image src:", error);
                 handleError();
@@ -0,0 +1,48 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models import db
+from services.kinship_graph import invalidate_graph
+from services.tree_cache import tree_cache
+import migrations  # noqa: F401  (registers every model)
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App with every blueprint on a fresh in-memory database, inside an app context"""
+    from routes import (members_bp, relationships_bp, family_tree_bp, tree_bp, imports_bp, exports_bp, jobs_bp,
+                        media_bp, kinship_bp, diagnostics_bp)
+
+    app = Flask(__name__)
+    app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI='sqlite://',
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        UPLOAD_FOLDER=str(tmp_path / 'uploads'),
+        EXPORT_FOLDER=str(tmp_path / 'exports'),
+        ALLOWED_EXTENSIONS={'png', 'jpg', 'jpeg', 'gif', 'mp4', 'mov'},
+    )
+    db.init_app(app)
+    for blueprint in (members_bp, relationships_bp, family_tree_bp, tree_bp, imports_bp, exports_bp, jobs_bp,
+                      media_bp, kinship_bp, diagnostics_bp):
+        app.register_blueprint(blueprint)
+
+    # The kinship graph and tree cache are process-wide and keyed by revision, which restarts at 0
+    invalidate_graph()
+    tree_cache._clear(None)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+    invalidate_graph()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,128 @@
+# tests/test_blob_store.py
+import hashlib
+import io
+import os
+
+from cli import migrate_uploads_command
+from models import db
+from models.person import Person
+from models.media import Media
+from services.blob_store import BlobStore
+from services.member_service import MemberService
+
+CLIP = b'clip ' * 500
+
+OTHER_CLIP = b'other clip ' * 300
+
+
+def add_members(count):
+    for number in range(1, count + 1):
+        db.session.add(Person(first_name=f'P{number}', last_name='Test'))
+    db.session.commit()
+
+
+def upload(client, member_id, content, filename='clip.mp4'):
+    response = client.post(f'/api/members/{member_id}/media', data={'file': (io.BytesIO(content), filename)},
+                           content_type='multipart/form-data')
+    assert response.status_code == 201
+    return response.json
+
+
+def blob_exists(media):
+    return os.path.exists(BlobStore.absolute_path(media['file_path']))
+
+
+def test_identical_uploads_share_one_blob(app, client):
+    add_members(2)
+    first = upload(client, 1, CLIP)
+    second = upload(client, 2, CLIP, filename='copy.mp4')
+    assert first['file_path'] == second['file_path']
+    assert first['file_path'] == BlobStore.blob_path(hashlib.sha256(CLIP).hexdigest(), 'clip.mp4')
+    assert BlobStore.reference_count(first['file_path']) == 2
+    with open(BlobStore.absolute_path(first['file_path']), 'rb') as stored:
+        assert stored.read() == CLIP
+    assert os.listdir(BlobStore.partial_folder()) == []
+
+
+def test_blob_is_unlinked_with_its_last_media(app, client):
+    add_members(2)
+    first = upload(client, 1, CLIP)
+    second = upload(client, 2, CLIP)
+
+    MemberService.delete_media(first['id'], 1)
+    assert blob_exists(second)
+    assert BlobStore.release(second['file_path']) is False
+
+    MemberService.delete_media(second['id'], 2)
+    assert not blob_exists(second)
+    # The empty shard directories go with it
+    assert not os.path.exists(BlobStore.absolute_path('blobs'))
+
+
+def test_deleting_a_member_keeps_blobs_other_members_share(app, client):
+    add_members(2)
+    shared = upload(client, 1, CLIP)
+    upload(client, 2, CLIP)
+    own = upload(client, 1, OTHER_CLIP)
+
+    MemberService.delete_member(1)
+    assert blob_exists(shared)
+    assert not blob_exists(own)
+
+    MemberService.delete_member(2)
+    assert not blob_exists(shared)
+
+
+def test_same_named_different_files_are_kept_apart(app, client):
+    add_members(1)
+    first = upload(client, 1, CLIP)
+    second = upload(client, 1, OTHER_CLIP)
+    assert first['file_path'] != second['file_path']
+    assert first['filename'] == second['filename'] == 'clip.mp4'
+    for media, content in ((first, CLIP), (second, OTHER_CLIP)):
+        with open(BlobStore.absolute_path(media['file_path']), 'rb') as stored:
+            assert stored.read() == content
+
+
+def add_legacy_media(member_id, filename, content):
+    relative_path = f'{member_id}/{filename}'
+    path = BlobStore.absolute_path(relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if content is not None:
+        with open(path, 'wb') as legacy:
+            legacy.write(content)
+    media = Media(person_id=member_id, media_type='video', file_path=relative_path, title='Legacy')
+    db.session.add(media)
+    db.session.commit()
+    return media.id
+
+
+def test_migrate_uploads_moves_legacy_files_into_the_store(app):
+    add_members(2)
+    first = add_legacy_media(1, 'clip.mp4', CLIP)
+    duplicate = add_legacy_media(2, 'copy.mp4', CLIP)
+    other = add_legacy_media(2, 'other.mp4', OTHER_CLIP)
+    missing = add_legacy_media(1, 'gone.mp4', None)
+
+    result = app.test_cli_runner().invoke(migrate_uploads_command, ['--batch-size', '2'])
+    assert result.exit_code == 0, result.output
+    assert 'Migrated 3 media files, 1 were duplicates' in result.output
+    assert f'Media {missing}: file not found' in result.output
+
+    db.session.expire_all()
+    migrated = {media.id: media for media in Media.query}
+    assert migrated[first].file_path == migrated[duplicate].file_path
+    assert migrated[first].file_path != migrated[other].file_path
+    assert migrated[other].content_hash == hashlib.sha256(OTHER_CLIP).hexdigest()
+    assert migrated[other].file_size == len(OTHER_CLIP)
+    assert migrated[duplicate].filename == 'copy.mp4'
+    assert migrated[missing].file_path == '1/gone.mp4'
+    for media_id in (first, duplicate, other):
+        assert os.path.exists(BlobStore.absolute_path(migrated[media_id].file_path))
+    # The legacy files are gone; the missing row's directory is left as it was
+    assert not os.path.exists(BlobStore.absolute_path('1/clip.mp4'))
+    assert not os.path.exists(BlobStore.absolute_path('2'))
+
+    # A second run has nothing left to do
+    result = app.test_cli_runner().invoke(migrate_uploads_command)
+    assert 'Migrated 0 media files' in result.output
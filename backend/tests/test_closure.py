@@ -0,0 +1,66 @@
+# tests/test_closure.py
+import pytest
+from sqlalchemy import select
+
+from models import db
+from models.ancestor_closure import AncestorClosure
+from services.closure_service import ClosureService
+
+
+@pytest.fixture
+def closure_app(app):
+    app.config['ANCESTOR_CLOSURE'] = True
+    return app
+
+
+def add_member(client, first_name):
+    return client.post('/api/members', json={'first_name': first_name, 'last_name': 'Test', 'gender': 'male'}).json['id']
+
+
+def add_relationship(client, person1_id, person2_id, relationship_type):
+    response = client.post('/api/relationships', json={
+        'person1_id': person1_id, 'person2_id': person2_id, 'relationship_type': relationship_type
+    })
+    assert response.status_code == 201
+    return response.json['id']
+
+
+def closure_rows():
+    return set(db.session.execute(
+        select(AncestorClosure.ancestor_id, AncestorClosure.descendant_id, AncestorClosure.distance)
+    ).all())
+
+
+def assert_matches_rebuild():
+    maintained = closure_rows()
+    ClosureService.rebuild()
+    assert maintained == closure_rows()
+
+
+def test_orphan_relationship_turned_parent_child_adds_no_pairs(closure_app, client):
+    grandparent, parent, child = (add_member(client, name) for name in ('Grandparent', 'Parent', 'Child'))
+    orphan = add_relationship(client, grandparent, parent, 'other')
+    add_relationship(client, parent, child, 'parent-child')
+    assert client.delete(f'/api/members/{grandparent}').status_code == 204
+
+    response = client.put(f'/api/relationships/{orphan}', json={'relationship_type': 'parent-child'})
+    assert response.status_code == 200
+    assert client.get(f'/api/members/{grandparent}/ancestors').status_code == 404
+    assert [row['id'] for row in client.get(f'/api/members/{child}/ancestors').json] == [parent]
+    assert all(grandparent not in row[:2] for row in closure_rows())
+    assert_matches_rebuild()
+
+
+def test_orphan_relationship_turned_child_parent_adds_no_pairs(closure_app, client):
+    parent, child, grandchild = (add_member(client, name) for name in ('Parent', 'Child', 'Grandchild'))
+    orphan = add_relationship(client, child, grandchild, 'sibling')
+    add_relationship(client, parent, child, 'parent-child')
+    assert client.delete(f'/api/members/{grandchild}').status_code == 204
+
+    response = client.put(f'/api/relationships/{orphan}', json={'relationship_type': 'parent-child'})
+    assert response.status_code == 200
+    assert [row['id'] for row in client.get(f'/api/members/{parent}/descendants').json] == [child]
+    assert client.get(f'/api/members/descendant-counts?member_ids={parent},{child}').json == {
+        str(parent): 1, str(child): 0
+    }
+    assert_matches_rebuild()
@@ -0,0 +1,73 @@
+# tests/test_gedcom_export.py
+import pytest
+
+from models import db
+from models.person import Person
+from models.relationship import Relationship
+from services.export_service import ExportService
+
+
+@pytest.fixture
+def family(app):
+    """
+    Mother 1 and father 2 have children 3 and 4; 4 and 5 (genders unknown) are
+    married; single mother 6 has child 7.
+    """
+    for first_name, gender in (('Mother', 'female'), ('Father', 'male'), ('Son', 'male'), ('Kid', None),
+                               ('Partner', None), ('Single', 'female'), ('Baby', 'female')):
+        db.session.add(Person(first_name=first_name, last_name='Test', gender=gender))
+    db.session.add_all(
+        Relationship(person1_id=person1_id, person2_id=person2_id, relationship_type=relationship_type)
+        for person1_id, person2_id, relationship_type in (
+            (1, 3, 'parent-child'), (2, 3, 'parent-child'), (1, 4, 'parent-child'), (2, 4, 'parent-child'),
+            (1, 2, 'spouse'), (4, 5, 'spouse'), (6, 7, 'parent-child')
+        )
+    )
+    db.session.commit()
+
+
+def records(lines):
+    """{xref: [lines below it]} of a GEDCOM file"""
+    result = {}
+    current = None
+    for line in ''.join(lines).splitlines():
+        if line.startswith('0 @'):
+            current = result.setdefault(line.split()[1], [])
+        elif line.startswith('0 '):
+            current = None
+        elif current is not None:
+            current.append(line)
+    return result
+
+
+def test_husband_and_wife_follow_gender(family):
+    gedcom = records(ExportService.iter_gedcom())
+    assert gedcom['@F1_2@'] == ['1 WIFE @I1@', '1 HUSB @I2@', '1 CHIL @I3@', '1 CHIL @I4@']
+    # Genders unknown: ID order
+    assert gedcom['@F4_5@'] == ['1 HUSB @I4@', '1 WIFE @I5@']
+    assert gedcom['@F6@'] == ['1 WIFE @I6@', '1 CHIL @I7@']
+
+
+def test_individuals_point_to_their_families(family):
+    gedcom = records(ExportService.iter_gedcom(batch_size=2))
+    links = {xref: [line for line in lines if line[2:6] in ('FAMC', 'FAMS')] for xref, lines in gedcom.items()}
+    assert links['@I1@'] == ['1 FAMS @F1_2@']
+    assert links['@I2@'] == ['1 FAMS @F1_2@']
+    assert links['@I3@'] == ['1 FAMC @F1_2@']
+    assert links['@I4@'] == ['1 FAMC @F1_2@', '1 FAMS @F4_5@']
+    assert links['@I5@'] == ['1 FAMS @F4_5@']
+    assert links['@I6@'] == ['1 FAMS @F6@']
+    assert links['@I7@'] == ['1 FAMC @F6@']
+    # Every pointer names a record of the file
+    for lines in links.values():
+        assert all(line.split()[2] in gedcom for line in lines)
+
+
+def test_subtree_export_links_only_its_own_families(family):
+    subtree = ExportService.collect_subtree(3, max_depth=1, directions=['ancestors'])
+    gedcom = records(ExportService.iter_gedcom(subtree))
+    assert sorted(xref for xref in gedcom if xref.startswith('@I')) == ['@I1@', '@I2@', '@I3@']
+    assert sorted(xref for xref in gedcom if xref.startswith('@F')) == ['@F1_2@']
+    assert gedcom['@F1_2@'] == ['1 WIFE @I1@', '1 HUSB @I2@', '1 CHIL @I3@']
+    assert [line for line in gedcom['@I1@'] if 'FAM' in line] == ['1 FAMS @F1_2@']
+    assert [line for line in gedcom['@I3@'] if 'FAM' in line] == ['1 FAMC @F1_2@']
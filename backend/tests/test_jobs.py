@@ -0,0 +1,133 @@
+# tests/test_jobs.py
+import os
+import socket
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db
+from models.job import Job
+from models.person import Person
+from services.job_service import JobService, JOB_HEARTBEAT_TIMEOUT
+
+
+def add_job(job_id, status='running', worker=None, heartbeat_age=0, kind='export', params=None):
+    heartbeat_at = None if heartbeat_age is None else datetime.utcnow() - timedelta(seconds=heartbeat_age)
+    db.session.add(Job(id=job_id, kind=kind, status=status, params=params or {}, worker=worker,
+                       heartbeat_at=heartbeat_at))
+    db.session.commit()
+
+
+def statuses():
+    db.session.expire_all()
+    return {job.id: job.status for job in Job.query}
+
+
+@pytest.fixture
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_only_jobs_of_gone_workers_are_failed(app, dead_pid):
+    host = socket.gethostname()
+    add_job('live-sibling', worker=f'{host}:{os.getppid()}')
+    add_job('live-here', worker=JobService._worker_id())
+    add_job('other-host', worker='elsewhere:1')
+    add_job('dead-process', worker=f'{host}:{dead_pid}')
+    add_job('stale', worker=f'{host}:{os.getppid()}', heartbeat_age=JOB_HEARTBEAT_TIMEOUT + 5)
+    add_job('stale-other-host', worker='elsewhere:1', heartbeat_age=JOB_HEARTBEAT_TIMEOUT + 5)
+    add_job('never-beat', worker=None, heartbeat_age=None)
+    add_job('queued', status='queued', heartbeat_age=None)
+
+    assert JobService.fail_interrupted_jobs() == 4
+    assert statuses() == {
+        'live-sibling': 'running', 'live-here': 'running', 'other-host': 'running', 'dead-process': 'failed',
+        'stale': 'failed', 'stale-other-host': 'failed', 'never-beat': 'failed', 'queued': 'queued'
+    }
+    assert JobService.fail_interrupted_jobs() == 0
+
+
+def test_claimed_jobs_record_their_worker_and_heartbeat(app):
+    add_job('queued', status='queued', heartbeat_age=None)
+    assert JobService._claim_next() == 'queued'
+    job = db.session.get(Job, 'queued')
+    assert job.status == 'running'
+    assert job.worker == JobService._worker_id()
+    beat = job.heartbeat_at
+
+    assert JobService._heartbeat() == 1
+    db.session.expire_all()
+    assert db.session.get(Job, 'queued').heartbeat_at >= beat
+    assert JobService.fail_interrupted_jobs() == 0
+
+
+def spooled_file(tmp_path, name):
+    path = tmp_path / name
+    path.write_text('0 HEAD\n')
+    return str(path)
+
+
+def test_cancelling_a_queued_import_deletes_its_upload(app, tmp_path):
+    path = spooled_file(tmp_path, 'queued.ged')
+    add_job('import', status='queued', kind='gedcom-import', params={'path': path}, heartbeat_age=None)
+    assert JobService.cancel_job('import').status == 'cancelled'
+    assert not os.path.exists(path)
+
+
+def test_cancelling_a_running_import_leaves_its_upload_to_the_job(app, tmp_path):
+    path = spooled_file(tmp_path, 'running.ged')
+    add_job('import', kind='gedcom-import', params={'path': path}, worker=JobService._worker_id())
+    job = JobService.cancel_job('import')
+    assert job.status == 'running' and job.cancel_requested
+    assert os.path.exists(path)
+
+
+def test_interrupted_imports_delete_their_upload(app, tmp_path, dead_pid):
+    dead = spooled_file(tmp_path, 'dead.ged')
+    live = spooled_file(tmp_path, 'live.ged')
+    add_job('dead', kind='gedcom-import', params={'path': dead}, worker=f'{socket.gethostname()}:{dead_pid}')
+    add_job('live', kind='gedcom-import', params={'path': live}, worker=JobService._worker_id())
+    assert JobService.fail_interrupted_jobs() == 1
+    assert not os.path.exists(dead)
+    assert os.path.exists(live)
+
+
+def test_cancelled_import_reports_the_rows_it_stored(app, tmp_path):
+    path = tmp_path / 'family.ged'
+    path.write_text(
+        '0 HEAD\n0 @I1@ INDI\n1 NAME Ann /Test/\n0 @I2@ INDI\n1 NAME Bob /Test/\n'
+        '0 @I3@ INDI\n1 NAME Cy /Test/\n0 @F1@ FAM\n1 HUSB @I2@\n1 WIFE @I1@\n1 CHIL @I3@\n0 TRLR\n'
+    )
+    add_job('import', kind='gedcom-import', params={'path': str(path), 'batch_size': 2},
+            worker=JobService._worker_id())
+    db.session.get(Job, 'import').cancel_requested = True
+    db.session.commit()
+
+    JobService._execute('import')
+    db.session.expire_all()
+    job = db.session.get(Job, 'import')
+    assert job.status == 'cancelled'
+    assert job.result['persons'] == 2
+    assert job.result['person_ids'] == [[1, 2]]
+    assert job.result['relationship_ids'] == []
+    assert Person.query.count() == 2
+    assert not path.exists()
+
+
+def test_finished_import_reports_the_ids_it_created(app, tmp_path):
+    path = tmp_path / 'family.ged'
+    path.write_text(
+        '0 HEAD\n0 @I1@ INDI\n1 NAME Ann /Test/\n0 @I2@ INDI\n1 NAME Bob /Test/\n'
+        '0 @F1@ FAM\n1 HUSB @I2@\n1 WIFE @I1@\n0 TRLR\n'
+    )
+    add_job('import', kind='gedcom-import', params={'path': str(path)}, worker=JobService._worker_id())
+    JobService._execute('import')
+    db.session.expire_all()
+    job = db.session.get(Job, 'import')
+    assert job.status == 'finished'
+    assert job.result['person_ids'] == [[1, 2]]
+    assert job.result['relationship_ids'] == [[1, 1]]
@@ -0,0 +1,46 @@
+# tests/test_kinship_names.py
+import pytest
+
+from models import db
+from models.person import Person
+from models.relationship import Relationship
+from services.kinship_service import blood_relationship_name
+
+
+@pytest.mark.parametrize('up, down, gender, name', [
+    (1, 0, 'female', 'mother'),
+    (2, 0, None, 'grandparent'),
+    (3, 0, 'male', 'great-grandfather'),
+    (4, 0, 'female', 'great-great-grandmother'),
+    (5, 0, 'male', '3rd great-grandfather'),
+    (6, 0, None, '4th great-grandparent'),
+    (13, 0, 'male', '11th great-grandfather'),
+    (0, 5, 'female', '3rd great-granddaughter'),
+    (2, 1, None, 'uncle or aunt'),
+    (3, 1, None, 'granduncle or grandaunt'),
+    (4, 1, 'male', 'great-granduncle'),
+    (6, 1, 'female', '3rd great-grandaunt'),
+    (1, 2, None, 'nephew or niece'),
+    (1, 3, None, 'grandnephew or grandniece'),
+    (1, 6, 'male', '3rd great-grandnephew'),
+    (3, 3, None, 'second cousin'),
+    (2, 4, 'female', 'first cousin twice removed'),
+])
+def test_blood_relationship_names(up, down, gender, name):
+    assert blood_relationship_name(up, down, gender) == name
+
+
+def test_step_relatives_of_unknown_gender(client):
+    db.session.add_all([
+        Person(first_name='Parent', last_name='Test', gender='female'),
+        Person(first_name='Spouse', last_name='Test', gender=None),
+        Person(first_name='Child', last_name='Test', gender=None),
+    ])
+    db.session.add_all([
+        Relationship(person1_id=1, person2_id=2, relationship_type='spouse'),
+        Relationship(person1_id=1, person2_id=3, relationship_type='parent-child'),
+    ])
+    db.session.commit()
+
+    assert client.get('/api/kinship?a=2&b=3').json['relationship'] == 'stepchild'
+    assert client.get('/api/kinship?a=3&b=2').json['relationship'] == 'stepparent'
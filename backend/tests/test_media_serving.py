@@ -0,0 +1,77 @@
+# tests/test_media_serving.py
+import hashlib
+import os
+
+import pytest
+
+from services.blob_store import BlobStore
+from utils.media_derivatives import derivative_paths
+
+CONTENT = bytes(range(256)) * 8
+
+CONTENT_HASH = hashlib.sha256(CONTENT).hexdigest()
+
+BLOB_PATH = BlobStore.blob_path(CONTENT_HASH, 'clip.mp4')
+
+DERIVATIVE_PATH = derivative_paths(CONTENT_HASH)['small']['webp']
+
+LEGACY_PATH = '1/clip.mp4'
+
+
+def write_file(relative_path, content=CONTENT):
+    path = BlobStore.absolute_path(relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as stored:
+        stored.write(content)
+
+
+@pytest.fixture
+def stored_files(app):
+    for relative_path in (BLOB_PATH, DERIVATIVE_PATH, LEGACY_PATH):
+        write_file(relative_path)
+
+
+@pytest.mark.parametrize('relative_path', [BLOB_PATH, LEGACY_PATH])
+def test_range_request_gets_only_those_bytes(client, stored_files, relative_path):
+    response = client.get(f'/uploads/{relative_path}', headers={'Range': 'bytes=100-299'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 100-299/{len(CONTENT)}'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.data == CONTENT[100:300]
+
+
+@pytest.mark.parametrize('relative_path', [BLOB_PATH, DERIVATIVE_PATH, LEGACY_PATH])
+def test_matching_etag_is_not_modified(client, stored_files, relative_path):
+    first = client.get(f'/uploads/{relative_path}')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    response = client.get(f'/uploads/{relative_path}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+
+@pytest.mark.parametrize('relative_path, etag', [
+    (BLOB_PATH, CONTENT_HASH),
+    (DERIVATIVE_PATH, f'{CONTENT_HASH}-small.webp'),
+    (LEGACY_PATH, None),
+    # A hash-named file outside the content-addressed folders can still be overwritten
+    (f'1/{CONTENT_HASH}.mp4', None),
+])
+def test_only_content_addressed_files_are_immutable(client, stored_files, relative_path, etag):
+    write_file(relative_path)
+    response = client.get(f'/uploads/{relative_path}')
+    assert response.status_code == 200
+    cache_control = response.headers['Cache-Control']
+    if etag:
+        assert 'immutable' in cache_control and 'max-age=31536000' in cache_control
+        assert response.headers['ETag'] == f'"{etag}"'
+    else:
+        assert 'immutable' not in cache_control and 'no-cache' in cache_control
+
+
+def test_uploads_still_being_received_are_not_served(client, stored_files):
+    write_file('.partial/0123abcd')
+    assert client.get('/uploads/.partial/0123abcd').status_code == 404
+    assert client.get('/uploads/.partial').status_code == 404
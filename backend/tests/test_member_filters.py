@@ -0,0 +1,33 @@
+# tests/test_member_filters.py
+from datetime import date
+
+import pytest
+
+from models import db
+from models.person import Person
+
+
+@pytest.fixture
+def members(app):
+    for first_name, birth_date in (('Ada', date(1815, 12, 10)), ('Alan', date(1912, 6, 23)),
+                                   ('Grace', date(9998, 12, 31))):
+        db.session.add(Person(first_name=first_name, last_name='Test', gender='other', birth_date=birth_date))
+    db.session.commit()
+
+
+def names(response):
+    assert response.status_code == 200
+    return [member['first_name'] for member in response.json]
+
+
+def test_birth_year_range_is_inclusive(client, members):
+    assert names(client.get('/api/members?birth_year_min=1815&birth_year_max=1912')) == ['Ada', 'Alan']
+    assert names(client.get('/api/members?birth_year_min=1900')) == ['Alan', 'Grace']
+    assert names(client.get('/api/members?birth_year_max=9998')) == ['Ada', 'Alan', 'Grace']
+
+
+@pytest.mark.parametrize('query', ['birth_year_max=9999', 'birth_year_min=9999', 'birth_year_min=0',
+                                   'birth_year_max=100000', 'birth_year_min=abc'])
+def test_birth_years_out_of_range_are_rejected(client, members, query):
+    response = client.get(f'/api/members?{query}')
+    assert response.status_code == 400
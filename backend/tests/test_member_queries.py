@@ -0,0 +1,73 @@
+# tests/test_member_queries.py
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from models import db
+from models.person import Person
+from models.custom_field import CustomField
+from models.media import Media
+
+
+@contextmanager
+def count_statements():
+    """Count the SQL statements sent to the database inside the block"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def add_members(count):
+    for number in range(count):
+        person = Person(first_name=f'First{number}', last_name='Last', gender='female')
+        person.custom_fields = [CustomField(field_name='nickname', field_value=f'N{number}')]
+        person.media = [Media(media_type='image', file_path=f'blobs/{number}.jpg', title='Portrait')]
+        db.session.add(person)
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def listing_statements(client, query=''):
+    with count_statements() as statements:
+        response = client.get(f'/api/members{query}')
+    assert response.status_code == 200
+    return len(statements), response.json
+
+
+def test_member_listing_statement_count_does_not_grow_with_members(app, client):
+    counts = {}
+    added = 0
+    for total in (1, 10, 100):
+        add_members(total - added)
+        added = total
+        counts[total], members = listing_statements(client)
+        assert len(members) == total
+        assert all(member['custom_fields'] and member['media'] for member in members)
+    assert counts[1] == counts[10] == counts[100]
+
+
+@pytest.mark.parametrize('query', ['?limit=50', '?fields=id,full_name,media', '?surname=la&gender=female'])
+def test_filtered_and_projected_listing_statement_count_is_constant(app, client, query):
+    add_members(5)
+    few, _ = listing_statements(client, query)
+    add_members(95)
+    many, _ = listing_statements(client, query)
+    assert few == many
+
+
+def test_member_detail_loads_collections_in_a_fixed_number_of_statements(app, client):
+    add_members(3)
+    with count_statements() as statements:
+        member = client.get('/api/members/2').json
+    assert member['custom_fields'][0]['field_value'] == 'N1'
+    assert member['media'][0]['title'] == 'Portrait'
+    # The revision check, the person and one batch per collection
+    assert len(statements) <= 4
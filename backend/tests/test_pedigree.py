@@ -0,0 +1,54 @@
+# tests/test_pedigree.py
+import pytest
+from sqlalchemy import insert
+
+from models import db
+from models.person import Person
+from models.relationship import Relationship
+from services.kinship_graph import parent_map
+from services.pedigree_service import PedigreeService
+from utils.validators import validate_pedigree_analysis_params, MAX_IMPLEX_GENERATIONS
+
+
+@pytest.fixture
+def family(app):
+    """
+    Cousins 5 and 6 have child 7, whose four grandparents are only two
+    persons (1 and 2). 8 and 9 are each other's parent. 10 was deleted.
+    """
+    db.session.execute(insert(Person), [
+        {'first_name': f'P{number}', 'last_name': 'Test', 'gender': None} for number in range(1, 11)
+    ])
+    db.session.execute(insert(Relationship), [
+        {'person1_id': parent_id, 'person2_id': child_id, 'relationship_type': 'parent-child'}
+        for parent_id, child_id in ((1, 3), (2, 3), (1, 4), (2, 4), (3, 5), (4, 6), (5, 7), (6, 7),
+                                    (8, 9), (9, 8), (10, 7), (7, 10))
+    ])
+    db.session.execute(Person.__table__.delete().where(Person.id == 10))
+    db.session.commit()
+
+
+def test_parent_map_ignores_relationships_of_deleted_persons(family):
+    parents = parent_map(set(range(1, 11)), restrict=False)
+    assert parents == {3: [1, 2], 4: [1, 2], 5: [3], 6: [4], 7: [5, 6], 8: [9], 9: [8]}
+    assert parent_map({7, 8, 10}) == {7: [5, 6], 8: [9]}
+
+
+def test_analysis_finds_loops_and_collapse(family):
+    summary = PedigreeService.analyze(3)
+    assert summary['cycles'] == 1
+    assert summary['persons_in_cycles'] == 2
+    assert summary['parent_edges'] == 10
+
+    diagnostic = PedigreeService.person_report(7)
+    # Parents 5 and 6, grandparents 3 and 4, great-grandparents 1 and 2 twice each
+    assert (diagnostic['ancestors'], diagnostic['ancestor_slots']) == (6, 8)
+    assert diagnostic['implex'] == pytest.approx(0.25)
+    assert PedigreeService.person_report(8)['cycle_members'] == [8, 9]
+    assert PedigreeService.person_report(10) is None
+
+
+def test_generations_are_bounded():
+    assert validate_pedigree_analysis_params({'generations': MAX_IMPLEX_GENERATIONS})[0]
+    assert not validate_pedigree_analysis_params({'generations': MAX_IMPLEX_GENERATIONS + 1})[0]
+    assert not validate_pedigree_analysis_params({'generations': 0})[0]
@@ -0,0 +1,47 @@
+# tests/test_relationship_import.py
+import pytest
+
+from models import db
+from models.person import Person
+from models.relationship import Relationship
+
+
+@pytest.fixture
+def persons(app):
+    db.session.add_all(Person(first_name=f'P{number}', last_name='Test', gender='other') for number in range(4))
+    db.session.commit()
+
+
+def bulk(client, rows):
+    return client.post('/api/relationships/bulk', json=rows)
+
+
+@pytest.mark.parametrize('person_id', [[1], {'id': 1}, 1.0, 1.5, True, '1'])
+def test_person_ids_that_are_not_ints_are_row_errors(client, persons, person_id):
+    response = bulk(client, [
+        {'person1_id': person_id, 'person2_id': 2, 'relationship_type': 'parent-child'},
+        {'person1_id': 3, 'person2_id': person_id, 'relationship_type': 'spouse'},
+        {'person1_id': 1, 'person2_id': 4, 'relationship_type': 'parent-child'}
+    ])
+    assert response.status_code == 201
+    assert response.json['created'] == 1
+    assert [error['index'] for error in response.json['errors']] == [0, 1]
+    assert response.json['errors'][0]['errors'] == ['person1_id must be an integer']
+    assert response.json['errors'][1]['errors'] == ['person2_id must be an integer']
+
+
+def test_rows_the_database_rejects_are_reported_per_row(client, persons):
+    response = bulk(client, [
+        {'person1_id': 1, 'person2_id': 2, 'relationship_type': 'parent-child'},
+        {'person1_id': 1, 'person2_id': 3, 'relationship_type': 'parent-child', 'description': {'not': 'text'}},
+        {'person1_id': 3, 'person2_id': 4, 'relationship_type': 'spouse'}
+    ])
+    assert response.status_code == 201
+    assert response.json['created'] == 2
+    assert [error['index'] for error in response.json['errors']] == [1]
+    assert {(row.person1_id, row.person2_id) for row in Relationship.query} == {(1, 2), (3, 4)}
+
+    # The rejected edge is not remembered as stored
+    response = bulk(client, [{'person1_id': 1, 'person2_id': 3, 'relationship_type': 'parent-child'}])
+    assert response.json['created'] == 1
+    assert response.json['duplicates'] == 0
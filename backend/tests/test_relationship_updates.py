@@ -0,0 +1,58 @@
+# tests/test_relationship_updates.py
+import pytest
+
+from models import db
+from models.person import Person
+from models.relationship import Relationship
+
+
+@pytest.fixture
+def persons(app):
+    db.session.add_all(Person(first_name=f'P{number}', last_name='Test', gender='other') for number in range(3))
+    db.session.commit()
+
+
+def add_relationship(client, person1_id, person2_id, relationship_type):
+    response = client.post('/api/relationships', json={
+        'person1_id': person1_id, 'person2_id': person2_id, 'relationship_type': relationship_type
+    })
+    assert response.status_code == 201
+    return response.json['id']
+
+
+def stored():
+    db.session.expire_all()
+    return {(row.id, row.person1_id, row.person2_id, row.relationship_type) for row in Relationship.query}
+
+
+@pytest.mark.parametrize('first, second, new_type', [
+    ((1, 2, 'spouse'), (2, 1, 'sibling'), 'spouse'),
+    ((1, 2, 'parent-child'), (1, 2, 'other'), 'parent-child'),
+    ((2, 1, 'parent-child'), (2, 1, 'sibling'), 'child-parent'),
+])
+def test_update_into_a_copy_of_another_relationship_is_a_conflict(client, persons, first, second, new_type):
+    existing_id = add_relationship(client, *first)
+    updated_id = add_relationship(client, *second)
+    before = stored()
+
+    response = client.put(f'/api/relationships/{updated_id}', json={'relationship_type': new_type})
+    assert response.status_code == 409
+    assert response.json['relationship']['id'] == existing_id
+    assert stored() == before
+
+    # The session is still usable
+    assert client.get(f'/api/relationships/{updated_id}').status_code == 200
+    assert client.put(f'/api/relationships/{updated_id}', json={'description': 'kept'}).status_code == 200
+
+
+def test_update_onto_its_own_canonical_row_is_allowed(client, persons):
+    relationship_id = add_relationship(client, 1, 2, 'parent-child')
+    response = client.put(f'/api/relationships/{relationship_id}', json={'relationship_type': 'parent-child'})
+    assert response.status_code == 200
+    response = client.put(f'/api/relationships/{relationship_id}', json={'relationship_type': 'spouse'})
+    assert response.status_code == 200
+    assert stored() == {(relationship_id, 1, 2, 'spouse')}
+
+
+def test_unknown_relationship_is_not_found(client, persons):
+    assert client.put('/api/relationships/99', json={'relationship_type': 'spouse'}).status_code == 404
@@ -0,0 +1,149 @@
+# tests/test_tree_engines.py
+import random
+from itertools import combinations
+
+import pytest
+from sqlalchemy import insert
+
+from models import db
+from models.person import Person
+from models.relationship import Relationship
+from services.kinship_graph import TRAVERSAL_DIRECTIONS
+from services.tree_cache import tree_cache
+from services.tree_service import TreeService
+
+# Every subset of the traversal directions, and None for all of them
+DIRECTION_SUBSETS = [None] + [
+    list(subset) for size in range(len(TRAVERSAL_DIRECTIONS) + 1)
+    for subset in combinations(TRAVERSAL_DIRECTIONS, size)
+]
+
+DEPTHS = (0, 1, 2, 4, None)
+
+NODE_LIMITS = (1, 2, 5)
+
+
+def add_persons(count):
+    db.session.execute(insert(Person), [
+        {'first_name': f'P{number}', 'last_name': 'Test', 'gender': ('male', 'female', None)[number % 3]}
+        for number in range(1, count + 1)
+    ])
+
+
+def add_relationships(edges):
+    db.session.execute(insert(Relationship), [
+        {'person1_id': person1_id, 'person2_id': person2_id, 'relationship_type': relationship_type}
+        for person1_id, person2_id, relationship_type in edges
+    ])
+
+
+def cycles():
+    """Parent-child loop, a spouse triangle and siblings that close more loops"""
+    add_persons(8)
+    add_relationships([
+        (1, 2, 'parent-child'), (2, 3, 'parent-child'), (3, 4, 'parent-child'), (4, 1, 'parent-child'),
+        (2, 5, 'spouse'), (5, 6, 'spouse'), (2, 6, 'spouse'),
+        (3, 7, 'sibling'), (7, 4, 'sibling'), (6, 8, 'other'), (8, 1, 'other'),
+        (5, 7, 'parent-child'), (7, 5, 'parent-child'),
+    ])
+    return (1, 3, 5, 8)
+
+
+def orphans():
+    """Relationships of every type whose other end was deleted, on both sides"""
+    add_persons(6)
+    add_relationships([
+        (1, 2, 'parent-child'), (2, 3, 'parent-child'), (3, 4, 'spouse'), (4, 5, 'sibling'), (5, 6, 'other'),
+        (1, 98, 'parent-child'), (99, 1, 'parent-child'), (2, 97, 'spouse'), (96, 3, 'sibling'),
+        (4, 95, 'other'), (94, 5, 'unknown-type'), (98, 99, 'parent-child'), (98, 6, 'spouse'),
+    ])
+    db.session.execute(Person.__table__.delete().where(Person.id == 6))
+    return (1, 3, 5)
+
+
+def random_family():
+    """Random relationships of every type among 40 persons, with duplicate pairs and loops"""
+    rng = random.Random(24)
+    add_persons(40)
+    types = ('parent-child', 'child-parent', 'spouse', 'sibling', 'other')
+    edges = {
+        (rng.randint(1, 42), rng.randint(1, 42), rng.choice(types)) for _ in range(120)
+    }
+    add_relationships(edge for edge in edges if edge[0] != edge[1])
+    return (1, 13, 33, 41)
+
+
+def engine_options():
+    """Every direction subset at every depth, and every depth with each node limit"""
+    for directions in DIRECTION_SUBSETS:
+        for max_depth in DEPTHS:
+            yield dict(max_depth=max_depth, max_nodes=None, directions=directions)
+    for max_depth in DEPTHS:
+        for max_nodes in NODE_LIMITS:
+            yield dict(max_depth=max_depth, max_nodes=max_nodes, directions=None)
+            yield dict(max_depth=max_depth, max_nodes=max_nodes, directions=['ancestors', 'siblings'])
+
+
+def compare_engines(roots):
+    compared = 0
+    for root_id in roots:
+        for options in engine_options():
+            sql = TreeService.collect_subtree(root_id, engine='sql', **options)
+            graph = TreeService.collect_subtree(root_id, engine='graph', **options)
+            assert sql == graph, (root_id, options)
+            compared += 1
+    return compared
+
+
+@pytest.mark.parametrize('build', [cycles, orphans, random_family])
+def test_sql_and_graph_engines_return_the_same_subtree(app, build):
+    roots = build()
+    db.session.commit()
+    assert compare_engines(roots)
+
+
+def test_missing_root_is_none_on_both_engines(app):
+    orphans()
+    db.session.commit()
+    for root_id in (6, 98, 1000):
+        assert TreeService.collect_subtree(root_id, engine='sql') is None
+        assert TreeService.collect_subtree(root_id, engine='graph') is None
+
+
+def test_orphan_relationships_are_not_followed(app):
+    orphans()
+    db.session.commit()
+    persons, relationships = TreeService.collect_subtree(1, max_depth=None, engine='sql')
+    assert [person.id for person in persons] == [1, 2, 3, 4, 5]
+    assert {(edge.person1_id, edge.person2_id) for edge in relationships} == {(1, 2), (2, 3), (3, 4), (4, 5)}
+
+
+def test_max_nodes_cuts_off_in_traversal_order(app):
+    cycles()
+    db.session.commit()
+    full, _ = TreeService.collect_subtree(1, max_depth=None, engine='graph')
+    for max_nodes in range(1, len(full) + 1):
+        for engine in ('sql', 'graph'):
+            persons, _ = TreeService.collect_subtree(1, max_depth=None, max_nodes=max_nodes, engine=engine)
+            assert persons == full[:max_nodes]
+
+
+def test_tree_route_gives_the_same_tree_on_both_engines(app, client):
+    random_family()
+    db.session.commit()
+    trees = []
+    for engine in ('sql', 'graph'):
+        tree_cache._clear(None)
+        response = client.get(f'/api/tree?root_id=7&depth=4&directions=ancestors,spouses,siblings&engine={engine}')
+        assert response.status_code == 200
+        trees.append(response.json)
+    assert trees[0] == trees[1]
+    assert trees[0]['nodes']
+
+
+def test_unknown_engine_is_rejected(app, client):
+    add_persons(1)
+    db.session.commit()
+    with pytest.raises(ValueError):
+        TreeService.collect_subtree(1, engine='cte')
+    assert client.get('/api/tree?root_id=1&engine=cte').status_code == 400
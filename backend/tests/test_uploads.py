@@ -0,0 +1,109 @@
+# tests/test_uploads.py
+import hashlib
+import io
+import os
+
+import pytest
+from sqlalchemy import update
+
+from models import db
+from models.person import Person
+from models.media import Media
+from models.media_upload import MediaUpload
+from services.blob_store import BlobStore
+from services.upload_service import UploadService, UploadOffsetMismatch
+
+CONTENT = bytes(range(256)) * 40
+
+
+def start_upload(client, total_size=len(CONTENT)):
+    db.session.add(Person(first_name='Ann', last_name='Test'))
+    db.session.commit()
+    response = client.post('/api/members/1/media/uploads', json={'filename': 'clip.mp4', 'total_size': total_size})
+    assert response.status_code == 201
+    return response.headers['Location']
+
+
+def put_chunk(client, location, offset, data):
+    return client.put(location, data=data, headers={'Upload-Offset': str(offset)})
+
+
+def test_chunks_resume_from_the_reported_offset_and_complete(app, client):
+    location = start_upload(client)
+    response = put_chunk(client, location, 0, CONTENT[:4000])
+    assert response.status_code == 200
+    assert response.headers['Upload-Offset'] == '4000'
+
+    # After an interruption the client asks where to continue
+    resumed = client.get(location)
+    assert resumed.json['offset'] == 4000
+    assert resumed.headers['Upload-Offset'] == '4000'
+
+    response = put_chunk(client, location, 4000, CONTENT[4000:9000])
+    assert response.json['offset'] == 9000
+    response = put_chunk(client, location, 9000, CONTENT[9000:])
+    assert response.status_code == 201
+    media = response.json
+    assert media['file_size'] == len(CONTENT)
+    assert media['content_hash'] == hashlib.sha256(CONTENT).hexdigest()
+    with open(BlobStore.absolute_path(media['file_path']), 'rb') as stored:
+        assert stored.read() == CONTENT
+
+    assert client.get(location).status_code == 404
+    assert MediaUpload.query.count() == 0
+    assert os.listdir(BlobStore.partial_folder()) == []
+
+
+@pytest.mark.parametrize('offset', [0, 10, 4000])
+def test_chunk_at_the_wrong_offset_is_rejected(app, client, offset):
+    location = start_upload(client)
+    put_chunk(client, location, 0, CONTENT[:10])
+    if offset == 0:
+        # A retry of the chunk that was already received
+        response = put_chunk(client, location, 0, CONTENT[:10])
+    else:
+        response = put_chunk(client, location, offset + 1, CONTENT[offset + 1:offset + 20])
+    assert response.status_code == 409
+    assert response.json['offset'] == 10
+    assert response.headers['Upload-Offset'] == '10'
+    assert client.get(location).json['offset'] == 10
+    assert os.path.getsize(UploadService.partial_path(location.rsplit('/', 1)[1])) == 10
+
+
+def test_chunk_past_the_total_size_leaves_the_offset_unchanged(app, client):
+    location = start_upload(client, total_size=100)
+    put_chunk(client, location, 0, CONTENT[:60])
+    assert put_chunk(client, location, 60, CONTENT[60:160]).status_code == 413
+    assert client.get(location).json['offset'] == 60
+    assert put_chunk(client, location, 60, CONTENT[60:100]).status_code == 201
+
+
+class RacingStream(io.BytesIO):
+    """Chunk body that lets another request claim the same offset while it is being read"""
+
+    def __init__(self, data, upload_id, other_offset):
+        super().__init__(data)
+        self.upload_id = upload_id
+        self.other_offset = other_offset
+
+    def read(self, size=-1):
+        if self.other_offset is not None:
+            db.session.execute(
+                update(MediaUpload).where(MediaUpload.id == self.upload_id).values(received=self.other_offset)
+            )
+            db.session.commit()
+            self.other_offset = None
+        return super().read(size)
+
+
+def test_offset_claimed_by_another_request_is_a_mismatch(app, client):
+    location = start_upload(client)
+    upload_id = location.rsplit('/', 1)[1]
+    upload = db.session.get(MediaUpload, upload_id)
+
+    with pytest.raises(UploadOffsetMismatch) as error:
+        UploadService.append_chunk(upload, 0, RacingStream(CONTENT[:50], upload_id, other_offset=30))
+    assert error.value.offset == 30
+    assert db.session.get(MediaUpload, upload_id).received == 30
+    assert os.listdir(BlobStore.partial_folder()) == [upload_id]
+    assert Media.query.count() == 0
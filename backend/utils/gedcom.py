@@ -0,0 +1,194 @@
+import re
+
+# level, optional @XREF@, tag, optional value
+GEDCOM_LINE = re.compile(r'^\s*(\d+)\s+(?:(@[^@]+@)\s+)?(\S+)(?: (.*))?$')
+
+MONTHS = {
+    'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
+    'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12
+}
+
+
+class GedcomNode:
+    """One GEDCOM line together with its subordinate lines"""
+    __slots__ = ('level', 'xref', 'tag', 'value', 'children')
+
+    def __init__(self, level, xref, tag, value):
+        self.level = level
+        self.xref = xref
+        self.tag = tag
+        self.value = value
+        self.children = []
+
+    def first(self, tag):
+        """Return the first child with the given tag, or None"""
+        for child in self.children:
+            if child.tag == tag:
+                return child
+        return None
+
+    def all(self, tag):
+        """Return every child with the given tag"""
+        return [child for child in self.children if child.tag == tag]
+
+    def child_value(self, tag):
+        """Value of the first child with the given tag, or None"""
+        child = self.first(tag)
+        return child.value if child is not None else None
+
+
+class GedcomSyntaxError(ValueError):
+    def __init__(self, line_number, line):
+        super().__init__(f"Malformed GEDCOM line {line_number}: {line[:80]!r}")
+        self.line_number = line_number
+
+
+def iter_gedcom_lines(stream):
+    """
+    Lazily split a GEDCOM stream into (line_number, level, xref, tag, value) tuples
+
+    Args:
+        stream: Binary or text file-like object (read line by line, never as a whole)
+
+    Raises:
+        GedcomSyntaxError: For a non-blank line that is not a GEDCOM line
+    """
+    for line_number, line in enumerate(stream, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        if line_number == 1:
+            line = line.lstrip('\ufeff')
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            continue
+        match = GEDCOM_LINE.match(line)
+        if match is None:
+            raise GedcomSyntaxError(line_number, line)
+        level, xref, tag, value = match.groups()
+        yield line_number, int(level), xref, tag.upper(), value or ''
+
+
+def iter_gedcom_records(stream):
+    """
+    Lazily group a GEDCOM stream into level 0 records
+
+    Only the record being assembled is held in memory. CONT and CONC lines are
+    folded into the value of the line they continue.
+
+    Args:
+        stream: Binary or text file-like object
+
+    Yields:
+        GedcomNode for every level 0 record (HEAD, INDI, FAM, ..., TRLR)
+    """
+    record = None
+    stack = []
+    for line_number, level, xref, tag, value in iter_gedcom_lines(stream):
+        if tag in ('CONT', 'CONC') and 0 < level <= len(stack):
+            continued = stack[level - 1]
+            continued.value += ('\n' if tag == 'CONT' else '') + value
+            continue
+
+        node = GedcomNode(level, xref, tag, value)
+        if level == 0:
+            if record is not None:
+                yield record
+            record = node
+            stack = [node]
+            continue
+        if record is None or level > len(stack):
+            raise GedcomSyntaxError(line_number, f"{level} {tag} {value}")
+        del stack[level:]
+        stack[-1].children.append(node)
+        stack.append(node)
+
+    if record is not None:
+        yield record
+
+
+def parse_gedcom_date(value):
+    """
+    Parse a GEDCOM date value
+
+    Args:
+        value: Date value such as "12 JAN 1900", "JAN 1900", "1900" or "ABT 1900"
+
+    Returns:
+        (year, month, day, exact): month and day are None when not given; exact is
+        False for qualified dates (ABT, BEF, BET ... AND ..., ...). Returns None when
+        no calendar date can be read from the value.
+    """
+    if not value:
+        return None
+    parts = value.upper().replace('.', ' ').split()
+    exact = True
+    while parts and not parts[0].isdigit() and parts[0] not in MONTHS:
+        # Qualifiers (ABT, EST, CAL, BEF, AFT, BET, FROM, TO, INT) and calendar escapes
+        exact = False
+        parts.pop(0)
+    if not parts:
+        return None
+
+    day = month = year = None
+    if len(parts) >= 3 and parts[0].isdigit() and parts[1] in MONTHS and parts[2].isdigit():
+        day, month, year = int(parts[0]), MONTHS[parts[1]], int(parts[2])
+        parts = parts[3:]
+    elif len(parts) >= 2 and parts[0] in MONTHS and parts[1].isdigit():
+        month, year = MONTHS[parts[0]], int(parts[1])
+        parts = parts[2:]
+    elif parts[0].isdigit():
+        year = int(parts[0])
+        parts = parts[1:]
+    else:
+        return None
+
+    if parts:
+        # Trailing "AND ..." / "TO ..." / "B.C." make the date a range or otherwise imprecise
+        exact = False
+    if not 1 <= year <= 9999 or (day is not None and not 1 <= day <= 31):
+        return None
+    return year, month, day, exact
+
+
+def split_gedcom_name(value):
+    """Split a NAME value like "John Paul /Smith/ Jr." into (given names, surname)"""
+    if '/' not in value:
+        return value.strip(), ''
+    given, _, rest = value.partition('/')
+    surname, _, suffix = rest.partition('/')
+    given = ' '.join(part for part in (given.strip(), suffix.strip()) if part)
+    return given, surname.strip()
+
+
+# Longest value written on one line before it is continued with CONC
+MAX_GEDCOM_VALUE_LENGTH = 200
+
+MONTH_NAMES = {number: name for name, number in MONTHS.items()}
+
+
+def format_gedcom_date(value):
+    """Format a date as a GEDCOM date value ("12 JAN 1900")"""
+    return f"{value.day} {MONTH_NAMES[value.month]} {value.year}"
+
+
+def gedcom_lines(level, tag, value=None, xref=None):
+    """
+    Yield the text lines for one GEDCOM line, splitting long and multi-line values
+
+    Embedded newlines become CONT lines and values longer than
+    MAX_GEDCOM_VALUE_LENGTH are continued with CONC lines.
+    """
+    prefix = f"{level} {xref} {tag}" if xref else f"{level} {tag}"
+    if value is None or value == '':
+        yield prefix + '\n'
+        return
+
+    for line_index, text in enumerate(str(value).replace('\r\n', '\n').split('\n')):
+        pieces = [text[start:start + MAX_GEDCOM_VALUE_LENGTH]
+                  for start in range(0, len(text), MAX_GEDCOM_VALUE_LENGTH)] or ['']
+        for piece_index, piece in enumerate(pieces):
+            if line_index == 0 and piece_index == 0:
+                head = prefix
+            else:
+                head = f"{level + 1} {'CONC' if piece_index else 'CONT'}"
+            yield f"{head} {piece}\n" if piece else head + '\n'
@@ -0,0 +1,38 @@
+from functools import wraps
+import hashlib
+from flask import request, make_response
+from models.data_revision import DataRevision
+
+def revision_etag():
+    """
+    Strong ETag for the current request at a data revision
+    
+    The tag covers the revision, the full path with query string and the Accept
+    header, so every representation of every resource gets its own validator.
+    """
+    key = f"{DataRevision.current()}|{request.full_path}|{request.headers.get('Accept', '')}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def conditional_on_revision(view):
+    """
+    Decorator for GET views whose output only changes when DataRevision is bumped.
+    
+    Answers If-None-Match with 304 Not Modified when the client already holds the
+    current representation, without running the view; otherwise runs the view and
+    tags successful responses with a strong ETag and Cache-Control: no-cache so
+    browsers revalidate on every load.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        etag = revision_etag()
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept')
+        return response
+    return wrapper
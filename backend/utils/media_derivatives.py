@@ -0,0 +1,179 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from functools import lru_cache
+
+# Pillow is optional: without it no image derivatives are produced and media are
+# served as originals only
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+    ImageOps = None
+
+# Derivatives live under UPLOAD_FOLDER/<DERIVATIVE_DIRECTORY>/ab/cd/<sha256>/<size>.<format>,
+# keyed by content so identical files share them like they share their blob
+DERIVATIVE_DIRECTORY = 'derivatives'
+
+# Size name -> longest edge in pixels, largest first (each size is scaled from the previous one)
+DERIVATIVE_SIZES = {'large': 1280, 'small': 480, 'thumb': 160}
+
+# Every size is written in each of these formats (format name -> file extension)
+DERIVATIVE_FORMATS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+# Raster formats Pillow can read; other "photo" uploads (svg, pdf, ...) get no derivatives
+IMAGE_DERIVATIVE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff', 'webp'}
+
+VIDEO_DERIVATIVE_EXTENSIONS = {'mp4', 'mov', 'webm', 'avi', 'mkv', 'mpeg', 'mpg', 'wmv'}
+
+# Seconds into a video the poster frame is taken from (the first frame is often black)
+POSTER_FRAME_OFFSET = 1.0
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+@lru_cache(maxsize=1)
+def ffmpeg_binary():
+    """Path of the ffmpeg executable (FFMPEG_BINARY environment variable or PATH), or None"""
+    return shutil.which(os.environ.get('FFMPEG_BINARY', 'ffmpeg'))
+
+def derivative_source_kind(filename):
+    """'image' or 'video' if derivatives can be generated for this file here, else None"""
+    extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+    if extension in IMAGE_DERIVATIVE_EXTENSIONS and Image is not None:
+        return 'image'
+    if extension in VIDEO_DERIVATIVE_EXTENSIONS and Image is not None and ffmpeg_binary():
+        return 'video'
+    return None
+
+def derivative_folder(content_hash):
+    """Folder of a file's derivatives, relative to UPLOAD_FOLDER"""
+    return '/'.join((DERIVATIVE_DIRECTORY, content_hash[:2], content_hash[2:4], content_hash))
+
+def derivative_name(size, derivative_format):
+    return f"{size}.{DERIVATIVE_FORMATS[derivative_format]}"
+
+def derivative_paths(content_hash):
+    """{size: {format: path relative to UPLOAD_FOLDER}} for every derivative of a file"""
+    folder = derivative_folder(content_hash)
+    return {
+        size: {name: f"{folder}/{derivative_name(size, name)}" for name in DERIVATIVE_FORMATS}
+        for size in DERIVATIVE_SIZES
+    }
+
+def parse_derivative_path(relative_path):
+    """Content hash of a derivative path like derivatives/ab/cd/<hash>/small.webp, or None"""
+    parts = relative_path.split('/')
+    if len(parts) != 5 or parts[0] != DERIVATIVE_DIRECTORY:
+        return None
+    content_hash, file_name = parts[3], parts[4]
+    if len(content_hash) != 64 or parts[1:3] != [content_hash[:2], content_hash[2:4]]:
+        return None
+    valid_names = {derivative_name(size, name) for size in DERIVATIVE_SIZES for name in DERIVATIVE_FORMATS}
+    return content_hash if file_name in valid_names else None
+
+def image_dimensions(path):
+    """
+    (width, height) of an image as displayed, read from its header only
+
+    Returns (None, None) if Pillow is not installed or cannot read the file.
+    """
+    if Image is None:
+        return None, None
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            # EXIF orientations 5-8 are rotated by 90 degrees
+            if image.getexif().get(0x0112) in (5, 6, 7, 8):
+                width, height = height, width
+            return width, height
+    except Exception:
+        return None, None
+
+def generate_derivatives(source_path, kind, output_folder):
+    """
+    Write every derivative size and format of one file
+
+    Runs in a worker process, so it only takes plain paths. Files are written to a
+    temporary name and renamed into place, so concurrent runs for the same file
+    are harmless and readers never see a partial derivative.
+
+    Args:
+        source_path: Absolute path of the original
+        kind: 'image' or 'video' (see derivative_source_kind)
+        output_folder: Absolute folder to write <size>.<ext> files to
+
+    Returns:
+        Dict with the file names written and the width and height of the
+        original (of the poster frame for videos)
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    if kind == 'video':
+        poster_path = _extract_poster_frame(source_path, output_folder)
+        try:
+            return _write_image_derivatives(poster_path, output_folder)
+        finally:
+            os.remove(poster_path)
+    return _write_image_derivatives(source_path, output_folder)
+
+def _extract_poster_frame(source_path, output_folder):
+    """Grab one video frame as a PNG in output_folder with ffmpeg; returns its path"""
+    handle, poster_path = tempfile.mkstemp(dir=output_folder, prefix='.poster-', suffix='.png')
+    os.close(handle)
+    command = [
+        ffmpeg_binary(), '-nostdin', '-loglevel', 'error', '-y',
+        '-ss', str(POSTER_FRAME_OFFSET), '-i', source_path, '-frames:v', '1', poster_path
+    ]
+    try:
+        subprocess.run(command, check=True, capture_output=True, timeout=60)
+        if not os.path.getsize(poster_path):
+            # Shorter than the offset: take the first frame instead
+            command[command.index('-ss') + 1] = '0'
+            subprocess.run(command, check=True, capture_output=True, timeout=60)
+    except Exception:
+        os.remove(poster_path)
+        raise
+    return poster_path
+
+def _write_image_derivatives(source_path, output_folder):
+    written = []
+    with Image.open(source_path) as original:
+        largest = max(DERIVATIVE_SIZES.values())
+        # Let the JPEG decoder scale down while decoding instead of decoding full size
+        original.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(original)
+        image = _flatten(image)
+        # Drafted JPEGs decode smaller than the original, so report the header size
+        width, height = image_dimensions(source_path)
+        for size, edge in DERIVATIVE_SIZES.items():
+            if max(image.size) > edge:
+                image = image.copy()
+                image.thumbnail((edge, edge), Image.LANCZOS)
+            for derivative_format in DERIVATIVE_FORMATS:
+                file_name = derivative_name(size, derivative_format)
+                _save_atomically(image, os.path.join(output_folder, file_name), derivative_format)
+                written.append(file_name)
+    return {'files': written, 'width': width, 'height': height}
+
+def _flatten(image):
+    """RGB copy of an image, with any transparency composited over white"""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB') if image.mode != 'RGB' else image
+
+def _save_atomically(image, path, derivative_format):
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.derivative-')
+    try:
+        with os.fdopen(handle, 'wb') as output:
+            if derivative_format == 'webp':
+                image.save(output, 'WEBP', quality=WEBP_QUALITY, method=4)
+            else:
+                image.save(output, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
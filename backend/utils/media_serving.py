@@ -0,0 +1,85 @@
+import logging
+import mimetypes
+from flask import current_app, request, send_file, make_response
+from utils.media_derivatives import DERIVATIVE_DIRECTORY, parse_derivative_path
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed files never change, so browsers and proxies may keep them for a year
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Top-level upload folders whose paths contain the SHA-256 of the content
+CONTENT_ADDRESSED_DIRECTORIES = {'blobs', DERIVATIVE_DIRECTORY}
+
+def content_etag(relative_path):
+    """
+    Strong ETag derived from a content-addressed path, or None for other paths
+
+    Blob names are the file's hash and derivative folders are named after the hash
+    of their source, so the tag is known without reading or hashing the file.
+    """
+    parts = relative_path.split('/')
+    if parts[0] == 'blobs' and len(parts) == 4:
+        return parts[3].split('.')[0]
+    if parse_derivative_path(relative_path):
+        return f"{parts[3]}-{parts[4]}"
+    return None
+
+def send_media_file(absolute_path, relative_path, stat):
+    """
+    Response for a file under UPLOAD_FOLDER
+
+    - Content-addressed files get a strong ETag from their path and
+      "Cache-Control: public, max-age=<1 year>, immutable"; other files get
+      Werkzeug's size/mtime ETag and must be revalidated.
+    - If-None-Match (and, for immutable files, If-Modified-Since) is answered
+      with 304 before the file is opened.
+    - Range requests are answered with 206 and only the requested bytes, so
+      seeking in a video does not re-send the whole file.
+    - With MEDIA_ACCEL_REDIRECT_PREFIX set, the body is left to nginx through an
+      X-Accel-Redirect to <prefix><relative path> (nginx then handles ranges);
+      with Flask's USE_X_SENDFILE, send_file hands the file to the web server.
+
+    Args:
+        absolute_path: Path of the file on disk
+        relative_path: Path under UPLOAD_FOLDER (as used in /uploads/ URLs)
+        stat: os.stat_result of the file
+    """
+    etag = content_etag(relative_path)
+    immutable = etag is not None
+
+    if immutable and (request.if_none_match.contains(etag) or request.if_modified_since):
+        logger.debug(f"Not modified: {relative_path}")
+        return _with_cache_headers(make_response('', 304), etag)
+
+    accel_prefix = current_app.config.get('MEDIA_ACCEL_REDIRECT_PREFIX')
+    if accel_prefix:
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + relative_path
+        response.mimetype = mimetypes.guess_type(relative_path)[0] or 'application/octet-stream'
+        response.last_modified = stat.st_mtime
+        logger.debug(f"Offloading {relative_path} to the web server")
+        return _with_cache_headers(response, etag) if immutable else _revalidate(response)
+
+    logger.debug(f"Serving {relative_path} ({stat.st_size} bytes, range {request.range})")
+    response = send_file(absolute_path, conditional=True, etag=etag or True, last_modified=stat.st_mtime)
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return _with_cache_headers(response, etag) if immutable else _revalidate(response)
+
+def is_servable_path(relative_path):
+    """False for files that are not (yet) media, such as uploads still being received"""
+    return not any(part.startswith('.') for part in relative_path.split('/'))
+
+def _with_cache_headers(response, etag):
+    response.set_etag(etag)
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+def _revalidate(response):
+    # Legacy uploads/<member_id>/<filename> paths can be overwritten in place
+    response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,20 @@
+from flask import request, url_for
+
+def add_next_page_link(response, items, limit):
+    """
+    Add a Link: rel="next" header for keyset-paginated listings
+    
+    Args:
+        response: The Flask response to decorate
+        items: The objects returned on this page (must have an id)
+        limit: The page size that was requested, or None if unpaginated
+    
+    Returns:
+        The response, with a next link when the page was full
+    """
+    if limit is not None and len(items) == limit:
+        args = request.args.to_dict()
+        args['after_id'] = items[-1].id
+        next_url = url_for(request.endpoint, **request.view_args, **args)
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
@@ -0,0 +1,107 @@
+import json
+from flask import Response, request, stream_with_context
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Encoded output is flushed to the client in chunks of roughly this many bytes
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def wants_ndjson():
+    """True if the client asked for newline-delimited JSON (?format=ndjson or Accept header)"""
+    if request.args.get('format') == 'ndjson':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+def wants_stream():
+    """True if the response should be streamed rather than built in memory"""
+    return request.args.get('stream') in ('1', 'true') or wants_ndjson()
+
+def _encode(item):
+    return json.dumps(item, separators=(',', ':'), default=str)
+
+def _buffered(pieces):
+    """Join small string pieces into chunks of about STREAM_CHUNK_SIZE"""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= STREAM_CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+def _json_array(items):
+    yield '['
+    first = True
+    for item in items:
+        if not first:
+            yield ','
+        first = False
+        yield _encode(item)
+    yield ']'
+
+def json_array_chunks(items):
+    """Encode an iterable of dicts as one JSON array, incrementally"""
+    return _buffered(_json_array(items))
+
+def json_tree_chunks(nodes, links):
+    """Encode {"nodes": [...], "links": [...]} incrementally"""
+    def pieces():
+        yield '{"nodes":'
+        yield from _json_array(nodes)
+        yield ',"links":'
+        yield from _json_array(links)
+        yield '}'
+    return _buffered(pieces())
+
+def ndjson_chunks(items):
+    """Encode an iterable of dicts as one JSON document per line"""
+    return _buffered(_encode(item) + '\n' for item in items)
+
+def ndjson_tree_chunks(nodes, links):
+    """Encode a tree as NDJSON lines of {"node": {...}} followed by {"link": {...}}"""
+    def lines():
+        for node in nodes:
+            yield _encode({'node': node}) + '\n'
+        for link in links:
+            yield _encode({'link': link}) + '\n'
+    return _buffered(lines())
+
+def line_chunks(lines):
+    """Join pre-encoded text lines (each ending in a newline) into streaming chunks"""
+    return _buffered(lines)
+
+def read_ndjson(stream):
+    """
+    Lazily parse a binary NDJSON stream such as request.stream
+
+    Yields one parsed value per non-blank line; lines that are not valid JSON yield None
+    so callers can report them by position without aborting the rest of the stream.
+    """
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+def streaming_response(chunks, mimetype='application/json'):
+    """Wrap a chunk generator in a response that keeps the request context while streaming"""
+    return Response(stream_with_context(chunks), mimetype=mimetype)
+
+def stream_tree(nodes, links):
+    """Stream a tree as chunked JSON or NDJSON depending on what the client asked for"""
+    if wants_ndjson():
+        return streaming_response(ndjson_tree_chunks(nodes, links), NDJSON_MIMETYPE)
+    return streaming_response(json_tree_chunks(nodes, links))
+
+def stream_list(items):
+    """Stream a listing as a chunked JSON array or NDJSON depending on what the client asked for"""
+    if wants_ndjson():
+        return streaming_response(ndjson_chunks(items), NDJSON_MIMETYPE)
+    return streaming_response(json_array_chunks(items))
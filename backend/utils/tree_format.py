@@ -0,0 +1,92 @@
+from flask import request
+
+# Opt-in compact tree representation, negotiated through the Accept header
+COLUMNAR_MIMETYPE = 'application/vnd.genetree.columnar+json'
+
+# Integer codes for link types; the list is sent along so clients never hard-code it
+LINK_TYPES = ['parent-child', 'child-parent', 'spouse', 'sibling', 'other']
+
+# Node keys whose values go through the string table
+INTERNED_NODE_KEYS = ['name', 'gender', 'birth_date', 'death_date']
+
+def wants_columnar():
+    """True if the client asked for the columnar tree format (Accept header or ?format=columnar)"""
+    if request.args.get('format') == 'columnar':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', COLUMNAR_MIMETYPE]) == COLUMNAR_MIMETYPE
+
+def encode_columnar(tree_data):
+    """
+    Convert {'nodes': [...], 'links': [...]} into the columnar format
+
+    Every node and link key becomes one array. Strings are replaced by indexes into a
+    shared string table (null stays null) and link types by indexes into link_types.
+
+    Args:
+        tree_data: Tree dict as returned by TreeService
+
+    Returns:
+        Dict ready to be serialized as JSON
+    """
+    strings = []
+    string_index = {}
+    link_types = list(LINK_TYPES)
+    link_type_index = {link_type: code for code, link_type in enumerate(link_types)}
+
+    def intern(value):
+        if value is None:
+            return None
+        if value not in string_index:
+            string_index[value] = len(strings)
+            strings.append(value)
+        return string_index[value]
+
+    nodes = tree_data['nodes']
+    node_columns = {'id': [node['id'] for node in nodes]}
+    for key in INTERNED_NODE_KEYS:
+        node_columns[key] = [intern(node[key]) for node in nodes]
+    node_columns['has_profile'] = [1 if node['has_profile'] else 0 for node in nodes]
+
+    links = tree_data['links']
+    type_codes = []
+    for link in links:
+        if link['type'] not in link_type_index:
+            link_type_index[link['type']] = len(link_types)
+            link_types.append(link['type'])
+        type_codes.append(link_type_index[link['type']])
+
+    return {
+        'format': 'columnar',
+        'version': 1,
+        'strings': strings,
+        'link_types': link_types,
+        'nodes': node_columns,
+        'links': {
+            'source': [link['source'] for link in links],
+            'target': [link['target'] for link in links],
+            'type': type_codes
+        }
+    }
+
+def decode_columnar(payload):
+    """Inverse of encode_columnar, returning {'nodes': [...], 'links': [...]}"""
+    strings = payload['strings']
+    node_columns = payload['nodes']
+
+    def lookup(index):
+        return None if index is None else strings[index]
+
+    nodes = []
+    for position, person_id in enumerate(node_columns['id']):
+        node = {'id': person_id}
+        for key in INTERNED_NODE_KEYS:
+            node[key] = lookup(node_columns[key][position])
+        node['has_profile'] = bool(node_columns['has_profile'][position])
+        nodes.append(node)
+
+    link_columns = payload['links']
+    links = [
+        {'source': source, 'target': target, 'type': payload['link_types'][code]}
+        for source, target, code in zip(link_columns['source'], link_columns['target'], link_columns['type'])
+    ]
+    return {'nodes': nodes, 'links': links}
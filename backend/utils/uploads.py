@@ -0,0 +1,63 @@
+import hashlib
+
+# Uploads are copied in pieces of this size, so this bounds the memory an upload uses
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+VIDEO_EXTENSIONS = {'mp4', 'mov', 'webm', 'avi', 'mkv', 'mpeg', 'mpg'}
+
+MAX_VIDEO_SIZE = 50 * 1024 * 1024
+MAX_PHOTO_SIZE = 8 * 1024 * 1024
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload goes over its size limit"""
+    def __init__(self, max_size, message=None):
+        super().__init__(message or f"File exceeds maximum allowed size ({round(max_size / (1024 * 1024))}MB)")
+        self.max_size = max_size
+
+def file_extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+def is_video(filename, media_type=''):
+    """True if the upload is a video, by declared media type or by extension"""
+    return media_type == 'video' or file_extension(filename) in VIDEO_EXTENSIONS
+
+def media_size_limit(filename, media_type=''):
+    """Maximum size in bytes of a media upload (50MB for videos, 8MB for everything else)"""
+    return MAX_VIDEO_SIZE if is_video(filename, media_type) else MAX_PHOTO_SIZE
+
+def copy_stream(source, destination, max_size, digest=None, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Copy a stream in fixed-size chunks, enforcing a size limit as it goes
+
+    Args:
+        source: Readable binary stream (an upload or request.stream)
+        destination: Writable binary file
+        max_size: Maximum number of bytes to accept
+        digest: Optional hashlib object updated with every chunk
+        chunk_size: Bytes read per iteration
+
+    Returns:
+        Number of bytes copied
+
+    Raises:
+        UploadTooLarge: As soon as more than max_size bytes have been read
+    """
+    copied = 0
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            return copied
+        copied += len(chunk)
+        if copied > max_size:
+            raise UploadTooLarge(max_size)
+        if digest is not None:
+            digest.update(chunk)
+        destination.write(chunk)
+
+def file_sha256(path, chunk_size=UPLOAD_CHUNK_SIZE):
+    """SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
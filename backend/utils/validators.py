@@ -84,6 +84,250 @@ def validate_relationship_data(data):
     
     return (len(errors) == 0, errors)
 
+# Largest page a listing endpoint will return in one response
+MAX_PAGE_SIZE = 1000
+
+# Birth year filters are turned into dates, and the upper bound into the next January 1st
+MIN_BIRTH_YEAR = 1
+MAX_BIRTH_YEAR = 9998
+
+def _parse_int_arg(args, name, errors, minimum=None, maximum=None):
+    """Parse an optional integer query argument, appending to errors on failure"""
+    value = args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        errors.append(f"{name} must be an integer")
+        return None
+    if minimum is not None and value < minimum:
+        errors.append(f"{name} must be at least {minimum}")
+        return None
+    if maximum is not None and value > maximum:
+        errors.append(f"{name} must be at most {maximum}")
+        return None
+    return value
+
+def validate_listing_params(args, allowed_fields):
+    """
+    Validate keyset pagination and sparse fieldset query parameters
+    
+    Args:
+        args: The request query arguments (after_id, limit, fields)
+        allowed_fields: Field names that may be requested with fields
+    
+    Returns:
+        (is_valid, errors, params): Tuple of boolean, error messages and a dict
+        with after_id, limit and fields (None when not given)
+    """
+    errors = []
+    params = {
+        'after_id': _parse_int_arg(args, 'after_id', errors, minimum=0),
+        'limit': _parse_int_arg(args, 'limit', errors, minimum=1),
+        'fields': None
+    }
+    
+    if params['limit'] is not None and params['limit'] > MAX_PAGE_SIZE:
+        errors.append(f"limit must be at most {MAX_PAGE_SIZE}")
+    
+    if args.get('fields'):
+        fields = {field.strip() for field in args['fields'].split(',') if field.strip()}
+        unknown = fields - set(allowed_fields)
+        if unknown:
+            errors.append(f"Unknown fields: {', '.join(sorted(unknown))}")
+        # The id is always returned so clients can page with after_id
+        params['fields'] = fields | {'id'}
+    
+    return (len(errors) == 0, errors, params)
+
+def validate_member_filters(args):
+    """
+    Validate member listing filters
+    
+    Args:
+        args: The request query arguments (surname, birth_year_min, birth_year_max, gender)
+    
+    Returns:
+        (is_valid, errors, filters): Tuple of boolean, error messages and a dict of filters
+    """
+    errors = []
+    filters = {
+        'surname': args.get('surname') or None,
+        'birth_year_min': _parse_int_arg(args, 'birth_year_min', errors, minimum=MIN_BIRTH_YEAR,
+                                         maximum=MAX_BIRTH_YEAR),
+        'birth_year_max': _parse_int_arg(args, 'birth_year_max', errors, minimum=MIN_BIRTH_YEAR,
+                                         maximum=MAX_BIRTH_YEAR),
+        'gender': args.get('gender') or None
+    }
+    
+    if filters['gender'] and filters['gender'] not in ['male', 'female', 'other', 'unknown']:
+        errors.append("Gender must be one of: male, female, other, unknown")
+    
+    if (filters['birth_year_min'] and filters['birth_year_max']
+            and filters['birth_year_min'] > filters['birth_year_max']):
+        errors.append("birth_year_min must not be greater than birth_year_max")
+    
+    return (len(errors) == 0, errors, filters)
+
+def validate_relationship_filters(args):
+    """
+    Validate relationship listing filters
+    
+    Args:
+        args: The request query arguments (person_id, relationship_type)
+    
+    Returns:
+        (is_valid, errors, filters): Tuple of boolean, error messages and a dict of filters
+    """
+    errors = []
+    filters = {
+        'person_id': _parse_int_arg(args, 'person_id', errors, minimum=1),
+        'relationship_type': args.get('relationship_type') or None
+    }
+    
+    if filters['relationship_type'] and filters['relationship_type'] not in ['parent-child', 'spouse', 'sibling', 'other']:
+        errors.append("relationship_type must be one of: parent-child, spouse, sibling, other")
+    
+    return (len(errors) == 0, errors, filters)
+
+# Most members a batched media listing may ask for at once
+MAX_BATCH_MEMBER_IDS = 200
+
+def validate_media_filters(args):
+    """
+    Validate media listing filters
+    
+    Args:
+        args: The request query arguments (type, member_ids)
+    
+    Returns:
+        (is_valid, errors, filters): Tuple of boolean, error messages and a dict
+        with media_type and member_ids (a list, or None when not given)
+    """
+    errors = []
+    filters = {'media_type': args.get('type') or None, 'member_ids': None}
+    
+    if filters['media_type'] and filters['media_type'] not in ['photo', 'video']:
+        errors.append("type must be one of: photo, video")
+    
+    if 'member_ids' in args:
+        filters['member_ids'] = _parse_member_ids(args, errors)
+    
+    return (len(errors) == 0, errors, filters)
+
+def _parse_member_ids(args, errors):
+    """Parse the comma-separated member_ids query argument, appending to errors on failure"""
+    raw_ids = [value.strip() for value in args.get('member_ids', '').split(',') if value.strip()]
+    if not raw_ids or not all(value.isdigit() for value in raw_ids):
+        errors.append("member_ids must be a comma-separated list of member IDs")
+        return None
+    if len(raw_ids) > MAX_BATCH_MEMBER_IDS:
+        errors.append(f"member_ids may list at most {MAX_BATCH_MEMBER_IDS} members")
+        return None
+    # Keep the requested order, without repeats
+    return list(dict.fromkeys(int(value) for value in raw_ids))
+
+def validate_lineage_params(args):
+    """
+    Validate an ancestors, descendants or descendant count query
+    
+    Args:
+        args: The request query arguments (depth, and member_ids for counts)
+    
+    Returns:
+        (is_valid, errors, params): Tuple of boolean, error messages and a dict
+        with max_depth (None for unlimited) and member_ids (None when not given)
+    """
+    errors = []
+    params = {
+        'max_depth': _parse_int_arg(args, 'depth', errors, minimum=1),
+        'member_ids': _parse_member_ids(args, errors) if 'member_ids' in args else None
+    }
+    
+    return (len(errors) == 0, errors, params)
+
+def validate_kinship_params(args):
+    """
+    Validate the two persons of a kinship query
+    
+    Args:
+        args: The request query arguments (a, b and optionally max_length)
+    
+    Returns:
+        (is_valid, errors, params): Tuple of boolean, error messages and a dict
+        with a, b and max_length (None when not given)
+    """
+    errors = []
+    params = {}
+    for name in ('a', 'b'):
+        if not args.get(name):
+            errors.append(f"{name} must be a member ID")
+        params[name] = _parse_int_arg(args, name, errors, minimum=1)
+    params['max_length'] = _parse_int_arg(args, 'max_length', errors, minimum=1)
+    
+    return (len(errors) == 0, errors, params)
+
+def validate_export_job_params(params):
+    """
+    Validate the parameters of an export job
+    
+    Args:
+        params: Dict with format and optionally root_id, depth, max_nodes and directions
+    
+    Returns:
+        (is_valid, errors): Tuple of boolean and error messages
+    """
+    errors = []
+    if not isinstance(params, dict):
+        return (False, ["params must be an object"])
+    
+    if params.get('format', 'gedcom') not in ['gedcom', 'ndjson']:
+        errors.append("format must be one of: gedcom, ndjson")
+    
+    for name, minimum in (('root_id', 1), ('depth', 0), ('max_nodes', 1)):
+        value = params.get(name)
+        if value is None:
+            continue
+        if not isinstance(value, int) or isinstance(value, bool):
+            errors.append(f"{name} must be an integer")
+        elif value < minimum:
+            errors.append(f"{name} must be at least {minimum}")
+    
+    directions = params.get('directions')
+    if directions is not None:
+        valid_directions = ['ancestors', 'descendants', 'spouses', 'siblings', 'other']
+        if not isinstance(directions, list) or any(direction not in valid_directions for direction in directions):
+            errors.append(f"directions must be a list of: {', '.join(valid_directions)}")
+    
+    return (len(errors) == 0, errors)
+
+# The implex walk expands up to 2^(generations + 1) - 2 ancestors per person
+MAX_IMPLEX_GENERATIONS = 8
+
+def validate_pedigree_analysis_params(params):
+    """
+    Validate the parameters of a pedigree analysis job
+    
+    Args:
+        params: Dict with optionally generations (how many generations of ancestors the implex covers)
+    
+    Returns:
+        (is_valid, errors): Tuple of boolean and error messages
+    """
+    if not isinstance(params, dict):
+        return (False, ["params must be an object"])
+    
+    errors = []
+    generations = params.get('generations')
+    if generations is not None:
+        if not isinstance(generations, int) or isinstance(generations, bool):
+            errors.append("generations must be an integer")
+        elif not 1 <= generations <= MAX_IMPLEX_GENERATIONS:
+            errors.append(f"generations must be between 1 and {MAX_IMPLEX_GENERATIONS}")
+    
+    return (len(errors) == 0, errors)
+
 def allowed_file(filename, allowed_extensions):
     """
     Check if a file has an allowed extension
@@ -99,7 +343,7 @@ def allowed_file(filename, allowed_extensions):
 
 def validate_media_upload(request, allowed_extensions):
     """
-    Validate media upload request
+    Validate media upload request (presence and file type)
     
     Args:
         request: The Flask request object
@@ -127,30 +371,7 @@ def validate_media_upload(request, allowed_extensions):
         errors.append(f"File type not allowed. Allowed types: {', '.join(allowed_extensions)}")
         return False, errors, None
     
-    # Get file extension to determine maximum size
-    file_ext = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
-    
-    # Check file size based on type
-    # Read the file content to determine size (flask doesn't have direct access to file size)
-    file_content = file.read()
-    file_size = len(file_content)
-    
-    # Reset file pointer to beginning
-    file.seek(0)
-    
-    # Get media type from request
-    media_type = request.form.get('media_type', '')
-    
-    # Determine maximum size based on media type
-    if media_type == 'video' or file_ext in {'mp4', 'mov', 'webm', 'avi', 'mkv', 'mpeg', 'mpg'}:
-        max_size = 50 * 1024 * 1024  # 50MB for videos
-    else:
-        max_size = 8 * 1024 * 1024  # 8MB for images and other files
-    
-    if file_size > max_size:
-        size_in_mb = round(file_size / (1024 * 1024), 2)
-        max_in_mb = round(max_size / (1024 * 1024))
-        errors.append(f"File size ({size_in_mb}MB) exceeds maximum allowed size ({max_in_mb}MB)")
-        return False, errors, None
+    # Size limits are enforced while the file is copied (see MemberService.save_media),
+    # so the upload is never read into memory here
     
     return True, [], file
\ No newline at end of file